@@ -0,0 +1,69 @@
+"""Latency of "the last 7 days of every venue" from 40 hourly series, for stores holding 1, 4 and 16 years of history.
+CandleStore.query (memory-mapped slices) vs reading every series' CSV with pd.read_csv and filtering, the way the notebook does it.
+Run from the repository root with: python -m benchmarks.bench_candle_query"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import token_ohlcv_download as tod
+
+venue_count = 40
+week_ms = 7 * 24 * 3600 * 1000
+hour_ms = 3600 * 1000
+repeats = 5
+
+
+def build(folder, years):
+    store = tod.CandleStore(os.path.join(folder, "store"))
+    csv_folder = os.path.join(folder, "csv")
+    os.makedirs(csv_folder)
+    random = np.random.default_rng(years)
+    end = 1735689600000  # 2025-01-01
+    rows = years * 365 * 24
+    timestamps = end - hour_ms * np.arange(rows, 0, -1, dtype=np.int64)
+    for venue in range(venue_count):
+        close = 1 + random.random(rows)
+        candles = np.column_stack([timestamps, close, close * 1.01, close * 0.99, close, random.random(rows) * 1e4])
+        store.append(f"venue{venue}", "PENGU/USDT", "1h", candles)
+        pd.DataFrame(candles, columns=tod.cex_ohlcv_columns).to_csv(os.path.join(csv_folder, f"venue{venue}.csv"), index=False)
+    return store, csv_folder, end
+
+
+def read_csvs(csv_folder, start, end):
+    frames = []
+    for file_name in sorted(os.listdir(csv_folder)):
+        candles = pd.read_csv(os.path.join(csv_folder, file_name))
+        frames.append(candles[(candles["timestamp"] >= start) & (candles["timestamp"] <= end)])
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_of(function):
+    best = float("inf")
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def main():
+    print(f"{venue_count} venues, last 7 days of 1h candles")
+    print(f"{'history':>10}{'pd.read_csv':>14}{'query':>12}{'query 1h->1d':>15}")
+    for years in (1, 4, 16):
+        store, csv_folder, end = build(tempfile.mkdtemp(), years)
+        start = end - week_ms
+        csv_seconds, expected = best_of(lambda: read_csvs(csv_folder, start, end))
+        query_seconds, actual = best_of(lambda: store.query(pairs=["PENGU/USDT"], start=start, end=end))
+        daily_seconds, daily = best_of(lambda: store.query(pairs=["PENGU/USDT"], start=start, end=end, output_seconds=24 * 3600))
+        assert len(actual) == len(expected) == venue_count * 7 * 24
+        assert np.allclose(actual[tod.cex_ohlcv_columns].to_numpy(), expected[tod.cex_ohlcv_columns].to_numpy())
+        assert len(daily) == venue_count * 7
+        print(f"{years:>8} y{csv_seconds * 1000:12.1f}ms{query_seconds * 1000:10.1f}ms{daily_seconds * 1000:13.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
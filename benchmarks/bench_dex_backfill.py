@@ -0,0 +1,120 @@
+"""Resuming backfill_dex_pools after a failed run, against a local aiohttp stand-in of CoinMarketCap's /v4/dex/pairs/ohlcv/historical.
+Three pools of 90 days of hourly candles (5 pages each) are downloaded once without trouble, and once with the stand-in answering http 500 after a few pages. Then the interrupted files get damaged the way a crash leaves them:
+a page written without its checkpoint and a torn last line (pool A), the same plus half a line only (pool B), and a pool file from before checkpoints existed (pool C, checkpoint removed).
+The resumed run has to produce the same CSVs and checkpoints as the uninterrupted one, byte for byte, without a duplicate candle and without downloading a page twice.
+Run from the repository root with: python -m benchmarks.bench_dex_backfill"""
+
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from aiohttp import web
+
+import token_ohlcv_download as tod
+
+port = 8798
+first_open = datetime(2024, 12, 1, tzinfo=timezone.utc)
+last_close = datetime(2025, 3, 1, tzinfo=timezone.utc)
+fail_after = 7  # pages served before the stand-in starts failing
+latency = 0.005
+pools = [(f"0xpool{name}", "ethereum", "Pengu", "2024-12-01T00:00:00.000Z") for name in "ABC"]
+
+
+def iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+async def ohlcv(request):
+    """pages of hourly candles with time_close at or after time_start, like CoinMarketCap. Once fail_after is reached every request gets http 500"""
+    state = request.app["state"]
+    await asyncio.sleep(latency)
+    if state["fail_after"] is not None and state["pages"] >= state["fail_after"]:
+        return web.Response(status=500, text="internal server error")
+    time_start = datetime.fromisoformat(request.query["time_start"].replace("Z", "+00:00"))
+    hour = max(0, -(-(time_start - first_open - timedelta(hours=1) + timedelta(milliseconds=1)) // timedelta(hours=1)))
+    seed = sum(map(ord, request.query["contract_address"])) % 100
+    quotes = []
+    while len(quotes) < int(request.query["count"]) and first_open + timedelta(hours=hour + 1) <= last_close:
+        time_open = first_open + timedelta(hours=hour)
+        price = 1 + seed / 100 + hour * 1e-3
+        quote = {"open": price, "high": price * 1.01, "low": price * 0.99, "close": price * 1.001, "volume": 100.0 + hour, "timestamp": iso(time_open + timedelta(hours=1))}
+        quotes.append({"time_open": iso(time_open), "time_close": iso(time_open + timedelta(hours=1) - timedelta(milliseconds=1)), "quote": [quote]})
+        hour += 1
+    if quotes:
+        state["pages"] += 1
+    return web.json_response({"data": [{"contract_address": request.query["contract_address"], "quotes": quotes}], "status": {"error_code": "0"}})
+
+
+def serve():
+    """starts the stand-in on its own event loop thread and returns its state: pages served (with candles) and fail_after"""
+    app = web.Application()
+    app["state"] = {"pages": 0, "fail_after": None}
+    app.router.add_get("/v4/dex/pairs/ohlcv/historical", ohlcv)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return app["state"]
+
+
+def backfill(state, folder, fail=None):
+    """one backfill_dex_pools run, returns (summary, pages served, seconds)"""
+    state["pages"], state["fail_after"] = 0, fail
+    with contextlib.redirect_stdout(io.StringIO()):
+        begin = time.perf_counter()
+        summary = tod.backfill_dex_pools(pools, folder, max_concurrent_pools=3, base_url=f"http://127.0.0.1:{port}", api_key="stand-in")
+        seconds = time.perf_counter() - begin
+    return summary, state["pages"], seconds
+
+
+def damage(folder):
+    """leaves the interrupted pool files the way a crash would"""
+    path_a, path_b, path_c = (tod.dex_ohlcv_path(folder, *pool[:3]) for pool in pools)
+    for path, written in ((path_a, 20), (path_b, 0)):
+        with open(path, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+        assert len(lines) > 1, "every pool needs a page before the failure"
+        with open(path, "ab") as f:
+            f.writelines(lines[-written:] if written else [])  # a page written after the checkpoint ...
+            f.write(lines[-1][: len(lines[-1]) // 2])  # ... and a line cut in half
+    os.remove(path_c[: -len(".csv")] + ".checkpoint.json")
+
+
+def main():
+    state = serve()
+    tod._rate_limiters["coinmarketcap"] = tod.RateLimiter(1e6, capacity=1e6)
+    reference_folder, resumed_folder = tempfile.mkdtemp(), tempfile.mkdtemp()
+
+    reference, reference_pages, reference_seconds = backfill(state, reference_folder)
+    assert reference["error"].isna().all()
+    failed, failed_pages, _ = backfill(state, resumed_folder, fail=fail_after)
+    assert failed["error"].notna().all() and failed_pages == fail_after
+    damage(resumed_folder)
+    resumed, resumed_pages, resumed_seconds = backfill(state, resumed_folder)
+    assert resumed["error"].isna().all()
+
+    print(f"{len(pools)} pools, {reference['added'].iloc[0]} hourly candles each, the stand-in fails after {fail_after} pages")
+    print(f"{'run':14}{'pages':>6}{'seconds':>9}")
+    print(f"{'uninterrupted':14}{reference_pages:6}{reference_seconds:9.2f}")
+    print(f"{'failed':14}{failed_pages:6}")
+    print(f"{'resumed':14}{resumed_pages:6}{resumed_seconds:9.2f}")
+
+    assert failed_pages + resumed_pages == reference_pages  # no page downloaded twice
+    for pool in pools:
+        reference_path, resumed_path = (tod.dex_ohlcv_path(folder, *pool[:3]) for folder in (reference_folder, resumed_folder))
+        with open(reference_path, "rb") as reference_file, open(resumed_path, "rb") as resumed_file:
+            assert reference_file.read() == resumed_file.read(), pool[0]
+        assert tod.read_dex_checkpoint(resumed_path) == tod.read_dex_checkpoint(reference_path)
+        assert not pd.read_csv(resumed_path)["time_open"].duplicated().any()
+    assert (resumed.set_index("contract_address")["time_close"] == reference.set_index("contract_address")["time_close"]).all()
+
+
+if __name__ == "__main__":
+    main()
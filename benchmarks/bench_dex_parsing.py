@@ -0,0 +1,148 @@
+"""Parsing CoinMarketCap DEX payloads: the notebook's per-row code vs the columnar decoders.
+Fixture payloads in the shape CMC sends (60 pools of 500 hourly candles each, and a spot-pairs response listing the 60 pools) are written to a temporary folder, read back, and parsed both ways.
+Run from the repository root with: python -m benchmarks.bench_dex_parsing"""
+
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import token_ohlcv_download as tod
+
+pool_count = 60
+candles_per_page = 500
+repeats = 5
+
+
+def iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def ohlcv_payload(pool):
+    start = datetime(2024, 12, 17, tzinfo=timezone.utc)
+    quotes = []
+    for hour in range(candles_per_page):
+        time_open = start + timedelta(hours=hour)
+        price = 0.03 + pool * 1e-4 + hour * 1e-6
+        quotes.append(
+            {
+                "time_open": iso(time_open),
+                "time_close": iso(time_open + timedelta(minutes=59, seconds=59, milliseconds=999)),
+                "quote": [
+                    {
+                        "convert_id": "2781",
+                        "open": price,
+                        "high": price * 1.01,
+                        "low": price * 0.99,
+                        "close": price * 1.002,
+                        "volume": 12345.678 + hour,
+                        "timestamp": iso(time_open + timedelta(hours=1)),
+                    }
+                ],
+            }
+        )
+    return {"data": [{"contract_address": f"POOL{pool}", "network_slug": "solana", "quotes": quotes}], "status": {"error_code": "0"}}
+
+
+def spot_pairs_payload():
+    data = []
+    for pool in range(pool_count):
+        item = {field: f"{field}-{pool}" for field in tod.dex_spot_pair_fields}
+        item["network_slug"] = "solana"
+        item["created_at"] = "2024-12-17T00:00:00.000Z"
+        item["quote"] = [{field: 1.5 + pool for field in tod.dex_spot_pair_quote_fields}]
+        data.append(item)
+    return {"data": data}
+
+
+def per_quote_frames(data):
+    """the notebook's OHLCV parsing: one DataFrame per quote, then concat"""
+    dataframes = []
+    for quote in data["data"][0]["quotes"]:
+        quote_data = dict(quote["quote"][0])
+        quote_data["time_open"] = quote["time_open"]
+        quote_data["time_close"] = quote["time_close"]
+        dataframes.append(pd.DataFrame([quote_data]))
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def per_row_spot_pairs(spot_pairs_data):
+    """the notebook's save_to_csv parsing: one dict per row"""
+    rows = []
+    for item in spot_pairs_data:
+        for quote in item["quote"]:
+            row = {field: item[field] for field in tod.dex_spot_pair_fields}
+            row.update({field: quote[field] for field in tod.dex_spot_pair_quote_fields})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def iterrows_contract_pairs(folder_name):
+    """the notebook's load_contract_pairs_from_csv"""
+    contract_pairs = []
+    for file_name in sorted(os.listdir(folder_name)):
+        if file_name.endswith(".csv"):
+            base_asset_name, network_slug = os.path.splitext(file_name)[0].split("_")
+            df = pd.read_csv(os.path.join(folder_name, file_name))
+            for _, row in df.iterrows():
+                contract_pairs.append((row["contract_address"], network_slug, base_asset_name, row["created_at"]))
+    return contract_pairs
+
+
+def best_of(function):
+    best = float("inf")
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    fixture_paths = []
+    for pool in range(pool_count):
+        fixture_paths.append(os.path.join(folder, f"ohlcv_{pool}.json"))
+        with open(fixture_paths[-1], "w") as f:
+            json.dump(ohlcv_payload(pool), f)
+    with open(os.path.join(folder, "spot_pairs.json"), "w") as f:
+        json.dump(spot_pairs_payload(), f)
+    payloads = []
+    for path in fixture_paths:
+        with open(path) as f:
+            payloads.append(json.load(f))
+    with open(os.path.join(folder, "spot_pairs.json")) as f:
+        spot_pairs_data = json.load(f)["data"]
+
+    pools_folder = os.path.join(folder, "tokens_pool_addr")
+    os.makedirs(pools_folder)
+    for base in range(10):
+        tod.decode_dex_spot_pairs(spot_pairs_data).to_csv(os.path.join(pools_folder, f"Token{base}_solana.csv"), index=False)
+
+    rows = pool_count * candles_per_page
+    old_ohlcv, expected = best_of(lambda: [per_quote_frames(payload) for payload in payloads])
+    new_ohlcv, actual = best_of(lambda: [tod.decode_dex_ohlcv(payload) for payload in payloads])
+    assert all(a.equals(e) for a, e in zip(actual, expected)), "decode_dex_ohlcv and the per-quote path disagree"
+
+    old_pairs, expected = best_of(lambda: per_row_spot_pairs(spot_pairs_data))
+    new_pairs, actual = best_of(lambda: tod.decode_dex_spot_pairs(spot_pairs_data))
+    assert actual.equals(expected), "decode_dex_spot_pairs and the per-row path disagree"
+
+    old_pools, expected = best_of(lambda: iterrows_contract_pairs(pools_folder))
+    new_pools, actual = best_of(lambda: tod.load_contract_pairs_from_csv(pools_folder))
+    assert actual == expected, "load_contract_pairs_from_csv and the iterrows path disagree"
+
+    print(f"{'':36}{'before':>12}{'after':>12}{'rows/s after':>16}{'speed-up':>10}")
+    for name, count, before, after in [
+        (f"OHLCV pages ({rows} candles)", rows, old_ohlcv, new_ohlcv),
+        (f"spot pairs ({pool_count} pools)", pool_count, old_pairs, new_pairs),
+        (f"pool lists ({10 * pool_count} pools)", 10 * pool_count, old_pools, new_pools),
+    ]:
+        print(f"{name:36}{before * 1000:10.1f}ms{after * 1000:10.1f}ms{count / after:16,.0f}{before / after:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Requests and time to repair a year of stored BTC/USDT candles (1h and 1m) with a few holes, repair_gaps vs downloading the whole year again.
+The candles come from the Binance emulator of bench_pipeline, which is down for a few hours (an outage the exchange has no candles for). Holes are punched into the stored series after a full backfill, the repaired series has to match the backfill again, and a second repair has to cost no request at all.
+Run from the repository root with: python -m benchmarks.bench_gap_repair"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import ccxt
+import numpy as np
+
+import token_ohlcv_download as tod
+from benchmarks.bench_pipeline import binance_emulator, emulated_market, emulated_markets, period_end
+from benchmarks.replay import Cassette
+
+pair = "BTC/USDT"
+timeframes = ["1h", "1m"]
+days = 365
+hole_count = 8
+end = int(datetime.fromisoformat(period_end).timestamp() * 1000)
+outage = (end - 100 * 24 * 3600 * 1000, end - 100 * 24 * 3600 * 1000 + 5 * 3600 * 1000)  # 5 hours without candles
+
+
+def emulator_with_outage(method, url, body):
+    status, text = binance_emulator(method, url, body)
+    if status != 200:
+        return status, text
+    return status, json.dumps([row for row in json.loads(text) if not outage[0] <= row[0] < outage[1]])
+
+
+def requests_made(function):
+    """runs function against the emulator, returns (requests, seconds, result)"""
+    with Cassette(os.path.join(tempfile.mkdtemp(), "cassette.json"), mode="record", upstream=emulator_with_outage) as cassette:
+        with contextlib.redirect_stdout(io.StringIO()):
+            begin = time.perf_counter()
+            result = function()
+            seconds = time.perf_counter() - begin
+    return cassette.stats["recorded"], seconds, result
+
+
+def punch_holes(store, timeframe, random):
+    """sets hole_count stretches of 1 to 48 rows of the series to NaN, like appends that never happened"""
+    path = store.series_path("binance", pair, timeframe)
+    rows = store.read_meta("binance", pair, timeframe)["rows"]
+    columns = [np.memmap(os.path.join(path, f"{column}.f8"), dtype="<f8", mode="r+", shape=(rows,)) for column in store.columns]
+    for first in random.choice(rows - 48, hole_count, replace=False):
+        length = random.integers(1, 49)
+        for column in columns:
+            column[first : first + length] = np.nan
+    for column in columns:
+        column.flush()
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    tod.market_cache_dir = os.path.join(folder, "markets")
+    exchange = ccxt.binance()
+    exchange.set_markets([emulated_market(symbol) for symbol in emulated_markets], {})
+    tod.write_market_cache("binance", exchange.markets, {})
+    tod.exchange_dict["binance"]["requests_per_second"] = 1e6
+    tod.exchange_dict["binance"]["burst"] = 1e6
+    tod._rate_limiters.pop("binance", None)
+    random = np.random.default_rng(0)
+
+    print(f"{days} days of {pair}, {hole_count} holes of 1-48 candles and a 5 hour outage")
+    print(f"{'':4}{'missing':>9}{'backfill':>18}{'repair':>18}{'second repair':>15}")
+    for timeframe in timeframes:
+        store = tod.CandleStore(os.path.join(folder, timeframe))
+
+        async def backfill():
+            binance = tod.get_exchange("binance", asynchronous=True)
+            await tod.load_markets_cached_async(binance)
+            return await tod.fetch_candles(binance, pair, timeframe, end / 1000 - days * 24 * 3600, end / 1000, 500, store)
+
+        backfill_requests, backfill_seconds, _ = requests_made(lambda: tod.run_coroutine(backfill()))
+        _, expected = store.view("binance", pair, timeframe)
+        expected = {column: np.array(values) for column, values in expected.items()}
+        outage_rows = store.gap_report()["missing"].sum()
+
+        punch_holes(store, timeframe, random)
+        missing = store.gap_report()["missing"].sum()
+        repair_requests, repair_seconds, summary = requests_made(lambda: tod.repair_gaps(store))
+        _, repaired = store.view("binance", pair, timeframe)
+        for column in store.columns:
+            assert np.array_equal(repaired[column], expected[column], equal_nan=True)
+        assert summary["filled"].sum() == missing - outage_rows and summary["still_missing"].sum() == outage_rows
+        second_requests, _, _ = requests_made(lambda: tod.repair_gaps(store))
+        assert second_requests == 0
+
+        print(
+            f"{timeframe:4}{missing:9}{backfill_requests:6} req{backfill_seconds * 1000:7.0f}ms"
+            f"{repair_requests:6} req{repair_seconds * 1000:7.0f}ms{second_requests:11} req"
+        )
+
+
+if __name__ == "__main__":
+    main()
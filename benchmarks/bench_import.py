@@ -0,0 +1,73 @@
+"""Import and cold start time of token_ohlcv_download, measured with python -X importtime in fresh interpreters.
+"eager" imports requests, aiohttp, pandas, numpy, ccxt and ccxt.async_support first, which is what importing the module used to do; "lazy" is the package as it is now.
+Modules python imports at startup anyway (site, encodings ...) are left out. Cold starts: the command line's --help, and the first exchange class from the registry (which still has to import ccxt.async_support).
+Run from the repository root with: python -m benchmarks.bench_import"""
+
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import token_ohlcv_download as tod
+
+repeats = 5
+eager_imports = "import requests, aiohttp, pandas, numpy, ccxt, ccxt.async_support"
+
+
+def import_times(code):
+    """total and per top-level module import time (seconds) reported by -X importtime for one fresh interpreter running code"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):  # top-level imports only, nested ones are included in their cumulative time
+            modules[name.strip()] = int(cumulative) / 1e6
+    return sum(modules.values()), modules
+
+
+def median_import(code, startup):
+    """median import time of code, leaving out the modules the interpreter imports at startup anyway"""
+    runs = []
+    for _ in range(repeats):
+        _, modules = import_times(code)
+        runs.append({name: seconds for name, seconds in modules.items() if name not in startup})
+    return statistics.median(sum(run.values()) for run in runs), runs[-1]
+
+
+def median_wall(arguments):
+    seconds = []
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, capture_output=True, check=True)
+        seconds.append(time.perf_counter() - begin)
+    return statistics.median(seconds)
+
+
+def main():
+    compileall.compile_dir(os.path.dirname(tod.__file__), quiet=1)  # measure imports, not compiling
+
+    startup = set(import_times("pass")[1])
+    eager, eager_modules = median_import(f"{eager_imports}; import token_ohlcv_download", startup)
+    lazy, lazy_modules = median_import("import token_ohlcv_download", startup)
+    print(f"{'import token_ohlcv_download':36}{'eager':>10}{'lazy':>10}")
+    print(f"{'total (-X importtime, no startup)':36}{eager * 1000:8.1f}ms{lazy * 1000:8.1f}ms")
+    for name in sorted(eager_modules, key=eager_modules.get, reverse=True)[:8]:
+        print(f"  {name:34}{eager_modules[name] * 1000:8.1f}ms{lazy_modules.get(name, 0) * 1000:8.1f}ms")
+    print(f"reduction {eager / lazy:.1f} x")
+
+    interpreter = median_wall(["-c", "pass"])
+    help_eager = median_wall(["-c", f"{eager_imports}; import sys; sys.argv = ['', '--help']; import runpy; runpy.run_module('token_ohlcv_download', run_name='__main__')"])
+    help_lazy = median_wall(["-m", "token_ohlcv_download", "--help"])
+    first_exchange = median_wall(["-c", "import token_ohlcv_download as tod; tod.exchange_class('binance', 'async')"])
+    print(f"\ncold start (wall, python itself takes {interpreter * 1000:.0f} ms)")
+    print(f"{'--help, eager imports':36}{help_eager * 1000:8.0f}ms")
+    print(f"{'--help':36}{help_lazy * 1000:8.0f}ms")
+    print(f"{'first async exchange class':36}{first_exchange * 1000:8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
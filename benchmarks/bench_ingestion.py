@@ -0,0 +1,115 @@
+"""Ingestion of 1M raw candles (2000 pages of 500, like a long 1m pull from Binance) into the candles DataFrame: the previous row-by-row path vs candles_frame.
+Reports rows per second, the size of the resulting frame and the peak memory allocated while building it, both per row.
+Run from the repository root with: python -m benchmarks.bench_ingestion"""
+
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import token_ohlcv_download as tod
+
+candle_count = 1_000_000
+page_size = 500
+
+
+def row_by_row_frame(download, data_list):
+    """the ingestion candles_frame replaced: a Python list per candle, then a DataFrame of objects"""
+    data_list = [
+        i
+        for i in data_list
+        if i[0] / 1000 <= download["period_end_timestamp"] and i[0] / 1000 >= download["period_start_timestamp"]
+    ]
+    df_list = []
+    for itm in data_list:
+        df_list.append(
+            [
+                download["exchange_name"],
+                download["pair"],
+                download["base"],
+                download["quote"],
+                datetime.fromtimestamp(itm[0] / 1000, tz=timezone.utc),
+                (itm[1] + itm[4]) / 2,
+                itm[1],
+                itm[4],
+                itm[2],
+                itm[3],
+                itm[5],
+            ]
+        )
+    vol_data = pd.DataFrame(
+        df_list,
+        columns=["exchange_name", "pair", "base", "quote", "timestamp", "average_price", "open", "close", "high", "low", "volume_base"],
+    )
+    return vol_data.drop_duplicates().reset_index(drop=True)
+
+
+def synthetic_candles():
+    random = np.random.default_rng(0)
+    start = int(datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+    close = 100 * np.exp(np.cumsum(random.normal(0, 1e-3, candle_count)))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    spread = np.abs(random.normal(0, 1e-3, candle_count)) * close
+    candles = np.column_stack(
+        [
+            start + 60_000 * np.arange(candle_count),
+            open_,
+            np.maximum(open_, close) + spread,
+            np.minimum(open_, close) - spread,
+            close,
+            random.exponential(50, candle_count),
+        ]
+    )
+    rows = candles.tolist()
+    for row in rows:  # ccxt hands back int timestamps
+        row[0] = int(row[0])
+    return [rows[i : i + page_size] for i in range(0, candle_count, page_size)], start
+
+
+def measure(build):
+    begin = time.perf_counter()
+    frame = build()
+    seconds = time.perf_counter() - begin
+    frame_bytes = frame.memory_usage(deep=True).sum()
+    del frame
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, frame_bytes, peak
+
+
+def main():
+    pages, start = synthetic_candles()
+    data_list = [candle for page in pages for candle in page]
+    download = {
+        "exchange_name": "Binance",
+        "pair": "BTC/USDT",
+        "base": "BTC",
+        "quote": "USDT",
+        "period_start_timestamp": start / 1000 - 1,
+        "period_end_timestamp": start / 1000 + candle_count * 60 + 1,
+    }
+
+    expected = row_by_row_frame(download, data_list)
+    actual = tod.candles_frame(download, tod.ohlcv_array(pages))
+    for column in ["exchange_name", "pair", "base", "quote"]:
+        actual[column] = actual[column].astype(object)
+    assert actual.equals(expected), "candles_frame and the row-by-row path disagree"
+    del expected, actual
+
+    results = [
+        ("row by row", measure(lambda: row_by_row_frame(download, data_list))),
+        ("columnar (candles_frame)", measure(lambda: tod.candles_frame(download, tod.ohlcv_array(pages)))),
+    ]
+    print(f"{candle_count} candles in pages of {page_size}")
+    print(f"{'':26}{'rows/s':>14}{'frame bytes/row':>18}{'peak bytes/row':>17}")
+    for name, (seconds, frame_bytes, peak) in results:
+        print(f"{name:26}{candle_count / seconds:14,.0f}{frame_bytes / candle_count:18.1f}{peak / candle_count:17.1f}")
+    print(f"speed-up {results[0][1][0] / results[1][1][0]:.1f} x")
+
+
+if __name__ == "__main__":
+    main()
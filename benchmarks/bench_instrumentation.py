@@ -0,0 +1,78 @@
+"""Cost of the instrumentation (enable_metrics): ohlcv_data_download of 30 days of 1m ETH/BTC candles, replayed without latency from the Binance emulator of bench_pipeline, with metrics off and on.
+Also times a bare stage() / count() call while off, and prints the Prometheus snapshot of one instrumented run.
+Run from the repository root with: python -m benchmarks.bench_instrumentation"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import ccxt
+
+import token_ohlcv_download as tod
+from benchmarks.bench_pipeline import binance_emulator, emulated_market, emulated_markets, period_end
+from benchmarks.replay import Cassette
+
+days = 30
+repeats = 5
+calls = 1_000_000
+
+
+def best_of(function):
+    best = float("inf")
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    tod.market_cache_dir = os.path.join(folder, "markets")
+    exchange = ccxt.binance()
+    exchange.set_markets([emulated_market(symbol) for symbol in emulated_markets], {})
+    tod.write_market_cache("binance", exchange.markets, {})
+    tod.exchange_dict["binance"]["requests_per_second"] = 1e6
+    tod.exchange_dict["binance"]["burst"] = 1e6
+    end = datetime.fromisoformat(period_end).timestamp()
+    arguments = ("binance", "ETH/BTC", str(datetime.fromtimestamp(end - days * 24 * 3600, tz=timezone.utc)), period_end, "1m", 3600)
+
+    cassette_path = os.path.join(folder, "cassette.json")
+    with Cassette(cassette_path, mode="record", upstream=binance_emulator), contextlib.redirect_stdout(io.StringIO()):
+        tod.ohlcv_data_download(*arguments)
+
+    with Cassette(cassette_path):
+        tod.disable_metrics()
+        off = best_of(lambda: tod.ohlcv_data_download(*arguments))
+        tod.enable_metrics()
+        on = best_of(lambda: tod.ohlcv_data_download(*arguments))
+        tod.enable_metrics()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tod.ohlcv_data_download(*arguments)
+        prometheus = tod.metrics_prometheus()
+        tod.disable_metrics()
+
+    begin = time.perf_counter()
+    for _ in range(calls):
+        with tod.stage("paging", exchange="binance"):
+            pass
+    stage_off = (time.perf_counter() - begin) / calls
+    begin = time.perf_counter()
+    for _ in range(calls):
+        tod.count("rows_in", 500, function="build_ohlcv_output")
+    count_off = (time.perf_counter() - begin) / calls
+
+    print(f"ohlcv_data_download, {days} days of 1m ETH/BTC (+ BTC/USDT leg)")
+    print(f"metrics off {off * 1000:9.1f} ms")
+    print(f"metrics on  {on * 1000:9.1f} ms  ({(on - off) / off:+.1%})")
+    print(f"while off: stage() {stage_off * 1e9:.0f} ns, count() {count_off * 1e9:.0f} ns per call")
+    print("\nPrometheus snapshot of one run:")
+    print(prometheus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Live mode (LiveOHLCV) against a local WebSocket stand-in of an exchange's candle stream, with REST traffic from the Binance emulator of bench_pipeline.
+Like ccxt.pro with newUpdates, every watch_ohlcv call of the stand-in client returns only the candle that changed, so a candle can only be seen to close across calls.
+ETH/BTC and its conversion leg BTC/USDT stream 50 one-minute candles each (3 updates per candle, 10 ms apart), then go quiet. The ETH/BTC connection drops once and comes back 5 candles later; those have to be backfilled over REST and converted with the BTC/USDT price of their own time.
+Closing the stream while nothing arrives has to return straight away and close the client.
+Run from the repository root with: python -m benchmarks.bench_live"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit
+
+import aiohttp
+import ccxt
+import numpy as np
+from aiohttp import web
+
+import token_ohlcv_download as tod
+from benchmarks.bench_pipeline import binance_emulator, emulated_market, emulated_markets, emulated_prices, period_end
+from benchmarks.replay import Cassette
+
+port = 8799
+candle_count = 50
+updates_per_candle = 3
+interval = 0.01
+drop_at = 20  # the ETH/BTC connection drops before this candle ...
+skipped = 5  # ... and comes back this many candles later
+step = 60 * 1000
+first_timestamp = int(datetime.fromisoformat(period_end).timestamp() * 1000) - 10 * 24 * 3600 * 1000
+stream_prices = {"ETH/BTC": 0.05, "BTC/USDT": 60000.0}  # the REST emulator prices BTC/USDT around 65000
+
+
+async def stream(request):
+    """pushes the candles of one symbol, one updated candle per message, then stays quiet until the client leaves"""
+    symbol = request.query["symbol"]
+    socket = web.WebSocketResponse()
+    await socket.prepare(request)
+    state = request.app["positions"].setdefault(symbol, {"next": 0, "dropped": False})
+    while state["next"] < candle_count:
+        if symbol == "ETH/BTC" and state["next"] == drop_at and not state["dropped"]:
+            state["dropped"] = True
+            state["next"] += skipped
+            await socket.close()
+            return socket
+        timestamp = first_timestamp + state["next"] * step
+        price = stream_prices[symbol]
+        for update in range(updates_per_candle):
+            await socket.send_json([[timestamp, price, price, price, price, 1.0 + update]])
+            await asyncio.sleep(interval)
+        state["next"] += 1
+    async for _ in socket:
+        pass
+    return socket
+
+
+def serve():
+    """starts the stand-in on its own event loop thread"""
+    app = web.Application()
+    app["positions"] = {}
+    app.router.add_get("/ws", stream)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+
+class StandInClient:
+    """streaming client of the stand-in for LiveOHLCV's exchange_factory: watch_ohlcv returns the candles updated since the previous call (one per message), like ccxt.pro with newUpdates
+    One connection per symbol is shared by everything watching it, and every message wakes all of them, also like ccxt.pro"""
+
+    def __init__(self, url):
+        self.url = url
+        self.session = None
+        self.readers = {}  # symbol -> task reading its connection
+        self.waiters = {}  # symbol -> futures of the watch_ohlcv calls waiting for the next message
+        self.updates = {}  # symbol -> candles that came while nobody was waiting
+        self.closed = False
+
+    async def read(self, symbol):
+        error = ccxt.NetworkError(f"stand-in closed the {symbol} stream")
+        try:
+            async with self.session.ws_connect(f"{self.url}?symbol={quote(symbol)}") as socket:
+                async for message in socket:
+                    candles = json.loads(message.data)
+                    waiters = self.waiters.pop(symbol, [])
+                    if len(waiters) == 0:
+                        self.updates.setdefault(symbol, []).extend(candles)
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(candles)
+        except aiohttp.ClientError as e:
+            error = ccxt.NetworkError(repr(e))
+        finally:
+            del self.readers[symbol]
+        for waiter in self.waiters.pop(symbol, []):
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    async def watch_ohlcv(self, symbol, timeframe):
+        if self.updates.get(symbol):
+            return self.updates.pop(symbol)
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        if symbol not in self.readers:
+            self.readers[symbol] = asyncio.ensure_future(self.read(symbol))
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(symbol, []).append(waiter)
+        return await waiter
+
+    async def close(self):
+        readers = list(self.readers.values())
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+        self.closed = True
+
+
+def rest_emulator(method, url, body):
+    """binance_emulator, with requests for the latest candles (no startTime) answered from the start of the stream"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.setdefault("startTime", str(first_timestamp))
+    return binance_emulator(method, f"{parts.scheme}://{parts.netloc}{parts.path}?{urlencode(query)}", body)
+
+
+def emulated_rate(timestamps):
+    """the BTC/USDT leg price of the emulator at timestamps, (open + close) / 2 like conversion_rates"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    price = emulated_prices["BTCUSDT"] * (1 + 0.05 * np.sin(timestamps / 8.64e8) + 0.001 * np.cos(timestamps / 7e5))
+    return (np.round(price, 8) + np.round(price * 1.0002, 8)) / 2
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    tod.market_cache_dir = os.path.join(folder, "markets")
+    exchange = ccxt.binance()
+    exchange.set_markets([emulated_market(symbol) for symbol in emulated_markets], {})
+    tod.write_market_cache("binance", exchange.markets, {})
+    tod.exchange_dict["binance"]["requests_per_second"] = 1e6
+    tod.exchange_dict["binance"]["burst"] = 1e6
+    tod._rate_limiters.pop("binance", None)
+    serve()
+
+    client = StandInClient(f"http://127.0.0.1:{port}/ws")
+    live = tod.LiveOHLCV([("binance", "ETH/BTC"), ("binance", "BTC/USDT")], "1m", exchange_factory=lambda exchange_id: client, reconnect_delay=0.05)
+    outputs = []
+    with Cassette(os.path.join(folder, "cassette.json"), mode="record", upstream=rest_emulator), contextlib.redirect_stdout(io.StringIO()):
+        begin = time.perf_counter()
+        candles = live.stream()
+        for output in candles:
+            outputs.append(output)
+            if sum(len(output) for output in outputs) == 2 * (candle_count - 1):  # the last candle of each stream never closes
+                break
+        streaming_seconds = time.perf_counter() - begin
+        time.sleep(0.2)  # both streams are quiet now
+        begin = time.perf_counter()
+        candles.close()
+        close_seconds = time.perf_counter() - begin
+
+    stats = live.latency_stats().set_index("pair")
+    print(f"{candle_count} candles per stream, {updates_per_candle} updates each, one update per watch_ohlcv call")
+    print(f"{'pair':10}{'rows':>6}{'streamed':>10}{'backfilled':>12}{'reconnects':>12}")
+    for pair in ("ETH/BTC", "BTC/USDT"):
+        rows = sum(len(output) for output in outputs if output["pair"].iloc[0] == pair)
+        print(f"{pair:10}{rows:6}{stats.loc[pair, 'candles']:10}{stats.loc[pair, 'backfilled']:12}{stats.loc[pair, 'reconnects']:12}")
+    print(f"streaming took {streaming_seconds:.2f} s, closing the quiet stream {close_seconds * 1000:.0f} ms")
+
+    eth_btc = [output for output in outputs if output["pair"].iloc[0] == "ETH/BTC"]
+    timestamps = np.concatenate([output["timestamp"].values.astype("datetime64[ms]").astype(np.int64) for output in eth_btc])
+    rates = np.concatenate([output["quote_currency_price_usdt"].to_numpy(dtype=np.float64) for output in eth_btc])
+    assert np.array_equal(timestamps, first_timestamp + step * np.arange(candle_count - 1))
+    backfilled = (timestamps >= first_timestamp + (drop_at - 1) * step) & (timestamps < first_timestamp + (drop_at + skipped) * step)
+    backfilled &= ~np.isin(timestamps, first_timestamp + (drop_at - 1) * step)  # the candle open when the connection dropped was streamed
+    assert stats.loc["ETH/BTC", "backfilled"] == skipped
+    assert np.allclose(rates[backfilled], emulated_rate(timestamps[backfilled]), rtol=1e-9)
+    assert np.all(rates[~backfilled] == stream_prices["BTC/USDT"])
+    assert client.closed and close_seconds < 1
+
+
+if __name__ == "__main__":
+    main()
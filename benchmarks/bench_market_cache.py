@@ -0,0 +1,100 @@
+"""Cold vs warm timings of the market metadata cache, using a stubbed exchange that takes 0.5s to serve its markets.
+Run from the repository root with: python -m benchmarks.bench_market_cache"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import ccxt
+import ccxt.async_support
+
+import token_ohlcv_download as tod
+
+market_count = 3000
+markets_latency = 0.5  # seconds a real exchange typically needs to serve a multi-megabyte markets response
+
+
+def stub_markets():
+    markets = []
+    for i in range(market_count):
+        base = f"TOKEN{i}"
+        markets.append(
+            {
+                "id": f"{base}USDT",
+                "symbol": f"{base}/USDT",
+                "base": base,
+                "quote": "USDT",
+                "baseId": base,
+                "quoteId": "USDT",
+                "type": "spot",
+                "spot": True,
+                "active": True,
+                "info": {"symbol": f"{base}USDT", "status": "TRADING", "filters": [{"minQty": "0.1"}] * 5},
+            }
+        )
+    return markets
+
+
+class StubExchange(ccxt.Exchange):
+    id = "stubexchange"
+
+    def fetch_markets(self, params={}):
+        time.sleep(markets_latency)
+        return stub_markets()
+
+
+class StubExchangeAsync(ccxt.async_support.Exchange):
+    id = "stubexchange"
+
+    async def fetch_markets(self, params={}):
+        await asyncio.sleep(markets_latency)
+        return stub_markets()
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    ccxt.stubexchange = StubExchange
+    ccxt.async_support.stubexchange = StubExchangeAsync
+    tod.market_cache_dir = tempfile.mkdtemp()
+
+    def load_sync():
+        tod.load_markets_cached(tod.get_exchange("stubexchange"))
+
+    def load_async():
+        async def load():
+            await tod.load_markets_cached_async(tod.get_exchange("stubexchange", asynchronous=True))
+
+        tod.run_coroutine(load())
+
+    def forget_instances():
+        tod.close_exchanges()
+
+    def forget_memory():
+        forget_instances()
+        tod._market_cache.clear()
+
+    results = []
+    for name, load in (("sync", load_sync), ("async", load_async)):
+        tod.clear_market_cache()
+        forget_instances()
+        results.append((name, "cold (network)", timed(load)))
+        forget_memory()
+        results.append((name, "warm (disk cache)", timed(load)))
+        forget_instances()
+        results.append((name, "warm (memory cache)", timed(load)))
+        results.append((name, "warm (reused instance)", timed(load)))
+
+    cache_file = os.path.join(tod.market_cache_dir, "stubexchange.json")
+    print(f"{market_count} markets, {os.path.getsize(cache_file) / 1e6:.1f} MB on disk, {markets_latency}s stubbed network latency")
+    for name, case, seconds in results:
+        print(f"{name:6} {case:24} {seconds * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
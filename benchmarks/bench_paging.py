@@ -0,0 +1,82 @@
+"""Sequential vs concurrent paging of fetch_ohlcv_windows and iter_ohlcv_pages, driven directly with a fake exchange that serves canned pages of 1m candles after a per-page latency.
+Latencies vary from page to page, so concurrent pages come back out of order; the stitched candles have to be exactly what paging one page at a time returns.
+Run from the repository root with: python -m benchmarks.bench_paging"""
+
+import asyncio
+import time
+
+import numpy as np
+
+import token_ohlcv_download as tod
+
+pair = "BTC/USDT"
+timeframe = "1m"
+limit = 500
+candle_count = 40_000  # the last page comes back short
+latencies = (0.02, 0.06)  # seconds per page, uniform
+first_timestamp = 1_735_689_600_000  # 2025-01-01 00:00 UTC
+step = 60 * 1000
+
+
+class FakeExchange:
+    """async fetch_ohlcv serving canned pages of candle_count 1m candles, each after its own latency (seeded, so every run sees the same ones)"""
+
+    id = "fake_paging"
+    rateLimit = 50  # ms, lets concurrency_limit put 20 pages in flight
+
+    def __init__(self):
+        timestamps = first_timestamp + step * np.arange(candle_count)
+        prices = 100 + np.cumsum(np.random.default_rng(0).normal(0, 0.1, candle_count))
+        self.candles = np.column_stack([timestamps, prices, prices + 0.1, prices - 0.1, prices + 0.05, np.full(candle_count, 3.0)]).tolist()
+        self.latency = dict(zip(range(0, candle_count, limit), np.random.default_rng(1).uniform(*latencies, candle_count // limit + 1)))
+        self.calls = 0
+
+    async def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None, params={}):
+        self.calls += 1
+        first = max(0, -(-(since - first_timestamp) // step))
+        await asyncio.sleep(self.latency.get(first, latencies[0]))
+        return self.candles[first : first + limit]
+
+
+async def sequential(exchange, since_list):
+    """one page at a time, like the download loop before pages were fetched concurrently"""
+    candles = []
+    for since in since_list:
+        candles.extend(await exchange.fetch_ohlcv(pair, timeframe=timeframe, since=since, limit=limit))
+    return candles
+
+
+async def windows(exchange, since_list):
+    return await tod.fetch_ohlcv_windows(exchange, pair, timeframe, since_list, limit)
+
+
+async def pages(exchange, since_list):
+    return [candle for page in [page async for page in tod.iter_ohlcv_pages(exchange, pair, timeframe, since_list, limit)] for candle in page]
+
+
+def timed(coroutine):
+    begin = time.perf_counter()
+    result = tod.run_coroutine(coroutine)
+    return result, time.perf_counter() - begin
+
+
+def main():
+    tod._rate_limiters[FakeExchange.id] = tod.RateLimiter(1e6, capacity=1e6)  # only the page latency counts
+    exchange = FakeExchange()
+    start = first_timestamp / 1000
+    since_list = tod.plan_ohlcv_windows(start, start + candle_count * 60, limit, tod.candle_duration_to_seconds[timeframe])
+
+    expected, sequential_seconds = timed(sequential(exchange, since_list))
+    print(f"{len(since_list)} pages of {limit} {timeframe} candles, {latencies[0] * 1000:.0f}-{latencies[1] * 1000:.0f} ms each, {tod.concurrency_limit(exchange)} in flight")
+    print(f"{'':22}{'seconds':>8}{'speedup':>9}")
+    print(f"{'sequential':22}{sequential_seconds:8.2f}{1:9.1f}")
+    assert len(expected) == candle_count
+    for name, paging in (("fetch_ohlcv_windows", windows), ("iter_ohlcv_pages", pages)):
+        exchange.calls = 0
+        candles, seconds = timed(paging(exchange, since_list))
+        assert candles == expected and exchange.calls == len(since_list)
+        print(f"{name:22}{seconds:8.2f}{sequential_seconds / seconds:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Throughput of the ohlcv_data_download pipeline on replayed exchange traffic (see benchmarks/replay.py), stage by stage: paging, quote conversion, resampling and file writing, plus the whole download.
+Two jobs of 60 days of 1m candles into 1h output: BTC/USDT (no conversion) and ETH/BTC (BTC converted to USDT through BTC/USDT).
+Without --cassette the traffic comes from an emulator of Binance's klines endpoint, recorded to a temporary cassette first. With --cassette a recorded file is replayed, and with --record it is recorded from the live exchange first.
+The exchange's rate limit is lifted while replaying so the numbers measure the pipeline, not the RateLimiter.
+Results can be written as JSON (--json) and compared to an earlier run (--baseline): any stage that got more than --tolerance slower makes the run exit with status 1.
+Run from the repository root with: python -m benchmarks.bench_pipeline [--json results.json] [--baseline baseline.json]"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+import token_ohlcv_download as tod
+from benchmarks.replay import Cassette
+
+jobs = [("binance", "BTC/USDT"), ("binance", "ETH/BTC")]
+period_end = "2024-06-01 00:00:00+00:00"
+repeats = 3
+emulated_markets = ["BTC/USDT", "ETH/BTC", "ETH/USDT"]
+emulated_prices = {"BTCUSDT": 65000.0, "ETHBTC": 0.05, "ETHUSDT": 3200.0}
+
+
+def emulated_market(symbol):
+    base, quote = symbol.split("/")
+    return {
+        "id": base + quote, "symbol": symbol, "base": base, "quote": quote, "baseId": base, "quoteId": quote, "settle": None,
+        "type": "spot", "spot": True, "margin": False, "swap": False, "future": False, "option": False, "contract": False,
+        "linear": None, "inverse": None, "active": True, "precision": {"amount": 1e-8, "price": 1e-8}, "limits": {}, "info": {},
+    }
+
+
+def binance_emulator(method, url, body):
+    """answers GET /api/v3/klines like Binance, with a deterministic random walk per symbol"""
+    parts = urlsplit(url)
+    if not parts.path.endswith("/klines"):
+        return 404, json.dumps({"code": -1, "msg": f"not emulated: {parts.path}"})
+    query = dict(parse_qsl(parts.query))
+    step = tod.candle_duration_to_seconds[query["interval"]] * 1000
+    first = -(-int(query["startTime"]) // step) * step
+    timestamps = first + step * np.arange(int(query.get("limit", 500)), dtype=np.int64)
+    price = emulated_prices[query["symbol"]] * (1 + 0.05 * np.sin(timestamps / 8.64e8) + 0.001 * np.cos(timestamps / 7e5))
+    rows = [
+        [int(timestamp), f"{p:.8f}", f"{p * 1.001:.8f}", f"{p * 0.999:.8f}", f"{p * 1.0002:.8f}", f"{1 + timestamp % 97:.4f}", int(timestamp + step - 1), "0", 10, "0", "0", "0"]
+        for timestamp, p in zip(timestamps, price)
+    ]
+    return 200, json.dumps(rows)
+
+
+def timed(function):
+    """best time of repeats runs, and the last result"""
+    best = float("inf")
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function()
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def run_job(exchange_id, pair, period_start, folder):
+    """measures every stage of one download, returns a list of result dicts"""
+    arguments = (exchange_id, pair, period_start, period_end, "1m", 3600)
+    download = tod.prepare_download(*arguments)
+
+    paging_seconds, (data_list, quote_legs) = timed(lambda: tod.run_coroutine(tod.download_job(download, None, {})))
+    raw_rows = len(data_list) + sum(len(leg) for leg, _ in quote_legs or [])
+
+    def convert():
+        vol_data = tod.candles_frame(download, data_list)
+        if quote_legs is None:
+            vol_data["quote_currency_price_usdt"] = 1
+        else:
+            vol_data["quote_currency_price_usdt"], _ = tod.conversion_rates(
+                vol_data["timestamp"].values.astype("datetime64[ms]").astype(np.int64), quote_legs
+            )
+        return tod.add_usdt_columns(vol_data)
+
+    conversion_seconds, vol_data = timed(convert)
+    resampling_seconds, output = timed(lambda: tod.resample_output(download, vol_data))
+
+    def write():
+        output.to_csv(os.path.join(folder, "output.csv"), index=False)
+        store = tod.CandleStore(tempfile.mkdtemp(dir=folder))
+        store.append(exchange_id, pair, "1m", data_list)
+
+    writing_seconds, _ = timed(write)
+    total_seconds, total = timed(lambda: tod.ohlcv_data_download(*arguments))
+    assert total.equals(output)
+
+    job = f"{exchange_id} {pair}"
+    return [
+        {"job": job, "stage": stage, "seconds": seconds, "rows": rows, "rows_per_second": rows / seconds}
+        for stage, seconds, rows in [
+            ("paging", paging_seconds, raw_rows),
+            ("quote conversion", conversion_seconds, len(vol_data)),
+            ("resampling", resampling_seconds, len(vol_data)),
+            ("file writing", writing_seconds, len(data_list)),
+            ("ohlcv_data_download", total_seconds, raw_rows),
+        ]
+    ]
+
+
+def regressions(results, baseline, tolerance):
+    """stages whose throughput dropped by more than tolerance compared to baseline"""
+    previous = {(row["job"], row["stage"]): row["rows_per_second"] for row in baseline["results"]}
+    slower = []
+    for row in results:
+        before = previous.get((row["job"], row["stage"]))
+        if before is not None and row["rows_per_second"] < before * (1 - tolerance):
+            slower.append(f"{row['job']} {row['stage']}: {before:,.0f} -> {row['rows_per_second']:,.0f} rows/s")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--cassette", help="recorded traffic to replay, instead of the Binance emulator")
+    parser.add_argument("--record", action="store_true", help="record --cassette from the live exchange first")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every replayed response")
+    parser.add_argument("--jitter", type=float, default=0.01, help="up to this many seconds more, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of replayed requests that fail as throttled")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slow-down that counts as a regression")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    tod.market_cache_dir = os.path.join(folder, "markets")
+    tod.clear_market_cache()
+    end = datetime.fromisoformat(period_end).timestamp()
+    period_start = str(datetime.fromtimestamp(end - args.days * 24 * 3600, tz=timezone.utc))
+
+    cassette_path = args.cassette
+    if cassette_path is None:  # synthetic traffic, with market metadata already in the cache
+        exchange = ccxt.binance()
+        exchange.set_markets([emulated_market(symbol) for symbol in emulated_markets], {})
+        tod.write_market_cache("binance", exchange.markets, {})
+        cassette_path = os.path.join(folder, "cassette.json")
+        recording = Cassette(cassette_path, mode="record", upstream=binance_emulator)
+    elif args.record:
+        recording = Cassette(cassette_path, mode="record")
+    else:
+        recording = None
+    if recording is not None:
+        with recording, contextlib.redirect_stdout(io.StringIO()):
+            for exchange_id, pair in jobs:
+                tod.ohlcv_data_download(exchange_id, pair, period_start, period_end, "1m", 3600)
+
+    for exchange_id in {exchange_id for exchange_id, _ in jobs}:
+        tod.exchange_dict[exchange_id]["requests_per_second"] = 1e6
+        tod.exchange_dict[exchange_id]["burst"] = 1e6
+        tod._rate_limiters.pop(exchange_id, None)
+
+    results = []
+    with Cassette(cassette_path, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as cassette:
+        for exchange_id, pair in jobs:
+            results += run_job(exchange_id, pair, period_start, folder)
+
+    report = {
+        "benchmark": "pipeline",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__, "ccxt": ccxt.__version__, "machine": platform.machine()},
+        "settings": {"days": args.days, "latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate, "cassette": args.cassette},
+        "requests": cassette.stats,
+        "results": results,
+    }
+
+    print(f"{args.days} days of 1m candles, replayed with {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms latency and {args.error_rate:.0%} errors")
+    print(f"{'':20}{'stage':22}{'rows':>10}{'ms':>10}{'rows/s':>14}")
+    for row in results:
+        print(f"{row['job']:20}{row['stage']:22}{row['rows']:10}{row['seconds'] * 1000:10.1f}{row['rows_per_second']:14,.0f}")
+    print("requests:", cassette.stats)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["settings"] != report["settings"]:
+            print("the baseline was run with other settings:", baseline["settings"])
+        slower = regressions(results, baseline, args.tolerance)
+        for line in slower:
+            print("regression:", line)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
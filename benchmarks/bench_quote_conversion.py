@@ -0,0 +1,57 @@
+"""Quote-to-USDT conversion of a month of 1m candles (BTC/KRW style): match_finder per row vs asof_join.
+The quote series misses 10% of its candles, so match_finder often falls back to its min() over every key.
+That is too slow to run on the whole month, so its time is measured on a sample of rows and scaled up.
+Run from the repository root with: python -m benchmarks.bench_quote_conversion"""
+
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import token_ohlcv_download as tod
+
+minutes = 30 * 24 * 60
+missing_share = 0.1
+sample_size = 300
+
+
+def main():
+    random = np.random.default_rng(0)
+    start = int(datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp() * 1000)
+    timestamps = start + 60_000 * np.arange(minutes, dtype=np.int64)
+    quote_timestamps = timestamps[random.random(minutes) > missing_share]
+    quote_prices = 1 / (1350 + random.normal(0, 5, len(quote_timestamps)))
+
+    candle_times = pd.Series(pd.to_datetime(timestamps, unit="ms", utc=True))
+    quote_dict = {
+        datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc): price
+        for timestamp, price in zip(quote_timestamps.tolist(), quote_prices.tolist())
+    }
+
+    sample = np.sort(random.choice(minutes, sample_size, replace=False))
+    begin = time.perf_counter()
+    expected = candle_times.iloc[sample].apply(lambda x: tod.match_finder(x, quote_dict))
+    match_finder_seconds = (time.perf_counter() - begin) * minutes / sample_size
+
+    begin = time.perf_counter()
+    values, outside_tolerance = tod.asof_join(
+        candle_times.values.astype("datetime64[ms]").astype(np.int64), quote_timestamps, quote_prices
+    )
+    asof_join_seconds = time.perf_counter() - begin
+
+    _, without_exact_match = tod.asof_join(timestamps, quote_timestamps, quote_prices, "backward", 0)
+    _, outside_one_minute = tod.asof_join(timestamps, quote_timestamps, quote_prices, "backward", 60_000)
+
+    assert np.array_equal(values[sample], expected.to_numpy()), "asof_join and match_finder disagree"
+    assert outside_tolerance == 0
+    print(f"{minutes} candles, {len(quote_timestamps)} quote prices ({missing_share:.0%} missing)")
+    print(f"match_finder (estimated from {sample_size} rows) {match_finder_seconds:10.2f} s")
+    print(f"asof_join                                {asof_join_seconds * 1000:10.2f} ms")
+    print(f"speed-up                                 {match_finder_seconds / asof_join_seconds:10.0f} x")
+    print(f"rows without an exact quote price (backward, tolerance 0): {without_exact_match}")
+    print(f"rows whose last quote price is more than a minute old (backward, tolerance 60 s): {outside_one_minute}")
+
+
+if __name__ == "__main__":
+    main()
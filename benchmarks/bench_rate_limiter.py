@@ -0,0 +1,147 @@
+"""RateLimiter on a simulated clock: burst, refill, throttle pause and the requests / wait_time counters, for acquire_sync, acquire and the shared limiters of get_rate_limiter (through rate_limited and fetch_ohlcv_windows).
+Every sleep only moves the simulated clock forward, so minutes of rate limiting take milliseconds, and a limiter that sleeps for real instead hangs the check.
+Run from the repository root with: python -m benchmarks.bench_rate_limiter"""
+
+import asyncio
+import heapq
+import math
+import time
+
+import token_ohlcv_download as tod
+
+rate = 10.0
+capacity = 5
+requests = 25
+pages = 40
+page_rate_limit = 500  # ms, so the shared limiter allows 2 requests per second with a burst of 2
+
+
+class SimulatedClock:
+    """clock, async sleep and sleep_sync for a RateLimiter. Async sleepers wake in the order of their wake up time, each once every task that can still run is asleep too"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeping = []
+        self.sequence = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep_sync(self, seconds):
+        self.now += seconds
+
+    async def sleep(self, seconds):
+        self.sequence += 1
+        entry = (self.now + seconds, self.sequence)
+        heapq.heappush(self.sleeping, entry)
+        while True:
+            for _ in range(5):
+                await asyncio.sleep(0)
+            if self.sleeping[0] == entry:
+                break
+        heapq.heappop(self.sleeping)
+        self.now = max(self.now, entry[0])
+
+
+def new_limiter(clock):
+    return tod.RateLimiter(rate, capacity=capacity, clock=clock, sleep=clock.sleep, sleep_sync=clock.sleep_sync)
+
+
+def check_sync():
+    clock = SimulatedClock()
+    limiter = new_limiter(clock)
+    for _ in range(capacity):
+        limiter.acquire_sync()
+    assert clock.now == 0 and limiter.wait_time == 0  # the burst goes out straight away
+    for _ in range(requests - capacity):
+        limiter.acquire_sync()
+    refill = (requests - capacity) / rate
+    assert math.isclose(clock.now, refill) and math.isclose(limiter.wait_time, refill)
+    assert limiter.stats()["requests"] == requests
+
+    clock.sleep_sync(60)  # a long pause only refills up to capacity
+    began = clock.now
+    for _ in range(capacity + 1):
+        limiter.acquire_sync()
+    assert math.isclose(clock.now - began, 1 / rate)
+
+    limiter.throttled()
+    began = clock.now
+    limiter.acquire_sync()  # waits out the cooldown, then for a token at half the rate
+    assert math.isclose(clock.now - began, tod.throttle_cooldown + 2 / rate)
+    assert limiter.stats()["throttles"] == 1 and limiter.rate == rate / 2
+    assert math.isclose(limiter.wait_time, refill + 1 / rate + tod.throttle_cooldown + 2 / rate)
+    return clock.now, limiter.wait_time
+
+
+def check_async():
+    clock = SimulatedClock()
+    limiter = new_limiter(clock)
+
+    async def acquire_all():
+        begin = asyncio.get_running_loop().time()
+        await asyncio.gather(*(limiter.acquire() for _ in range(requests)))
+        return asyncio.get_running_loop().time() - begin
+
+    tod.run_coroutine(acquire_all())
+    refill = (requests - capacity) / rate
+    # every waiting task counts its own wait: the n-th request after the burst waits n / rate
+    waits = sum(n / rate for n in range(1, requests - capacity + 1))
+    assert math.isclose(clock.now, refill) and limiter.stats()["requests"] == requests
+    assert math.isclose(limiter.wait_time, waits)
+    return clock.now, limiter.wait_time
+
+
+class SimulatedExchange:
+    """serves an empty page on every fetch_ohlcv, straight away"""
+
+    id = "simulated"
+    rateLimit = page_rate_limit
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetch_ohlcv_sync(self, pair, timeframe=None, since=None, limit=None):
+        self.calls += 1
+        return [[since, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+    async def fetch_ohlcv(self, pair, timeframe=None, since=None, limit=None):
+        return self.fetch_ohlcv_sync(pair, timeframe, since, limit)
+
+
+def check_shared():
+    clock = SimulatedClock()
+    tod.rate_limiter_clock = (clock, clock.sleep, clock.sleep_sync)
+    tod._rate_limiters.pop(SimulatedExchange.id, None)
+    exchange = SimulatedExchange()
+    try:
+        since_list = list(range(pages))
+        candles = tod.run_coroutine(tod.fetch_ohlcv_windows(exchange, "BTC/USDT", "1m", since_list, 1))
+        assert [candle[0] for candle in candles] == since_list
+        shared_rate = 1000 / page_rate_limit
+        assert math.isclose(clock.now, (pages - int(shared_rate)) / shared_rate)
+        began = clock.now
+        for since in range(10):
+            tod.rate_limited(exchange, exchange.fetch_ohlcv_sync, "BTC/USDT", since=since)
+        assert math.isclose(clock.now - began, 10 / shared_rate)
+        stats = tod._rate_limiters[SimulatedExchange.id].stats()
+        assert stats["requests"] == pages + 10 and exchange.calls == pages + 10
+        return clock.now, stats["wait_time"]
+    finally:
+        tod.rate_limiter_clock = None
+        tod._rate_limiters.pop(SimulatedExchange.id, None)
+
+
+def main():
+    print(f"{rate:g} requests per second, burst of {capacity}, {requests} requests; shared limiter: {pages} pages then 10 sync requests")
+    print(f"{'':8}{'simulated s':>13}{'wait_time s':>13}{'real ms':>9}")
+    for name, check in (("sync", check_sync), ("async", check_async), ("shared", check_shared)):
+        begin = time.perf_counter()
+        simulated, wait_time = check()
+        real = time.perf_counter() - begin
+        assert real < 1  # nothing slept for real
+        print(f"{name:8}{simulated:13.2f}{wait_time:13.2f}{real * 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
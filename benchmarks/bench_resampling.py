@@ -0,0 +1,104 @@
+"""Resampling 30 days of 1s candles into 1h output candles: the previous pd.Grouper + agg (with lambda sums) vs resample_output.
+About 5% of the seconds have no candle and one hour has none at all, so both have to produce an empty output candle.
+Run from the repository root with: python -m benchmarks.bench_resampling"""
+
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import token_ohlcv_download as tod
+
+seconds = 30 * 24 * 3600
+output_seconds = 3600
+
+
+def grouper_resample(download, vol_data):
+    """the resampling resample_output replaced"""
+    vol_data_by_time = vol_data.groupby(
+        pd.Grouper(key="timestamp", freq=f"{download['output_seconds']}s", closed="left", label="left")
+    ).agg(
+        {
+            "exchange_name": "last",
+            "pair": "last",
+            "base": "last",
+            "quote": "last",
+            "average_price": "mean",
+            "open": "first",
+            "close": "last",
+            "high": "max",
+            "low": "min",
+            "volume_base": lambda x: x.sum(min_count=1),
+            "quote_currency_price_usdt": "mean",
+            "average_price_usdt": "mean",
+            "open_usdt": "first",
+            "close_usdt": "last",
+            "high_usdt": "max",
+            "low_usdt": "min",
+            "volume_usdt": lambda x: x.sum(min_count=1),
+        }
+    )
+    vol_data_by_time["timestamp"] = vol_data_by_time.index
+    vol_data_by_time["timestamp"] = vol_data_by_time["timestamp"].dt.tz_localize(None)
+    vol_data_by_time = vol_data_by_time.reset_index(drop=True)
+    fill = {column: np.nan for column in tod.output_aggregations}
+    fill.update(
+        exchange_name=download["exchange_name"], pair=download["pair"], base=download["base"], quote=download["quote"], volume_base=0
+    )
+    vol_data_by_time = vol_data_by_time.fillna(fill)
+    for column in ["exchange_name", "pair", "base", "quote"]:
+        vol_data_by_time[column] = vol_data_by_time[column].astype(object)
+    return vol_data_by_time
+
+
+def synthetic_candles(start):
+    random = np.random.default_rng(0)
+    timestamps = start + 1000 * np.arange(seconds)
+    keep = random.random(seconds) > 0.05
+    keep[(timestamps - start) // 3_600_000 == 100] = False
+    close = 100 * np.exp(np.cumsum(random.normal(0, 1e-4, seconds)))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    spread = np.abs(random.normal(0, 1e-4, seconds)) * close
+    candles = np.column_stack(
+        [timestamps, open_, np.maximum(open_, close) + spread, np.minimum(open_, close) - spread, close, random.exponential(5, seconds)]
+    )
+    return candles[keep]
+
+
+def main():
+    start = int(datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp() * 1000)
+    candles = synthetic_candles(start)
+    download = {
+        "exchange_name": "Upbit",
+        "pair": "BTC/KRW",
+        "base": "BTC",
+        "quote": "KRW",
+        "output_seconds": output_seconds,
+        "period_start_timestamp": start / 1000 - 1,
+        "period_end_timestamp": start / 1000 + seconds + 1,
+    }
+    vol_data = tod.candles_frame(download, candles)
+    vol_data["quote_currency_price_usdt"] = 1 / (1350 + np.sin(np.arange(len(vol_data)) / 5000))
+    vol_data = tod.add_usdt_columns(vol_data)
+
+    begin = time.perf_counter()
+    expected = grouper_resample(download, vol_data)
+    grouper_seconds = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    actual = tod.resample_output(download, vol_data)
+    kernel_seconds = time.perf_counter() - begin
+
+    numeric = list(tod.output_aggregations)
+    assert actual.drop(columns=numeric).equals(expected.drop(columns=numeric))
+    assert np.allclose(actual[numeric].values, expected[numeric].values, rtol=1e-12, atol=0, equal_nan=True)
+
+    print(f"{len(vol_data)} 1s candles -> {len(actual)} 1h candles ({int(actual['open'].isna().sum())} empty)")
+    print(f"pd.Grouper + agg   {grouper_seconds * 1000:9.1f} ms {len(vol_data) / grouper_seconds:14,.0f} rows/s")
+    print(f"resample_output    {kernel_seconds * 1000:9.1f} ms {len(vol_data) / kernel_seconds:14,.0f} rows/s")
+    print(f"speed-up {grouper_seconds / kernel_seconds:.1f} x")
+
+
+if __name__ == "__main__":
+    main()
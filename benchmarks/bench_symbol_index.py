@@ -0,0 +1,88 @@
+"""Symbol discovery across 11 exchanges of 3000 markets each: ticker_finder's previous linear scan of exchange.symbols vs SymbolIndex.lookup.
+Also lists what each one matches for a few tricky bases (T, PEPE, 1INCH), where the scan's '1000' substring heuristic went wrong.
+Run from the repository root with: python -m benchmarks.bench_symbol_index"""
+
+import time
+
+import numpy as np
+
+import token_ohlcv_download as tod
+
+exchange_count = 11
+market_count = 3000
+repeats = 200
+tricky = [("PEPE", "USDT", "spot"), ("PEPE", "USDT", "swap"), ("1000PEPE", "USDT", "swap"), ("T", "USDT", "spot"), ("1INCH", "USDT", "spot"), ("SATS", "USDT", "swap")]
+
+
+def synthetic_markets(seed):
+    random = np.random.default_rng(seed)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    bases = {"".join(random.choice(letters, random.integers(2, 6))) for _ in range(market_count)}
+    bases = sorted(bases - {"T", "PEPE", "SATS"}) + ["BTC", "MATIC", "PEPE", "T", "1INCH"]
+    markets = {}
+    for base in bases:
+        markets[f"{base}/USDT"] = {"base": base, "quote": "USDT", "type": "spot"}
+        if len(markets) >= market_count - 4:
+            break
+    markets["1000PEPE/USDT:USDT"] = {"base": "1000PEPE", "quote": "USDT", "type": "swap", "settle": "USDT", "contractSize": 1}
+    markets["1000SATS/USDT:USDT"] = {"base": "1000SATS", "quote": "USDT", "type": "swap", "settle": "USDT", "contractSize": 1}
+    markets["PEPE/USDT"] = {"base": "PEPE", "quote": "USDT", "type": "spot"}
+    markets["T/USDT"] = {"base": "T", "quote": "USDT", "type": "spot"}
+    return markets
+
+
+def linear_scan(symbols, base_token):
+    """ticker_finder's previous matching"""
+    pairs = []
+    for item in symbols:
+        if "1000" not in item:
+            if base_token == item[: item.find("/")]:
+                pairs.append(item)
+        else:
+            if base_token in item[: item.find("/")]:
+                pairs.append(item)
+    return pairs
+
+
+def main():
+    markets = {f"exchange{i}": synthetic_markets(i) for i in range(exchange_count)}
+
+    begin = time.perf_counter()
+    index = tod.SymbolIndex()
+    for exchange_id, exchange_markets in markets.items():
+        index.add_markets(exchange_id, exchange_markets)
+    build_seconds = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for _ in range(repeats):
+        for exchange_markets in markets.values():
+            linear_scan(list(exchange_markets), "PEPE")
+    scan_seconds = (time.perf_counter() - begin) / repeats
+
+    begin = time.perf_counter()
+    for _ in range(repeats):
+        index.lookup("PEPE")
+    lookup_seconds = (time.perf_counter() - begin) / repeats
+
+    begin = time.perf_counter()
+    for _ in range(repeats):
+        index.lookup("PEPE", quote="USDT", market_type="swap")
+    filtered_seconds = (time.perf_counter() - begin) / repeats
+
+    print(f"{exchange_count} exchanges x {market_count} markets, index built in {build_seconds * 1000:.1f} ms")
+    print(f"linear scan, all exchanges     {scan_seconds * 1e6:10.1f} us")
+    print(f"SymbolIndex.lookup             {lookup_seconds * 1e6:10.1f} us")
+    print(f"SymbolIndex.lookup (filtered)  {filtered_seconds * 1e6:10.1f} us")
+    print(f"speed-up {scan_seconds / lookup_seconds:.0f} x")
+    assert lookup_seconds < 1e-3
+
+    print("\nmatches on exchange0")
+    symbols = list(markets["exchange0"])
+    for base, quote, market_type in tricky:
+        scanned = [symbol for symbol in linear_scan(symbols, base) if symbol.split("/")[1].split(":")[0] == quote]
+        found = [f"{entry['symbol']} x{entry['multiplier']}" for entry in index.lookup(base, quote, market_type, ["exchange0"])]
+        print(f"{base + ' ' + market_type:14} scan: {', '.join(scanned) or '-':44} index: {', '.join(found) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
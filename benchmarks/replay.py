@@ -0,0 +1,284 @@
+"""Record / replay of the HTTP traffic of token_ohlcv_download, so downloads can be benchmarked offline and reproducibly.
+Three doors are covered: ccxt's Exchange.fetch (sync and async, every exchange request including load_markets), requests (Coingecko) and aiohttp's ClientSession.get (CoinMarketCap).
+
+Record once against the real APIs, then replay as often as needed:
+
+    with Cassette("fixtures/binance_eth_btc.json", mode="record"):
+        tod.ohlcv_data_download("binance", "ETH/BTC", ...)
+
+    with Cassette("fixtures/binance_eth_btc.json", latency=0.05, jitter=0.02, error_rate=0.01):
+        tod.ohlcv_data_download("binance", "ETH/BTC", ...)
+
+A cassette is a JSON file mapping every request (method, url with sorted query parameters, body) to the responses it got, in order; a request made more often than recorded keeps getting its last response.
+While replaying, every response can be delayed by latency + random(0, jitter) seconds, and a share error_rate of the requests fail instead: throttled (http 429, or ccxt.RateLimitExceeded) or, with "network" in errors, a dropped connection.
+In record mode upstream can stand in for the network: a function (method, url, body) -> (status, response text), e.g. an emulator of an exchange, so fixtures can also be generated synthetically."""
+
+import asyncio
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+import ccxt
+import ccxt.async_support
+import requests
+
+_inside_ccxt = contextvars.ContextVar("inside_ccxt", default=False)  # ccxt.async_support talks through aiohttp too, only its fetch is recorded
+
+
+def request_key(method, url, params=None, body=None):
+    """Supporting function. Identifies a request independently of the order of its query parameters"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(key, str(value)) for key, value in params.items()]
+    key = f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(query)), ''))}"
+    if body:
+        key += f" {body if isinstance(body, str) else json.dumps(body, sort_keys=True)}"
+    return key
+
+
+class ReplayedResponse:
+    """Supporting class. The part of an aiohttp response that token_ohlcv_download reads"""
+
+    charset = "utf-8"
+
+    def __init__(self, status, text, headers):
+        self.status = status
+        self._text = text
+        self.headers = headers
+
+    async def read(self):
+        return self._text.encode(self.charset)
+
+    async def text(self):
+        return self._text
+
+    async def json(self, content_type=None):
+        return json.loads(self._text)
+
+
+class Cassette:
+    """Records or replays requests while it is entered (see the module docstring). stats counts requests, replayed and recorded responses and injected errors."""
+
+    def __init__(self, path, mode="replay", latency=0.0, jitter=0.0, error_rate=0.0, errors=("throttle",), seed=0, upstream=None):
+        if mode not in ("record", "replay"):
+            raise Exception(f"mode has to be record or replay, not {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.errors = list(errors)
+        self.random = random.Random(seed)
+        self.upstream = upstream
+        self.entries = {}  # request key -> list of responses
+        self.positions = {}  # request key -> next response to replay
+        self.stats = {"requests": 0, "replayed": 0, "recorded": 0, "injected_errors": 0}
+        self.lock = threading.Lock()
+        self.originals = {}
+        if mode == "replay":
+            with open(path) as f:
+                self.entries = json.load(f)["entries"]
+
+    def __enter__(self):
+        self.originals = {
+            "fetch": ccxt.Exchange.fetch,
+            "fetch_async": ccxt.async_support.Exchange.fetch,
+            "request": requests.Session.request,
+            "get": aiohttp.ClientSession.get,
+        }
+        cassette = self
+
+        def fetch(exchange, url, method="GET", headers=None, body=None):
+            return cassette.ccxt_fetch(exchange, url, method, headers, body)
+
+        async def fetch_async(exchange, url, method="GET", headers=None, body=None):
+            return await cassette.ccxt_fetch_async(exchange, url, method, headers, body)
+
+        def request(session, method, url, params=None, data=None, **kwargs):
+            return cassette.requests_request(session, method, url, params, data, **kwargs)
+
+        def get(session, url, params=None, **kwargs):
+            if _inside_ccxt.get():
+                return cassette.originals["get"](session, url, params=params, **kwargs)
+            return cassette.aiohttp_get(session, url, params, **kwargs)
+
+        ccxt.Exchange.fetch = fetch
+        ccxt.async_support.Exchange.fetch = fetch_async
+        requests.Session.request = request
+        aiohttp.ClientSession.get = get
+        return self
+
+    def __exit__(self, *exc_info):
+        ccxt.Exchange.fetch = self.originals["fetch"]
+        ccxt.async_support.Exchange.fetch = self.originals["fetch_async"]
+        requests.Session.request = self.originals["request"]
+        aiohttp.ClientSession.get = self.originals["get"]
+        if self.mode == "record":
+            self.save()
+        return False
+
+    def save(self):
+        """writes the recorded responses to path"""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"entries": self.entries}, f)
+        os.replace(temp_path, self.path)
+
+    def record(self, key, response):
+        """Supporting function."""
+        with self.lock:
+            self.entries.setdefault(key, []).append(response)
+            self.stats["recorded"] += 1
+
+    def replay(self, key):
+        """Supporting function. Next recorded response of key, or the injected error kind (throttle / network) when this request has to fail"""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats["injected_errors"] += 1
+                return self.random.choice(self.errors)
+            responses = self.entries.get(key)
+            if not responses:
+                raise Exception(f"no recorded response for {key}")
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            self.stats["replayed"] += 1
+            return responses[min(position, len(responses) - 1)]
+
+    def delay(self):
+        """Supporting function. Seconds the next response takes"""
+        with self.lock:
+            return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def call_upstream(self, method, url, body):
+        """Supporting function. (status, text) from the upstream emulator"""
+        status, text = self.upstream(method, url, body)
+        return {"status": status, "body": text, "headers": {}}
+
+    def ccxt_response(self, exchange, response):
+        """Supporting function. What ccxt's fetch returns (or raises) for a recorded or injected response"""
+        if response == "throttle":
+            raise ccxt.RateLimitExceeded(f"{exchange.id} injected throttle")
+        if response == "network":
+            raise ccxt.NetworkError(f"{exchange.id} injected connection error")
+        if "error" in response:
+            raise getattr(ccxt, response["error"], ccxt.ExchangeError)(response["message"])
+        if response["status"] != 200:
+            raise ccxt.ExchangeError(f"{exchange.id} {response['status']} {response['body']}")
+        return json.loads(response["body"])
+
+    def ccxt_fetch(self, exchange, url, method, headers, body):
+        """Supporting function. Replacement of ccxt.Exchange.fetch"""
+        key = f"{exchange.id} {request_key(method, url, body=body)}"
+        if self.mode == "replay":
+            response = self.replay(key)
+            time.sleep(self.delay())
+            return self.ccxt_response(exchange, response)
+        if self.upstream is not None:
+            response = self.call_upstream(method, url, body)
+            self.record(key, response)
+            return self.ccxt_response(exchange, response)
+        try:
+            result = self.originals["fetch"](exchange, url, method, headers, body)
+        except ccxt.BaseError as e:
+            self.record(key, {"error": type(e).__name__, "message": str(e)})
+            raise
+        self.record(key, {"status": 200, "body": json.dumps(result), "headers": {}})
+        return result
+
+    async def ccxt_fetch_async(self, exchange, url, method, headers, body):
+        """Supporting function. Replacement of ccxt.async_support.Exchange.fetch"""
+        key = f"{exchange.id} {request_key(method, url, body=body)}"
+        if self.mode == "replay":
+            response = self.replay(key)
+            await asyncio.sleep(self.delay())
+            return self.ccxt_response(exchange, response)
+        if self.upstream is not None:
+            response = self.call_upstream(method, url, body)
+            self.record(key, response)
+            return self.ccxt_response(exchange, response)
+        token = _inside_ccxt.set(True)
+        try:
+            result = await self.originals["fetch_async"](exchange, url, method, headers, body)
+        except ccxt.BaseError as e:
+            self.record(key, {"error": type(e).__name__, "message": str(e)})
+            raise
+        finally:
+            _inside_ccxt.reset(token)
+        self.record(key, {"status": 200, "body": json.dumps(result), "headers": {}})
+        return result
+
+    def requests_request(self, session, method, url, params, data, **kwargs):
+        """Supporting function. Replacement of requests.Session.request"""
+        key = request_key(method, url, params, data)
+        if self.mode == "replay":
+            response = self.replay(key)
+            time.sleep(self.delay())
+            if response == "network":
+                raise requests.ConnectionError(f"injected connection error for {url}")
+            if response == "throttle":
+                response = {"status": 429, "body": "", "headers": {"Retry-After": "0"}}
+        elif self.upstream is not None:
+            response = self.call_upstream(method, url, data)
+            self.record(key, response)
+        else:
+            real = self.originals["request"](session, method, url, params=params, data=data, **kwargs)
+            response = {"status": real.status_code, "body": real.text, "headers": {k: v for k, v in real.headers.items() if k == "Retry-After"}}
+            self.record(key, response)
+
+        replayed = requests.models.Response()
+        replayed.status_code = response["status"]
+        replayed._content = response["body"].encode()
+        replayed.encoding = "utf-8"
+        replayed.headers = requests.structures.CaseInsensitiveDict(response["headers"])
+        replayed.url = url
+        return replayed
+
+    def aiohttp_get(self, session, url, params, **kwargs):
+        """Supporting function. Replacement of aiohttp.ClientSession.get, returns something usable with async with and await"""
+        cassette = self
+        key = request_key("GET", url, params)
+
+        async def respond():
+            if cassette.mode == "replay":
+                response = cassette.replay(key)
+                await asyncio.sleep(cassette.delay())
+                if response == "network":
+                    raise aiohttp.ClientConnectionError(f"injected connection error for {url}")
+                if response == "throttle":
+                    response = {"status": 429, "body": "", "headers": {"Retry-After": "0"}}
+            elif cassette.upstream is not None:
+                response = cassette.call_upstream("GET", url, None)
+                cassette.record(key, response)
+            else:
+                async with cassette.originals["get"](session, url, params=params, **kwargs) as real:
+                    response = {"status": real.status, "body": await real.text(), "headers": {k: v for k, v in real.headers.items() if k == "Retry-After"}}
+                cassette.record(key, response)
+            return ReplayedResponse(response["status"], response["body"], response["headers"])
+
+        return AwaitableResponse(respond())
+
+
+class AwaitableResponse:
+    """Supporting class. Wraps the coroutine making a ReplayedResponse so it works like aiohttp's request context manager"""
+
+    def __init__(self, coroutine):
+        self.coroutine = coroutine
+
+    async def __aenter__(self):
+        return await self.coroutine
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __await__(self):
+        return self.coroutine.__await__()
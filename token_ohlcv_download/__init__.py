@@ -0,0 +1,134 @@
+"""This package has three useful functions:
+1. ticker_finder helps you find the right pair name to use in the ohlcv_data_download function. See examples at the bottom of this file. It is built on SymbolIndex, an index of the markets of many exchanges by base asset, quote, market type and contract multiplier (1000PEPE).
+2. ohlcv_data_download downloads candlestick data for a given pair and time period. It also converts the quote currency to USDT. See examples at the bottom of this file. ohlcv_data_download_stream does the same for long periods of small candles and hands back the output chunk by chunk while pages arrive.
+3. fetch_ohlcv_all_exchanges downloads raw candlestick data for one pair from many exchanges at once and hands back each exchange's result as soon as it finishes.
+4. ohlcv_batch_download runs many ohlcv_data_download jobs in one go, sharing exchange sessions, market metadata and quote conversion data between them.
+5. backfill_dex_pools downloads the hourly OHLCV of DEX pools from CoinMarketCap into one CSV per pool, and every run continues where the previous one stopped.
+6. VolumeIndex combines exchange pairs and DEX pools into one volume-weighted price and USD volume index, updated with new candles only, and shows how much each venue contributes.
+7. live_ohlcv (LiveOHLCV) keeps candles of one or many pairs fresh from WebSocket streams on many exchanges at once, repairs gaps over REST and reports how late the candles arrive.
+
+Every request to an exchange (and to Coingecko) goes through a RateLimiter, one token bucket per exchange, which slows down by itself when the exchange starts throttling.
+Raw candles can be kept in a CandleStore, an append-only on-disk store. Downloads that are given a store only fetch the candles after the last stored one. CandleStore.query answers questions like the last 7 days of bybit + okx hourly (or resampled) candles from memory-mapped slices, without loading whole files. CandleStore.gap_report lists the holes of stored series and repair_gaps downloads just those again.
+
+Pages are downloaded by an async paging engine (plan_ohlcv_windows + fetch_ohlcv_windows) that works out every page window up front and requests them concurrently.
+Exchange instances are shared between calls (get_exchange) and their market metadata is cached in memory and on disk (market_cache_dir), so load_markets only hits the network when the cache is cold or older than market_cache_ttl.
+
+To see where the time of a slow download goes, call enable_metrics first: stage timings (load_markets, paging, quote conversion, resampling ...), requests, latency, rate limit waits, retries and bytes received per exchange, and rows in and out are then recorded, and metrics_json / metrics_prometheus export them. Wrap a call in profile() for a cProfile report. While metrics are off the recording calls return straight away.
+
+The code lives in submodules (settings, ratelimit, markets, paging, store, conversion, download, symbols, live, dex, repair, volume_index ...) and everything is available from the package itself, e.g. token_ohlcv_download.CandleStore. A submodule is only imported when one of its names is first used.
+The settings (exchange_dict, market_cache_dir, max_retries ...) are changed by assigning them on the package, e.g. token_ohlcv_download.market_cache_dir = "markets".
+Importing the package is fast: pandas, numpy, ccxt, requests and aiohttp are only imported when a call first needs them (LazyModule), and exchange_class imports just the ccxt flavour (sync, async or WebSocket) an exchange is asked for in. For scheduled refreshes there is a command line, see python -m token_ohlcv_download --help."""
+
+import importlib
+import sys
+import types
+
+_exports = {  # submodule -> the names it defines
+    "settings": [
+        "candle_duration_to_seconds", "cex_ohlcv_columns", "cmc_api_url", "cmc_rate_limit", "default_max_data_points", "dex_ohlcv_count",
+        "exchange_aliases", "exchange_cache_size", "exchange_dict", "exchange_flavours", "market_cache_dir", "market_cache_size", "market_cache_ttl",
+        "max_concurrent_requests", "max_retries", "output_aggregations", "rate_limiter_clock", "throttle_cooldown", "tickers_batch_size",
+    ],
+    "lazy": ["LazyModule"],
+    "background": ["background_loop", "background_loop_running", "iterate_async", "run_coroutine", "_background_loop", "_loop_lock"],
+    "metrics": [
+        "count", "count_response_bytes", "disable_metrics", "enable_metrics", "metrics_enabled", "metrics_json", "metrics_prometheus",
+        "metrics_snapshot", "NoStage", "observe", "profile", "prometheus_labels", "Stage", "stage", "_metrics", "_metrics_lock", "_no_stage",
+    ],
+    "arrays": ["asof_join", "resample_columns"],
+    "ratelimit": [
+        "get_rate_limiter", "is_throttled", "rate_limited", "rate_limited_async", "rate_limiter_stats", "RateLimiter", "record_request",
+        "_rate_limiters", "_rate_limiters_lock",
+    ],
+    "markets": [
+        "clear_market_cache", "close_exchanges", "close_exchanges_async", "exchange_class", "get_exchange", "load_markets_cached",
+        "load_markets_cached_async", "read_market_cache", "remember_markets", "write_market_cache", "_cache_lock", "_exchange_instances",
+        "_market_cache",
+    ],
+    "paging": ["closed_candles", "concurrency_limit", "fetch_candles", "fetch_ohlcv_windows", "iter_ohlcv_pages", "plan_ohlcv_windows"],
+    "store": ["CandleStore", "missing_windows", "to_milliseconds"],
+    "conversion": [
+        "coingecko_usdt_price", "conversion_rates", "fetch_leg_candles", "fetch_quote_candles", "find_conversion_path", "open_quote_legs",
+        "QuoteLegStream",
+    ],
+    "download": [
+        "add_usdt_columns", "build_ohlcv_output", "candles_frame", "constant_column", "download_candles", "download_job", "download_jobs",
+        "fetch_exchange_ohlcv", "fetch_ohlcv_all_exchanges", "iter_exchanges_ohlcv", "iter_ohlcv_output", "ohlcv_array", "ohlcv_batch_download",
+        "ohlcv_data_download", "ohlcv_data_download_stream", "prepare_download", "resample_output",
+    ],
+    "symbols": ["base_multiplier", "fetch_tickers_batched", "match_finder", "multiplier_prefix", "SymbolIndex", "ticker_finder"],
+    "live": ["live_ohlcv", "LiveOHLCV", "pro_exchange"],
+    "dex": [
+        "backfill_dex_pool", "backfill_dex_pools", "backfill_dex_pools_async", "cmc_get_async", "cmc_headers", "decode_dex_ohlcv",
+        "decode_dex_spot_pairs", "dex_candles", "dex_ohlcv_path", "dex_spot_pair_fields", "dex_spot_pair_quote_fields", "dex_time_start",
+        "load_contract_pairs_from_csv", "next_dex_time_start", "read_dex_checkpoint", "write_dex_checkpoint",
+    ],
+    "repair": ["confirmed_empty", "plan_gap_pages", "repair_gaps", "repair_gaps_async", "repair_series"],
+    "volume_index": ["VolumeIndex"],
+}
+_owners = {name: submodule for submodule, names in _exports.items() for name in names}
+__all__ = sorted(name for name in _owners if not name.startswith("_"))
+
+
+def __getattr__(name):
+    """Supporting function. Imports the submodule that defines name on first use and hands back its value (or the submodule itself, e.g. token_ohlcv_download.store).
+    Functions and classes are kept in the package afterwards, settings and private state are read from their submodule every time, so they are never stale."""
+    if name in _exports:
+        return importlib.import_module(f"{__name__}.{name}")
+    submodule = _owners.get(name)
+    if submodule is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{submodule}"), name)
+    if submodule != "settings" and not name.startswith("_"):
+        globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_owners))
+
+
+class Package(types.ModuleType):
+    """Supporting class. Module type of this package: assigning a setting on the package (token_ohlcv_download.max_retries = 10) changes it in the settings submodule, where every other submodule reads it"""
+
+    def __setattr__(self, name, value):
+        if _owners.get(name) == "settings":
+            setattr(importlib.import_module(f"{__name__}.settings"), name, value)
+        else:
+            super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = Package
+
+
+#EXAMPLES
+#ticker_finder('bitget', 'ROOT')
+
+#index = SymbolIndex.build()
+#print(index.volumes('PEPE', quote='USDT', market_type='swap'))
+
+#print(ohlcv_data_download('upbit', 'BTC/KRW', '2024-05-01 00:00:00+00:00', '2024-05-31 00:00:00+00:00', '1h', 3600).tail(5).values)
+
+#for chunk in ohlcv_data_download_stream('binance', 'BTC/USDT', '2022-01-01 00:00:00+00:00', '2024-01-01 00:00:00+00:00', '1m', 3600):
+#    print(chunk['timestamp'].iloc[-1], len(chunk))
+
+#enable_metrics()
+#with profile(limit=20):
+#    ohlcv_data_download('upbit', 'BTC/KRW', '2024-05-01 00:00:00+00:00', '2024-05-31 00:00:00+00:00', '1m', 3600)
+#print(metrics_prometheus())
+
+#print(ohlcv_batch_download([('upbit', pair, '2024-05-01 00:00:00+00:00', '2024-05-31 00:00:00+00:00', '1h', 3600) for pair in ['BTC/KRW', 'ETH/KRW', 'XRP/KRW']]).groupby('pair').size())
+
+#live = LiveOHLCV([('binance', 'PENGU/USDT'), ('bybit', 'PENGU/USDT'), ('upbit', 'PENGU/KRW')], '1m', store=CandleStore('candle_store'))
+#for output in live.stream(duration=600):
+#    print(output[['exchange_name', 'timestamp', 'close_usdt', 'volume_usdt']].values)
+#print(live.latency_stats())
+
+#print(backfill_dex_pools([('<pool contract address>', 'solana', 'Pudgy Penguins', '2024-12-17T00:00:00.000Z')]))
+
+#for exchange_id, candles, error in fetch_ohlcv_all_exchanges('PENGU/USDT', period_start='2024-12-17 00:00:00+00:00'):
+#    print(exchange_id, error if error else (None if candles is None else len(candles)))
+
+#store = CandleStore('candle_store')
+#print(store.gap_report(timeframe='1h'))
+#print(repair_gaps(store, timeframe='1h'))
@@ -0,0 +1,148 @@
+"""Command line for scheduled refreshes, e.g. from cron:
+
+    python -m token_ohlcv_download refresh PENGU/USDT --store candle_store --timeframe 1h
+    python -m token_ohlcv_download dex-backfill --pools tokens_pool_addr --folder tokens_pool_addr_ohlcv
+    python -m token_ohlcv_download download upbit BTC/KRW "2024-05-01 00:00:00+00:00" "2024-05-31 00:00:00+00:00" 1h 3600 --output btc_krw.csv
+    python -m token_ohlcv_download find PEPE --exchanges binance,bybit
+    python -m token_ohlcv_download repair --store candle_store --timeframe 1h
+
+--metrics FILE records the run (see enable_metrics) and writes it as Prometheus text, or as JSON if FILE ends with .json.
+Only the libraries a command needs are imported, so --help and argument errors come back straight away."""
+
+import argparse
+import sys
+
+import token_ohlcv_download as tod
+
+
+def exchange_list(text):
+    """Supporting function. Comma separated exchange ids"""
+    return [exchange_id.strip() for exchange_id in text.split(",") if exchange_id.strip()]
+
+
+def refresh(args):
+    """appends the newest closed candles of a pair on every exchange to a CandleStore, starting after each series' last stored candle (or at --since)"""
+    store = tod.CandleStore(args.store)
+    failures = 0
+    for exchange_id, candles, error in tod.fetch_ohlcv_all_exchanges(
+        args.pair, args.exchanges, args.timeframe, args.since, None, args.max_workers, args.timeout, store
+    ):
+        if error is not None:
+            failures += 1
+            print(exchange_id, "failed -", repr(error))
+        elif candles is None:
+            print(exchange_id, "does not list", args.pair)
+        else:
+            print(exchange_id, len(candles), "new candles, last stored", store.high_water_mark(exchange_id, args.pair, args.timeframe))
+    return 1 if failures == len(args.exchanges) else 0
+
+
+def dex_backfill(args):
+    """continues the hourly CoinMarketCap OHLCV files of every pool listed in the pools folder"""
+    store = None if args.store is None else tod.CandleStore(args.store)
+    summary = tod.backfill_dex_pools(
+        tod.load_contract_pairs_from_csv(args.pools), args.folder, args.max_concurrent_pools, store=store
+    )
+    print(summary.to_string())
+    return 1 if len(summary) > 0 and summary["error"].notna().all() else 0
+
+
+def download(args):
+    """ohlcv_data_download, written to a CSV file or printed"""
+    store = None if args.store is None else tod.CandleStore(args.store)
+    output = tod.ohlcv_data_download(
+        args.exchange, args.pair, args.period_start, args.period_end, args.data_timeframe, args.output_seconds, store
+    )
+    if args.output is None:
+        print(output.to_string())
+    else:
+        output.to_csv(args.output, index=False)
+    return 0
+
+
+def repair(args):
+    """downloads the missing candles of the series in a CandleStore again and patches them in (--dry-run only lists the gaps)"""
+    store = tod.CandleStore(args.store)
+    if args.dry_run:
+        print(store.gap_report(args.exchanges, args.pairs, args.timeframe, args.start, args.end, args.recheck).to_string())
+        return 0
+    summary = tod.repair_gaps(
+        store, args.exchanges, args.pairs, args.timeframe, args.start, args.end, args.recheck, args.max_concurrent_series
+    )
+    print(summary.to_string())
+    return 1 if len(summary) > 0 and summary["error"].notna().all() else 0
+
+
+def find(args):
+    """ticker_finder across exchanges"""
+    tod.ticker_finder(args.exchanges, args.base, args.quote, args.type)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m token_ohlcv_download", description="scheduled OHLCV refreshes")
+    parser.add_argument("--metrics", help="write metrics of the run to this file (Prometheus text, or JSON for .json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("refresh", help=refresh.__doc__)
+    command.add_argument("pair")
+    command.add_argument("--store", default="candle_store")
+    command.add_argument("--exchanges", type=exchange_list, default=list(tod.exchange_dict), help="comma separated, default every exchange in exchange_dict")
+    command.add_argument("--timeframe", default="1h")
+    command.add_argument("--since", help="start of a series that is not stored yet, e.g. '2024-12-17 00:00:00+00:00'; without it only the latest page is fetched")
+    command.add_argument("--max-workers", type=int, default=8)
+    command.add_argument("--timeout", type=float, default=120)
+    command.set_defaults(run=refresh)
+
+    command = commands.add_parser("dex-backfill", help=dex_backfill.__doc__)
+    command.add_argument("--pools", default="tokens_pool_addr", help="folder of pool lists, see load_contract_pairs_from_csv")
+    command.add_argument("--folder", default="tokens_pool_addr_ohlcv")
+    command.add_argument("--store")
+    command.add_argument("--max-concurrent-pools", type=int, default=8)
+    command.set_defaults(run=dex_backfill)
+
+    command = commands.add_parser("download", help=download.__doc__)
+    command.add_argument("exchange")
+    command.add_argument("pair")
+    command.add_argument("period_start")
+    command.add_argument("period_end")
+    command.add_argument("data_timeframe")
+    command.add_argument("output_seconds", type=int)
+    command.add_argument("--output", help="CSV file, printed when left out")
+    command.add_argument("--store")
+    command.set_defaults(run=download)
+
+    command = commands.add_parser("repair", help=repair.__doc__)
+    command.add_argument("--store", default="candle_store")
+    command.add_argument("--exchanges", type=exchange_list, help="comma separated, default every stored exchange (DEX pools are dex_<network slug>)")
+    command.add_argument("--pairs", type=exchange_list, help="comma separated, default every stored pair")
+    command.add_argument("--timeframe", help="default every stored timeframe")
+    command.add_argument("--start", help="e.g. '2024-12-17 00:00:00+00:00', default the start of each series")
+    command.add_argument("--end")
+    command.add_argument("--recheck", action="store_true", help="also ask again for candles an earlier repair found missing at the source")
+    command.add_argument("--max-concurrent-series", type=int, default=8)
+    command.add_argument("--dry-run", action="store_true")
+    command.set_defaults(run=repair)
+
+    command = commands.add_parser("find", help=find.__doc__)
+    command.add_argument("base")
+    command.add_argument("--exchanges", type=exchange_list, default=list(tod.exchange_dict))
+    command.add_argument("--quote")
+    command.add_argument("--type", help="spot, swap, future or option")
+    command.set_defaults(run=find)
+
+    args = parser.parse_args(argv)
+    if args.metrics is not None:
+        tod.enable_metrics()
+    try:
+        return args.run(args)
+    finally:
+        if args.metrics is not None:
+            if args.metrics.endswith(".json"):
+                tod.metrics_json(args.metrics)
+            else:
+                tod.metrics_prometheus(args.metrics)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Column-wise helpers on numpy arrays: as-of joins and resampling into time buckets."""
+
+from .lazy import LazyModule
+
+np = LazyModule("numpy", "np", globals())
+
+
+def asof_join(timestamps, reference_timestamps, reference_values, direction="nearest", tolerance=None):
+    """matches every timestamp to a value of a reference series, e.g. quote currency prices, using sorted array lookups (numpy searchsorted)
+    direction is 'nearest', 'backward' (last reference at or before the timestamp) or 'forward' (first reference at or after it). Ties in 'nearest' go to the earlier reference, like match_finder
+    tolerance is the largest distance allowed between a timestamp and its match, in the same unit as the timestamps - None means any distance
+    returns (values, outside_tolerance): values is NaN where nothing was found within tolerance and outside_tolerance is the number of those rows"""
+    if direction not in ("nearest", "backward", "forward"):
+        raise Exception(f"direction should be nearest, backward or forward, not {direction}")
+
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    reference_timestamps = np.asarray(reference_timestamps, dtype=np.int64)
+    reference_values = np.asarray(reference_values, dtype=np.float64)
+    if len(reference_timestamps) == 0:
+        return np.full(len(timestamps), np.nan), len(timestamps)
+
+    order = np.argsort(reference_timestamps, kind="stable")
+    reference_timestamps = reference_timestamps[order]
+    reference_values = reference_values[order]
+    last_of_duplicates = np.append(reference_timestamps[1:] != reference_timestamps[:-1], True)  # the last value of a repeated timestamp wins, like in a dict
+    reference_timestamps = reference_timestamps[last_of_duplicates]
+    reference_values = reference_values[last_of_duplicates]
+    last = len(reference_timestamps) - 1
+
+    before = np.searchsorted(reference_timestamps, timestamps, side="right") - 1
+    after = np.searchsorted(reference_timestamps, timestamps, side="left")
+    has_before = before >= 0
+    has_after = after <= last
+    before = before.clip(0, last)
+    after = after.clip(0, last)
+    distance_before = np.where(has_before, timestamps - reference_timestamps[before], np.iinfo(np.int64).max)
+    distance_after = np.where(has_after, reference_timestamps[after] - timestamps, np.iinfo(np.int64).max)
+
+    if direction == "backward":
+        match, distance, found = before, distance_before, has_before
+    elif direction == "forward":
+        match, distance, found = after, distance_after, has_after
+    else:
+        use_before = distance_before <= distance_after
+        match = np.where(use_before, before, after)
+        distance = np.where(use_before, distance_before, distance_after)
+        found = has_before | has_after
+
+    if tolerance is not None:
+        found = found & (distance <= tolerance)
+    values = np.where(found, reference_values[match], np.nan)
+    return values, int(len(found) - found.sum())
+
+
+def resample_columns(timestamps, columns, aggregations, bucket_ms, origin, first_bucket=None, last_bucket=None):
+    """resamples many float columns into fixed size time buckets in one vectorized pass (numpy reduceat over the rows sorted by bucket)
+    timestamps are in ms; bucket i covers [origin + i * bucket_ms, origin + (i + 1) * bucket_ms). columns is a dict of arrays and aggregations maps every column to first, last, max, min, sum or mean
+    like pandas, NaN values are skipped and a bucket without any value gets NaN, also for sum (pandas' sum(min_count=1))
+    the buckets run from first_bucket to last_bucket (their start timestamps in ms), by default from the bucket of the first candle to the bucket of the last one, and buckets without candles are included
+    returns (bucket start timestamps, dict of aggregated columns)"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    buckets = (timestamps - origin) // bucket_ms
+    if first_bucket is None:
+        first = int(buckets.min()) if len(buckets) > 0 else 0
+        last = int(buckets.max()) if len(buckets) > 0 else -1
+    else:
+        first = (first_bucket - origin) // bucket_ms
+        last = (last_bucket - origin) // bucket_ms
+    bucket_count = last - first + 1
+
+    order = None
+    if np.any(buckets[1:] < buckets[:-1]):
+        order = np.argsort(buckets, kind="stable")  # stable, so first and last follow the order the candles came in
+        buckets = buckets[order]
+    row_count = len(buckets)
+    starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1])) if row_count > 0 else np.empty(0, dtype=np.int64)
+    ends = np.append(starts[1:], row_count)
+    slots = buckets[starts] - first
+    positions = np.arange(row_count)
+
+    results = {}
+    for name, how in aggregations.items():
+        values = np.asarray(columns[name], dtype=np.float64)
+        if order is not None:
+            values = values[order]
+        valid = ~np.isnan(values)
+        all_valid = bool(valid.all())
+        if all_valid:
+            counts = ends - starts
+        elif row_count > 0:
+            counts = np.add.reduceat(valid.astype(np.int64), starts)
+
+        if row_count == 0:
+            result = np.empty(0)
+        elif how == "first":
+            if all_valid:
+                result = values[starts]
+            else:
+                first_valid = np.minimum.reduceat(np.where(valid, positions, row_count - 1), starts)
+                result = np.where(counts > 0, values[first_valid], np.nan)
+        elif how == "last":
+            if all_valid:
+                result = values[ends - 1]
+            else:
+                last_valid = np.maximum.reduceat(np.where(valid, positions, 0), starts)
+                result = np.where(counts > 0, values[last_valid], np.nan)
+        elif how == "max":
+            result = np.fmax.reduceat(values, starts)
+        elif how == "min":
+            result = np.fmin.reduceat(values, starts)
+        elif how in ("sum", "mean"):
+            totals = np.add.reduceat(values if all_valid else np.where(valid, values, 0), starts)
+            if how == "mean":
+                totals = totals / np.maximum(counts, 1)
+            result = np.where(counts > 0, totals, np.nan)
+        else:
+            raise Exception(f"aggregation should be first, last, max, min, sum or mean, not {how}")
+
+        output = np.full(bucket_count, np.nan)
+        output[slots] = result
+        results[name] = output
+
+    return origin + (first + np.arange(bucket_count, dtype=np.int64)) * bucket_ms, results
@@ -0,0 +1,86 @@
+"""The background event loop that runs the async code behind the normal (synchronous) functions."""
+
+import asyncio
+import queue
+import threading
+
+_background_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop():
+    """Supporting function. Returns the event loop that runs the async code behind the normal (synchronous) functions.
+    It lives in a daemon thread for the whole session, so async exchange instances can be reused from one call to the next. This also works inside a notebook, where an event loop is already running."""
+    global _background_loop
+    with _loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="token_ohlcv_download", daemon=True).start()
+            _background_loop = loop
+    return _background_loop
+
+
+def background_loop_running():
+    """Supporting function. True once background_loop has started the loop and it is still running"""
+    return _background_loop is not None and _background_loop.is_running()
+
+
+def run_coroutine(coroutine):
+    """Supporting function. Runs a coroutine to completion on the background loop from normal (synchronous) code."""
+    return asyncio.run_coroutine_threadsafe(coroutine, background_loop()).result()
+
+
+def iterate_async(async_iterator):
+    """Supporting function. Turns an async iterator into a normal generator.
+    The async side runs on the background loop and items are handed over one by one as they are produced.
+    Closing the generator early (break, close()) cancels the async side straight away, wherever it is waiting, and returns once it has been closed."""
+    items = queue.Queue(maxsize=1)
+    stop = threading.Event()
+
+    def hand_over(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    async def drain():
+        loop = asyncio.get_running_loop()
+        try:
+            async for item in async_iterator:
+                await loop.run_in_executor(None, hand_over, ("item", item))
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await loop.run_in_executor(None, hand_over, ("error", e))
+        else:
+            await loop.run_in_executor(None, hand_over, ("done", None))
+        finally:
+            aclose = getattr(async_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def start():
+        return asyncio.ensure_future(drain())
+
+    async def finish(cancel):
+        if cancel:
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+    producer = run_coroutine(start())
+    finished = False
+    try:
+        while True:
+            kind, item = items.get()
+            if kind == "done":
+                finished = True
+                break
+            if kind == "error":
+                finished = True
+                raise item
+            yield item
+    finally:
+        stop.set()  # a producer that is handing over one more item gives up
+        run_coroutine(finish(not finished))
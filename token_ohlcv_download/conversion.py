@@ -0,0 +1,217 @@
+"""Quote conversion: paths from a quote currency to USDT over an exchange's markets and the rates along them."""
+
+import asyncio
+import time
+
+from . import settings
+from .lazy import LazyModule
+from .metrics import count, stage
+from .arrays import asof_join
+from .ratelimit import get_rate_limiter, record_request
+from .paging import fetch_candles, iter_ohlcv_pages, plan_ohlcv_windows
+
+requests = LazyModule("requests", "requests", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+def find_conversion_path(markets, quote, target="USDT", max_hops=3, excluded_symbols=()):
+    """finds the shortest chain of markets that converts quote into target, e.g. KRW -> BTC -> USDT through BTC/KRW and BTC/USDT
+    markets is a ccxt markets dict (exchange.markets); only spot markets that are not marked inactive are used
+    returns a list of (symbol, inverted) legs, where inverted means the market is quoted the other way round (USDT/KRW for KRW -> USDT) so its price has to be flipped
+    returns [] when quote already is target and None when there is no route within max_hops"""
+    if quote == target:
+        return []
+
+    neighbours = {}
+    for symbol, market in markets.items():
+        if not (market.get("spot") or market.get("type") == "spot") or market.get("active") is False:
+            continue
+        if symbol in excluded_symbols:
+            continue
+        base_currency, quote_currency = market["base"], market["quote"]
+        neighbours.setdefault(base_currency, []).append((quote_currency, symbol, False))
+        neighbours.setdefault(quote_currency, []).append((base_currency, symbol, True))
+    for edges in neighbours.values():
+        edges.sort(key=lambda edge: (edge[0] != target, edge[2], edge[1]))  # direct routes to target first, then non-inverted legs
+
+    # breadth first search, so the first route that reaches target is one of the shortest
+    previous = {quote: None}
+    frontier = [quote]
+    for _ in range(max_hops):
+        next_frontier = []
+        for currency in frontier:
+            for neighbour, symbol, inverted in neighbours.get(currency, []):
+                if neighbour in previous:
+                    continue
+                previous[neighbour] = (currency, symbol, inverted)
+                if neighbour == target:
+                    path = []
+                    while previous[neighbour] is not None:
+                        neighbour, symbol, inverted = previous[neighbour]
+                        path.append((symbol, inverted))
+                    return path[::-1]
+                next_frontier.append(neighbour)
+        frontier = next_frontier
+    return None
+
+
+async def fetch_leg_candles(exchange, symbol, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store=None, leg_cache=None):
+    """Supporting function. Same as fetch_candles, but every (exchange, symbol, timeframe, period) is only downloaded once per leg_cache.
+    leg_cache is a dict shared by everything that belongs to the same run, so a leg like BTC/USDT that many pairs convert through is fetched a single time."""
+    if leg_cache is None:
+        return await fetch_candles(
+            exchange, symbol, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store
+        )
+    key = (exchange.id, symbol, timeframe, period_start_timestamp, period_end_timestamp)
+    if key not in leg_cache:
+        leg_cache[key] = asyncio.ensure_future(
+            fetch_candles(exchange, symbol, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store)
+        )
+    return await asyncio.shield(leg_cache[key])  # one caller being cancelled should not cancel the download for the others
+
+
+async def fetch_quote_candles(exchange, quote, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store=None, leg_cache=None):
+    """Supporting function. Fetches the candles needed to convert quote to USDT, following the shortest route find_conversion_path finds in the exchange's markets.
+    All legs of a route are fetched at the same time. If a leg has no data, the route is searched again without that market.
+    Returns a list of (candles, inverted) legs, or None when no route has data."""
+    failed_symbols = set()
+    while True:
+        with stage("find_conversion_path", exchange=exchange.id):
+            path = find_conversion_path(exchange.markets, quote, excluded_symbols=failed_symbols)
+        if path is None:
+            return None
+        results = await asyncio.gather(
+            *[
+                fetch_leg_candles(
+                    exchange, symbol, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store, leg_cache
+                )
+                for symbol, _ in path
+            ],
+            return_exceptions=True,
+        )
+        failed = False
+        for (symbol, _), data in zip(path, results):
+            if isinstance(data, Exception) or len(data) == 0:  # try another route without this market
+                print(data if isinstance(data, Exception) else f"no candle data for {symbol}")
+                failed_symbols.add(symbol)
+                failed = True
+        if not failed:
+            return [(data, inverted) for data, (_, inverted) in zip(results, path)]
+
+
+def conversion_rates(timestamps, legs, direction="nearest", tolerance=None):
+    """Supporting function. Multiplies the legs of a conversion route into one rate per timestamp (all in ms).
+    legs is a list of (candles, inverted); each leg is priced at (open + close) / 2 and matched to the timestamps with asof_join.
+    Returns (rates, outside_tolerance), where outside_tolerance counts the timestamps that at least one leg has no price for."""
+    rates = np.ones(len(timestamps))
+    for candles, inverted in legs:
+        candles = np.array(candles, dtype=np.float64).reshape(-1, 6)
+        prices, _ = asof_join(timestamps, candles[:, 0], (candles[:, 1] + candles[:, 4]) / 2, direction, tolerance)
+        rates = rates / prices if inverted else rates * prices
+    return rates, int(np.isnan(rates).sum())
+
+
+class QuoteLegStream:
+    """Supporting class. One leg of a quote conversion route whose candles arrive page by page (see iter_ohlcv_pages), for iter_ohlcv_output.
+    Prices are (open + close) / 2 like in conversion_rates. Only the prices that can still be the asof_join match of a candle that has not been converted yet are kept."""
+
+    def __init__(self, pages, inverted, period_start_timestamp, period_end_timestamp):
+        self.pages = pages
+        self.inverted = inverted
+        self.period_start_timestamp = period_start_timestamp
+        self.period_end_timestamp = period_end_timestamp
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.prices = np.empty(0, dtype=np.float64)
+        self.exhausted = False
+
+    async def load_page(self):
+        try:
+            page = await self.pages.__anext__()
+        except StopAsyncIteration:
+            self.exhausted = True
+            return
+        page = [
+            i
+            for i in page
+            if i[0] / 1000 <= self.period_end_timestamp and i[0] / 1000 >= self.period_start_timestamp
+        ]
+        candles = np.array(page, dtype=np.float64).reshape(-1, 6)
+        self.timestamps = np.concatenate([self.timestamps, candles[:, 0]])
+        self.prices = np.concatenate([self.prices, (candles[:, 1] + candles[:, 4]) / 2])
+
+    async def has_data(self):
+        """loads pages until the first candle inside the period, returns False if there is none"""
+        while len(self.timestamps) == 0 and not self.exhausted:
+            await self.load_page()
+        return len(self.timestamps) > 0
+
+    async def load_until(self, timestamp):
+        """loads pages until the leg has a price at or after timestamp (in ms), so forward and nearest matches are final"""
+        while not self.exhausted and (len(self.timestamps) == 0 or self.timestamps[-1] < timestamp):
+            await self.load_page()
+
+    def forget_before(self, timestamp):
+        """drops the prices before the last one at or before timestamp, which no candle from timestamp on can match any more"""
+        if np.all(np.diff(self.timestamps) >= 0):  # pages arrived in order
+            keep_from = max(0, int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1)
+            self.timestamps = self.timestamps[keep_from:]
+            self.prices = self.prices[keep_from:]
+
+    async def close(self):
+        await self.pages.aclose()
+
+
+async def open_quote_legs(exchange, quote, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, max_concurrency=None):
+    """Supporting function. Streaming version of fetch_quote_candles: follows the same routes, but returns a QuoteLegStream per leg.
+    A leg counts as having data once its first candle inside the period arrives, so the rest of it is downloaded while the output is being built.
+    Returns None when no route has data."""
+    since_list = plan_ohlcv_windows(
+        period_start_timestamp, period_end_timestamp, max_data_points, settings.candle_duration_to_seconds[timeframe]
+    )
+    failed_symbols = set()
+    while True:
+        with stage("find_conversion_path", exchange=exchange.id):
+            path = find_conversion_path(exchange.markets, quote, excluded_symbols=failed_symbols)
+        if path is None:
+            return None
+        legs = [
+            QuoteLegStream(
+                iter_ohlcv_pages(exchange, symbol, timeframe, since_list, max_data_points, max_concurrency),
+                inverted,
+                period_start_timestamp,
+                period_end_timestamp,
+            )
+            for symbol, inverted in path
+        ]
+        results = await asyncio.gather(*[leg.has_data() for leg in legs], return_exceptions=True)
+        failed = False
+        for (symbol, _), result in zip(path, results):
+            if isinstance(result, Exception) or not result:  # try another route without this market
+                print(result if isinstance(result, Exception) else f"no candle data for {symbol}")
+                failed_symbols.add(symbol)
+                failed = True
+        if not failed:
+            return legs
+        for leg in legs:
+            await leg.close()
+
+
+def coingecko_usdt_price(quote):
+    """Supporting function. Current price of one unit of quote in USDT according to Coingecko, used when the exchange has no route from quote to USDT"""
+    limiter = get_rate_limiter("coingecko", 5000)
+    while True:
+        waited = time.perf_counter()
+        limiter.acquire_sync()
+        began = time.perf_counter()
+        usdt_price = requests.get("https://api.coingecko.com/api/v3/coins/tether?localization=false&tickers=true&market_data=true&community_data=false&developer_data=false&sparkline=false")
+        record_request("coingecko", requests.get, waited, began, "ok" if usdt_price.status_code == 200 else "throttled" if usdt_price.status_code in (429, 418) else "error")
+        count("response_bytes", len(usdt_price.content), exchange="coingecko")
+
+        if usdt_price.status_code == 200:
+            limiter.succeeded()
+            return 1 / usdt_price.json()["market_data"]["current_price"].get(quote.lower(), None)
+
+        else:
+            print(usdt_price.status_code)
+            if usdt_price.status_code in (429, 418):
+                limiter.throttled()
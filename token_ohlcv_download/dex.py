@@ -0,0 +1,280 @@
+"""DEX pools from the CoinMarketCap API: decoding its responses and the resumable hourly OHLCV backfill."""
+
+from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+import os
+import threading
+import time
+
+from . import settings
+from .lazy import LazyModule
+from .background import run_coroutine
+from .metrics import count, stage
+from .ratelimit import get_rate_limiter, record_request
+
+aiohttp = LazyModule("aiohttp", "aiohttp", globals())
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+def cmc_headers(api_key=None):
+    """Supporting function. Request headers for the CoinMarketCap API. The key defaults to the CMC_API environment variable (e.g. loaded from .env)"""
+    return {
+        "Accepts": "application/json",
+        "X-CMC_PRO_API_KEY": api_key or os.getenv("CMC_API") or "",
+    }
+
+
+async def cmc_get_async(session, path, params, headers, base_url=None):
+    """Supporting function. GET request to the CoinMarketCap API through its RateLimiter, retried up to max_retries times when throttled (http 429). Returns the decoded JSON"""
+    limiter = get_rate_limiter("coinmarketcap", settings.cmc_rate_limit)
+    url = (base_url or settings.cmc_api_url) + path
+    for attempt in range(settings.max_retries + 1):
+        waited = time.perf_counter()
+        await limiter.acquire()
+        began = time.perf_counter()
+        async with session.get(url, params=params, headers=headers) as response:
+            body = await response.read()
+        text = body.decode(response.charset or "utf-8")
+        record_request("coinmarketcap", session.get, waited, began, "ok" if response.status == 200 else "throttled" if response.status in (429, 418) else "error")
+        count("response_bytes", len(body), exchange="coinmarketcap")
+        if response.status == 200:
+            limiter.succeeded()
+            return json.loads(text)
+        if response.status not in (429, 418) or attempt == settings.max_retries:
+            raise Exception(f"{url} {params}: {response.status} - {text}")
+        retry_after = response.headers.get("Retry-After")
+        limiter.throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+
+def dex_ohlcv_path(folder_name, contract_address, network_slug, base_asset_name):
+    """Supporting function. CSV file holding the hourly candles of one pool, folder_name/<base asset>_<network>/<pool contract address>.csv"""
+    return os.path.join(folder_name, f"{base_asset_name}_{network_slug}", f"{contract_address}.csv")
+
+
+def read_dex_checkpoint(file_path):
+    """Supporting function. Returns (last time_close, committed file size in bytes) of a pool CSV, or None for a pool that has no data yet.
+    The checkpoint lives next to the CSV (<contract address>.checkpoint.json). Pool files written before checkpoints existed are resumed from their last row."""
+    try:
+        with open(file_path[: -len(".csv")] + ".checkpoint.json") as f:
+            checkpoint = json.load(f)
+        return checkpoint["time_close"], checkpoint["size"]
+    except (OSError, ValueError, KeyError):
+        pass
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        return None
+    time_close = pd.read_csv(file_path, usecols=["time_close"])["time_close"]
+    if len(time_close) == 0:
+        return None
+    return time_close.iloc[-1], os.path.getsize(file_path)
+
+
+def write_dex_checkpoint(file_path, time_close, size):
+    """Supporting function. Records that a pool CSV is complete up to time_close and size bytes, atomically"""
+    checkpoint_path = file_path[: -len(".csv")] + ".checkpoint.json"
+    temp_path = f"{checkpoint_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"time_close": time_close, "size": size}, f)
+    os.replace(temp_path, checkpoint_path)
+
+
+def next_dex_time_start(time_close):
+    """Supporting function. time_start of the page after the one that ended at time_close (an ISO timestamp like CMC sends)"""
+    last_time_close = datetime.fromisoformat(time_close.replace("Z", "+00:00"))
+    return (last_time_close + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def decode_dex_ohlcv(data):
+    """decodes a CoinMarketCap /v4/dex/pairs/ohlcv/historical response (the parsed JSON) into a DataFrame with one row per candle
+    columns are the fields of the first quote (open, high, low, close, volume, timestamp, ...) followed by time_open and time_close, the same as the pool CSVs
+    every column is built in one go from the response: numbers become float64 arrays (missing ones NaN), everything else stays as strings. A field is a number when its first value that is not null is one"""
+    quotes = data["data"][0]["quotes"] if data.get("data") else []
+    values = [quote["quote"][0] for quote in quotes]
+    columns = {}
+    for key in values[0] if values else []:
+        column = [value.get(key) for value in values]
+        sample = next((item for item in column if item is not None), None)
+        try:
+            columns[key] = np.array(column, dtype=np.float64 if isinstance(sample, (int, float)) else object)  # None becomes NaN
+        except (TypeError, ValueError):  # a number in some rows but not in every row
+            columns[key] = np.array(column, dtype=object)
+    columns["time_open"] = np.array([quote["time_open"] for quote in quotes], dtype=object)
+    columns["time_close"] = np.array([quote["time_close"] for quote in quotes], dtype=object)
+    return pd.DataFrame(columns)
+
+
+def dex_candles(page):
+    """Supporting function. [timestamp, open, high, low, close, volume] rows (timestamp = time_open in ms) of decoded DEX OHLCV (see decode_dex_ohlcv), ready for CandleStore.append"""
+    timestamps = pd.to_datetime(page["time_open"], utc=True).values.astype("datetime64[ms]").astype(np.int64)
+    candles = np.column_stack([timestamps, page[["open", "high", "low", "close", "volume"]].to_numpy(dtype=np.float64)])
+    return candles[np.argsort(timestamps, kind="stable")]
+
+
+dex_spot_pair_fields = [
+    "contract_address",
+    "name",
+    "base_asset_id",
+    "base_asset_name",
+    "base_asset_symbol",
+    "base_asset_contract_address",
+    "quote_asset_id",
+    "quote_asset_name",
+    "quote_asset_symbol",
+    "quote_asset_contract_address",
+    "dex_id",
+    "dex_slug",
+    "network_id",
+    "network_slug",
+    "last_updated",
+    "created_at",
+]
+dex_spot_pair_quote_fields = [
+    "price",
+    "volume_24h",
+    "percent_change_price_1h",
+    "percent_change_price_24h",
+    "liquidity",
+    "fully_diluted_value",
+]
+
+
+def decode_dex_spot_pairs(spot_pairs_data):
+    """decodes the data list of a CoinMarketCap /v4/dex/spot-pairs/latest response into a DataFrame with one row per pool and quote currency (the tokens_pool_addr CSV columns)
+    pool fields are repeated for each of its quotes with np.repeat instead of building a dict per row"""
+    quote_counts = np.array([len(item["quote"]) for item in spot_pairs_data], dtype=np.int64)
+    quotes = [quote for item in spot_pairs_data for quote in item["quote"]]
+    columns = {}
+    for field in dex_spot_pair_fields:
+        columns[field] = np.repeat(np.array([item.get(field) for item in spot_pairs_data], dtype=object), quote_counts)
+    for field in dex_spot_pair_quote_fields:
+        columns[field] = np.array([quote.get(field) for quote in quotes], dtype=np.float64)
+    return pd.DataFrame(columns)
+
+
+def load_contract_pairs_from_csv(folder_name="tokens_pool_addr"):
+    """reads every <base asset name>_<network slug>.csv in folder_name (see decode_dex_spot_pairs) and returns the pools as (pool contract address, network slug, base asset name, pool created time) tuples, the input of backfill_dex_pools"""
+    contract_pairs = []
+    for file_name in sorted(os.listdir(folder_name)):
+        if not file_name.endswith(".csv"):
+            continue
+        base_asset_name, network_slug = os.path.splitext(file_name)[0].split("_")
+        pools = pd.read_csv(os.path.join(folder_name, file_name), usecols=["contract_address", "created_at"])
+        contract_pairs.extend(
+            zip(
+                pools["contract_address"].tolist(),
+                [network_slug] * len(pools),
+                [base_asset_name] * len(pools),
+                pools["created_at"].tolist(),
+            )
+        )
+    return contract_pairs
+
+
+async def backfill_dex_pool(session, contract_address, network_slug, base_asset_name, pool_created_time, folder_name, headers, base_url=None, store=None):
+    """Supporting function. Downloads the hourly candles of one pool from its checkpoint (or from pool_created_time) up to now, 500 at a time, appending every page to the pool CSV and moving the checkpoint after it.
+    If a previous run stopped between writing a page and moving the checkpoint, the CSV is first cut back to the checkpoint, so no candle is stored twice.
+    Returns the number of candles added and the last time_close."""
+    file_path = dex_ohlcv_path(folder_name, contract_address, network_slug, base_asset_name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    checkpoint = read_dex_checkpoint(file_path)
+    if checkpoint is None:
+        time_close, size = None, 0
+        time_start = pool_created_time
+    else:
+        time_close, size = checkpoint
+        time_start = next_dex_time_start(time_close)
+    if os.path.exists(file_path) and os.path.getsize(file_path) > size:
+        with open(file_path, "r+b") as f:
+            f.truncate(size)  # drop a page that was written after the last checkpoint
+
+    added = 0
+    exchange_id = f"dex_{network_slug}"
+    while True:
+        with stage("paging", exchange=exchange_id):
+            data = await cmc_get_async(
+                session,
+                "/v4/dex/pairs/ohlcv/historical",
+                {
+                    "contract_address": contract_address,
+                    "network_slug": network_slug,
+                    "time_period": "hourly",
+                    "interval": "1h",
+                    "count": settings.dex_ohlcv_count,
+                    "time_start": time_start,
+                },
+                headers,
+                base_url,
+            )
+        with stage("dex_decode"):
+            page = decode_dex_ohlcv(data)
+        count("pages", exchange=exchange_id)
+        if len(page) == 0 or page["time_close"].iloc[-1] == time_close:  # nothing newer
+            break
+
+        count("candles_downloaded", len(page), exchange=exchange_id)
+        with stage("dex_write", exchange=exchange_id):
+            page.to_csv(file_path, mode="a", header=size == 0, index=False)
+        if store is not None:
+            with stage("store_append", exchange=exchange_id):
+                store.append(exchange_id, contract_address, "1h", dex_candles(page))
+        time_close = page["time_close"].iloc[-1]
+        size = os.path.getsize(file_path)
+        write_dex_checkpoint(file_path, time_close, size)
+        added += len(page)
+        time_start = next_dex_time_start(time_close)
+
+    return added, time_close
+
+
+async def backfill_dex_pools_async(contract_pairs, folder_name="tokens_pool_addr_ohlcv", max_concurrent_pools=8, base_url=None, api_key=None, store=None):
+    """Supporting function. Runs backfill_dex_pool for every pool, at most max_concurrent_pools at a time, in one HTTP session.
+    Returns a (candles added, last time_close) tuple or the exception for every pool, in order."""
+    headers = cmc_headers(api_key)
+    semaphore = asyncio.Semaphore(max_concurrent_pools)
+
+    async with aiohttp.ClientSession() as session:
+
+        async def run(contract_address, network_slug, base_asset_name, pool_created_time):
+            async with semaphore:
+                return await backfill_dex_pool(
+                    session, contract_address, network_slug, base_asset_name, pool_created_time, folder_name, headers, base_url, store
+                )
+
+        return await asyncio.gather(*[run(*pool) for pool in contract_pairs], return_exceptions=True)
+
+
+def backfill_dex_pools(contract_pairs, folder_name="tokens_pool_addr_ohlcv", max_concurrent_pools=8, base_url=None, api_key=None, store=None):
+    """downloads the hourly OHLCV of many DEX pools from CoinMarketCap into folder_name/<base asset>_<network>/<pool contract address>.csv
+    contract_pairs is a list of (pool contract address, network slug, base asset name, pool created time), e.g. from load_contract_pairs_from_csv
+    every pool keeps a checkpoint (its last time_close), so a run only downloads what is newer than the previous one and an interrupted run resumes where it stopped. Existing data is never deleted
+    at most max_concurrent_pools pools download at the same time and all requests share the coinmarketcap RateLimiter (cmc_rate_limit). A pool that fails is reported and does not stop the others
+    base_url replaces cmc_api_url, e.g. to run against a local stand-in. api_key defaults to the CMC_API environment variable
+    with a CandleStore, every new page is also appended to it as exchange dex_<network slug>, pair <pool contract address>, so it can be queried with CandleStore.query (pools downloaded before can be added with CandleStore.import_dex_csv)
+    returns a DataFrame with one row per pool: candles added, last time_close and error"""
+    with stage("backfill_dex_pools"):
+        results = run_coroutine(backfill_dex_pools_async(contract_pairs, folder_name, max_concurrent_pools, base_url, api_key, store))
+
+    rows = []
+    for (contract_address, network_slug, base_asset_name, _), result in zip(contract_pairs, results):
+        row = {
+            "contract_address": contract_address,
+            "network_slug": network_slug,
+            "base_asset_name": base_asset_name,
+            "added": 0,
+            "time_close": None,
+            "error": None,
+        }
+        if isinstance(result, Exception):
+            print(f"failed to backfill {base_asset_name} pool {contract_address} on {network_slug} - {result!r}")
+            row["error"] = repr(result)
+        else:
+            row["added"], row["time_close"] = result
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def dex_time_start(timestamp):
+    """Supporting function. CoinMarketCap time_start (an ISO timestamp like next_dex_time_start) of a page starting with the candle that opens at timestamp (ms)"""
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
@@ -0,0 +1,647 @@
+"""Downloading OHLCV from one or many exchanges into the output DataFrames (ohlcv_data_download and friends)."""
+
+from datetime import datetime, timezone
+import asyncio
+import time
+
+from . import settings
+from .lazy import LazyModule
+from .background import iterate_async, run_coroutine
+from .metrics import count, stage
+from .arrays import asof_join, resample_columns
+from .ratelimit import rate_limited_async
+from .markets import get_exchange, load_markets_cached_async
+from .paging import closed_candles, fetch_candles, fetch_ohlcv_windows, iter_ohlcv_pages, plan_ohlcv_windows
+from .conversion import coingecko_usdt_price, conversion_rates, fetch_quote_candles, open_quote_legs
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+ccxt = LazyModule("ccxt", "ccxt", globals())
+
+
+async def download_candles(exchange_id, pair, quote, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store=None, leg_cache=None):
+    """Supporting function. Downloads the pair candles and, if the quote is not USDT, the quote currency conversion legs at the same time.
+    Returns (data_list, quote_legs), see fetch_quote_candles for quote_legs."""
+    exchange = get_exchange(exchange_id, asynchronous=True)
+    await load_markets_cached_async(exchange)
+    pair_fetch = fetch_candles(
+        exchange, pair, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store
+    )
+    if quote == "USDT":
+        return await pair_fetch, None
+    return await asyncio.gather(
+        pair_fetch,
+        fetch_quote_candles(
+            exchange, quote, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store, leg_cache
+        ),
+    )
+
+
+async def fetch_exchange_ohlcv(exchange_id, pair, timeframe="1h", period_start=None, period_end=None, store=None):
+    """Supporting function. Downloads raw candles for pair from one exchange.
+    Returns a DataFrame with the cex_ohlcv columns, or None if the exchange does not list the pair.
+    Without period_start only the latest page is fetched. With a CandleStore only candles after the series' high-water mark are fetched, and the closed ones are appended to the store."""
+    exchange = get_exchange(exchange_id, asynchronous=True)
+    await load_markets_cached_async(exchange)
+    if pair not in exchange.markets:
+        return None
+
+    period_start_timestamp = None
+    if period_start is not None:
+        period_start_timestamp = datetime.fromisoformat(period_start).replace(tzinfo=timezone.utc).timestamp()
+    high_water_mark = None if store is None else store.high_water_mark(exchange_id, pair, timeframe)
+    if high_water_mark is not None:
+        period_start_timestamp = max(
+            period_start_timestamp or 0, high_water_mark / 1000 + settings.candle_duration_to_seconds[timeframe]
+        )
+
+    if period_start_timestamp is None:
+        data_list = await rate_limited_async(exchange, exchange.fetch_ohlcv, pair, timeframe=timeframe)
+    else:
+        if period_end is None:
+            period_end_timestamp = time.time()
+        else:
+            period_end_timestamp = datetime.fromisoformat(period_end).replace(tzinfo=timezone.utc).timestamp()
+        max_data_points = settings.exchange_dict.get(exchange_id, {}).get("max_data_points", settings.default_max_data_points)
+        since_list = plan_ohlcv_windows(
+            period_start_timestamp,
+            period_end_timestamp,
+            max_data_points,
+            settings.candle_duration_to_seconds[timeframe],
+        )
+        data_list = await fetch_ohlcv_windows(exchange, pair, timeframe, since_list, max_data_points)
+        data_list = [
+            i
+            for i in data_list
+            if i[0] / 1000 <= period_end_timestamp and i[0] / 1000 >= period_start_timestamp
+        ]
+
+    if store is not None:
+        store.append(exchange_id, pair, timeframe, closed_candles(data_list, timeframe))
+
+    return pd.DataFrame(data_list, columns=settings.cex_ohlcv_columns).drop_duplicates(subset=["timestamp"]).reset_index(drop=True)
+
+
+async def iter_exchanges_ohlcv(pair, exchanges=None, timeframe="1h", period_start=None, period_end=None, max_workers=8, timeout=120, store=None):
+    """Async generator behind fetch_ohlcv_all_exchanges. Yields (exchange_id, candles, error) in the order the exchanges finish."""
+    if exchanges is None:
+        exchanges = ccxt.exchanges
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(exchange_id):
+        async with semaphore:
+            try:
+                candles = await asyncio.wait_for(
+                    fetch_exchange_ohlcv(exchange_id, pair, timeframe, period_start, period_end, store), timeout
+                )
+                return exchange_id, candles, None
+            except Exception as e:  # one failing or hanging exchange should not stop the others
+                return exchange_id, None, e
+
+    tasks = [asyncio.ensure_future(run(exchange_id)) for exchange_id in exchanges]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def fetch_ohlcv_all_exchanges(pair, exchanges=None, timeframe="1h", period_start=None, period_end=None, max_workers=8, timeout=120, store=None):
+    """downloads raw candles for pair from many exchanges at once - by default every exchange ccxt supports
+    yields (exchange_id, candles, error) for each exchange as soon as it finishes, so the slowest venue only delays itself:
+    - candles is a DataFrame with the columns timestamp, open, high, low, close, volume (same as the files in cex_ohlcv), or None if the exchange does not list the pair
+    - error is the exception raised for that exchange, or None. Exchanges that take longer than timeout seconds fail with a TimeoutError
+    At most max_workers exchanges are worked on at the same time. Time period format is the same as in ohlcv_data_download; without period_start only the latest page is fetched.
+    With a CandleStore each exchange only fetches the candles after its last stored one, appends the closed ones to the store and yields just the new candles."""
+    return iterate_async(
+        iter_exchanges_ohlcv(pair, exchanges, timeframe, period_start, period_end, max_workers, timeout, store)
+    )
+
+
+def prepare_download(
+    exchange,
+    pair,
+    period_start,
+    period_end,
+    candle_duration_seconds_data_download,
+    candle_duration_seconds_result_output,
+):
+    """Supporting function. Checks the arguments of ohlcv_data_download and works out what has to be downloaded.
+    Returns a dict with everything download_candles and build_ohlcv_output need to know about the download."""
+
+    if (
+        candle_duration_seconds_result_output
+        < settings.candle_duration_to_seconds[candle_duration_seconds_data_download]
+    ):
+        raise Exception(
+            "candle_duration_seconds_result_output should be equal or larger than candle_duration_seconds_data_download in terms of seconds"
+        )
+
+    try:
+        exchange_name = settings.exchange_dict[exchange]["name"]
+    except:
+        raise Exception('this exchange is not supported')
+
+    max_data_points = settings.exchange_dict[exchange]["max_data_points"]
+
+    try:
+        intervals = settings.exchange_dict[exchange]["intervals"][
+            candle_duration_seconds_data_download
+        ]
+    except:
+        raise Exception(
+            f"this time interval ({candle_duration_seconds_data_download}) is not supported"
+        )
+
+    base = pair[: pair.find("/")]
+    quote = pair[
+        pair.find("/") + 1 :
+    ]  # if quote is not USDT, we have to convert it to USDT
+
+    #for futures pairs, there is usually a colon in the pair name so get the right quote name e.g. EDU/USDT:USDT needs to be changed to EDU/USDT
+    if ":" in quote:
+        quote = quote[:quote.find(':')]
+
+    period_start_timestamp = datetime.fromisoformat(period_start).replace(tzinfo=timezone.utc).timestamp() - 1
+    period_end_timestamp = datetime.fromisoformat(period_end).replace(tzinfo=timezone.utc).timestamp() + 1
+
+    return {
+        "exchange": exchange,
+        "exchange_name": exchange_name,
+        "pair": pair,
+        "base": base,
+        "quote": quote,
+        "timeframe": candle_duration_seconds_data_download,
+        "output_seconds": candle_duration_seconds_result_output,
+        "max_data_points": max_data_points,
+        "period_start_timestamp": period_start_timestamp,
+        "period_end_timestamp": period_end_timestamp,
+    }
+
+
+def ohlcv_array(pages):
+    """Supporting function. Copies pages of raw ccxt candles ([timestamp, open, high, low, close, volume] lists) into one preallocated float64 array, one row per candle.
+    Missing values (None) become NaN."""
+    candles = np.empty((sum(len(page) for page in pages), 6), dtype=np.float64)
+    position = 0
+    for page in pages:
+        if len(page) > 0:
+            candles[position : position + len(page)] = page
+            position += len(page)
+    return candles
+
+
+def constant_column(value, rows):
+    """Supporting function. A categorical column holding the same value on every row, which costs one byte per row instead of a pointer to a string."""
+    return pd.Categorical.from_codes(np.zeros(rows, dtype=np.int8), categories=[value])
+
+
+def candles_frame(download, data_list):
+    """Supporting function. Turns raw candles of a download (see prepare_download) into a DataFrame with one row per candle inside the period, before any USDT conversion.
+    data_list is a list of raw candles or an ohlcv_array. Candles are filtered, deduplicated on their timestamp (the first one received wins) and converted column by column, never row by row.
+    exchange_name, pair, base and quote are categoricals."""
+    period_start_timestamp = download["period_start_timestamp"]
+    period_end_timestamp = download["period_end_timestamp"]
+
+    candles = data_list if isinstance(data_list, np.ndarray) else ohlcv_array([data_list])
+    seconds = candles[:, 0] / 1000
+    in_period = (seconds <= period_end_timestamp) & (seconds >= period_start_timestamp)
+    if not in_period.all():
+        candles = candles[in_period]
+    _, first_rows = np.unique(candles[:, 0], return_index=True)
+    if len(first_rows) < len(candles):
+        candles = candles[np.sort(first_rows)]  # keep arrival order
+
+    rows = len(candles)
+    vol_data = pd.DataFrame(
+        {
+            "exchange_name": constant_column(download["exchange_name"], rows),
+            "pair": constant_column(download["pair"], rows),
+            "base": constant_column(download["base"], rows),
+            "quote": constant_column(download["quote"], rows),
+            "timestamp": pd.to_datetime(candles[:, 0].astype(np.int64), unit="ms", utc=True),
+            "average_price": (candles[:, 1] + candles[:, 4]) / 2,
+            "open": candles[:, 1],
+            "close": candles[:, 4],
+            "high": candles[:, 2],
+            "low": candles[:, 3],
+            "volume_base": candles[:, 5],
+        }
+    )
+    return vol_data
+
+
+def add_usdt_columns(vol_data):
+    """Supporting function. Adds the USDT columns to a candles_frame that already has its quote_currency_price_usdt column."""
+    vol_data["average_price_usdt"] = (
+        vol_data["average_price"] * vol_data["quote_currency_price_usdt"]
+    )
+    vol_data["open_usdt"] = vol_data["open"] * vol_data["quote_currency_price_usdt"]
+    vol_data["close_usdt"] = (
+        vol_data["close"] * vol_data["quote_currency_price_usdt"]
+    )
+    vol_data["high_usdt"] = vol_data["high"] * vol_data["quote_currency_price_usdt"]
+    vol_data["low_usdt"] = vol_data["low"] * vol_data["quote_currency_price_usdt"]
+
+    # # converting USDT to USD at daily intervals
+    # while True:
+    #     try:
+    #         usdt_price = requests.get(
+    #             f"https://api.coingecko.com/api/v3/coins/tether/market_chart?vs_currency=usd&days=max&interval=daily"
+    #         )
+    #         if usdt_price.status_code == 200:
+    #             usdt_price = usdt_price.json()["prices"]
+    #             break
+    #         else:
+    #             print(usdt_price.status_code)
+    #             raise Exception
+    #     except:
+    #         time.sleep(5)
+
+    # usdt_price_dict = {
+    #     datetime.utcfromtimestamp(itm[0] / 1000): itm[1] for itm in usdt_price
+    # }
+
+    # vol_data["usdt_currency_price_usd"] = pd.to_datetime(
+    #     vol_data["timestamp"].dt.strftime("%Y-%m-%d 00:00:00")
+    # ).apply(lambda x: match_finder(x, usdt_price_dict))
+
+    # vol_data["average_price_usd"] = (
+    #     vol_data["average_price_usdt"] * vol_data["usdt_currency_price_usd"]
+    # )
+    # vol_data["open_usd"] = vol_data["open_usdt"] * vol_data["usdt_currency_price_usd"]
+    # vol_data["close_usd"] = vol_data["close_usdt"] * vol_data["usdt_currency_price_usd"]
+    # vol_data["high_usd"] = vol_data["high_usdt"] * vol_data["usdt_currency_price_usd"]
+    # vol_data["low_usd"] = vol_data["low_usdt"] * vol_data["usdt_currency_price_usd"]
+
+    vol_data['volume_usdt'] = vol_data['volume_base'] * vol_data['average_price_usdt']
+    #vol_data["volume_usd"] = vol_data["volume_base"] * vol_data["average_price_usd"]
+    return vol_data
+
+
+def resample_output(download, vol_data, origin=None, first_bucket=None, last_bucket=None):
+    """Supporting function. Groups the candles of add_usdt_columns into output candles of download["output_seconds"] with resample_columns (see output_aggregations).
+    By default buckets are anchored at midnight of the first candle's day and only span the candles given. origin fixes the anchor, and first_bucket / last_bucket fix the first and last output candle, empty ones included, so consecutive chunks of candles can be resampled separately (see iter_ohlcv_output). All three are timestamps in ms.
+    Output candles without any input candle get NaN prices and a volume_base of 0."""
+    timestamps = vol_data["timestamp"].values.astype("datetime64[ms]").astype(np.int64)
+    if origin is None:
+        origin = int(timestamps.min()) // (24 * 3600 * 1000) * (24 * 3600 * 1000) if len(timestamps) > 0 else 0
+
+    # grouping input data according to candle_duration_seconds_result_output happens at the end to avoid rounding errors
+    bucket_timestamps, aggregated = resample_columns(
+        timestamps,
+        {column: vol_data[column].values for column in settings.output_aggregations},
+        settings.output_aggregations,
+        download["output_seconds"] * 1000,
+        origin,
+        first_bucket,
+        last_bucket,
+    )
+    aggregated["volume_base"] = np.nan_to_num(aggregated["volume_base"], nan=0.0)
+
+    rows = len(bucket_timestamps)
+    vol_data_by_time = pd.DataFrame(
+        {
+            "exchange_name": np.full(rows, download["exchange_name"], dtype=object),
+            "pair": np.full(rows, download["pair"], dtype=object),
+            "base": np.full(rows, download["base"], dtype=object),
+            "quote": np.full(rows, download["quote"], dtype=object),
+            **aggregated,
+            "timestamp": pd.to_datetime(bucket_timestamps, unit="ms"),
+        }
+    )
+
+    return vol_data_by_time
+
+
+def build_ohlcv_output(download, data_list, quote_legs, quote_direction="nearest", quote_tolerance=None, quote_price_cache=None):
+    """Supporting function. Turns the raw candles of a download (see prepare_download and download_candles) into the ohlcv_data_download output.
+    quote_price_cache is a dict of Coingecko prices by quote currency, shared by the downloads of one run so every currency is looked up once."""
+    pair = download["pair"]
+    quote = download["quote"]
+    period_start_timestamp = download["period_start_timestamp"]
+    period_end_timestamp = download["period_end_timestamp"]
+
+    count("rows_in", len(data_list), function="build_ohlcv_output")
+    with stage("candles_frame"):
+        vol_data = candles_frame(download, data_list)
+
+    if vol_data["volume_base"].sum() == 0:  # to get rid of pairs that dont exist
+        print("no volume data for this time period -", pair)
+        raise Exception
+
+    if quote == "USDT":
+        vol_data["quote_currency_price_usdt"] = 1
+
+    elif quote_legs is not None:  # convert quote to USDT, possibly through other currencies e.g. KRW -> BTC -> USDT
+        quote_legs = [
+            (
+                [
+                    i
+                    for i in leg_list
+                    if i[0] / 1000 <= period_end_timestamp
+                    and i[0] / 1000 >= period_start_timestamp
+                ],
+                inverted,
+            )
+            for leg_list, inverted in quote_legs
+        ]
+
+        with stage("quote_conversion"):
+            vol_data["quote_currency_price_usdt"], outside_tolerance = conversion_rates(
+                vol_data["timestamp"].values.astype("datetime64[ms]").astype(np.int64),
+                quote_legs,
+                quote_direction,
+                None if quote_tolerance is None else quote_tolerance * 1000,
+            )
+        print("Number of rows without a quote currency price within tolerance:", outside_tolerance)
+
+    else:  # cant find any route to USDT
+        print(
+            "Unable to find candle data for the quote currency in terms of USDT. We will convert the quote currency to USDT using price data from Coingecko at current prices. This might make the USDT equivalent values relatively less accurate."
+        )
+
+        if quote_price_cache is None:
+            quote_price_cache = {}
+        if quote not in quote_price_cache:
+            quote_price_cache[quote] = coingecko_usdt_price(quote)
+
+        vol_data["quote_currency_price_usdt"] = quote_price_cache[quote]
+
+    with stage("usdt_columns"):
+        vol_data = add_usdt_columns(vol_data)
+    with stage("resampling"):
+        vol_data_by_time = resample_output(download, vol_data)
+    count("rows_out", len(vol_data_by_time), function="build_ohlcv_output")
+
+    print("Number of rows:", len(vol_data_by_time))
+    print("Number of rows with NaN values:", len(vol_data_by_time[vol_data_by_time.isna().any(axis=1)]))
+
+    return vol_data_by_time
+
+
+
+async def download_job(download, store=None, leg_cache=None):
+    """Supporting function. Runs download_candles for a dict made by prepare_download."""
+    return await download_candles(
+        download["exchange"],
+        download["pair"],
+        download["quote"],
+        download["timeframe"],
+        download["period_start_timestamp"],
+        download["period_end_timestamp"],
+        download["max_data_points"],
+        store,
+        leg_cache,
+    )
+
+
+def ohlcv_data_download(
+    exchange,
+    pair,
+    period_start,
+    period_end,
+    candle_duration_seconds_data_download,
+    candle_duration_seconds_result_output,
+    store=None,
+    quote_direction="nearest",
+    quote_tolerance=None,
+):
+    """use the pair name from the ticker_finder function output.
+    supported values for exchange parameter: binance, upbit, bithumb, coinbaseprime, huobi, okx, gateio, bybit, kucoin, mexc, bitget
+    Time period format should be like this '2023-02-22 00:00:00+00:00' and should be in UTC timezone
+    The bigger the input candlestick, the more information we lose and the faster the code runs. Only column impacted by using larger inputs is for average price.
+    candle_duration_seconds_data_download options can be found in exchange_dict (settings)
+    candle_duration_seconds_result_output should be equal or larger than candle_duration_seconds_data_download in terms of seconds
+    store is an optional CandleStore - raw candles it already holds are read from it, only newer ones are downloaded and then added to it
+    quote_direction and quote_tolerance (in seconds, None means any distance) control how quote currency prices are matched to candles, see asof_join. Candles without a match within tolerance get NaN USDT values
+    """
+
+    with stage("ohlcv_data_download", exchange=exchange):
+        download = prepare_download(
+            exchange,
+            pair,
+            period_start,
+            period_end,
+            candle_duration_seconds_data_download,
+            candle_duration_seconds_result_output,
+        )
+
+        # collect OHLCV data for the pair (and the quote currency if it is not USDT), all page windows at once
+        with stage("download", exchange=exchange):
+            data_list, quote_legs = run_coroutine(download_job(download, store, {}))
+
+        return build_ohlcv_output(download, data_list, quote_legs, quote_direction, quote_tolerance)
+
+
+async def iter_ohlcv_output(download, quote_direction="nearest", quote_tolerance=None, max_concurrency=None):
+    """Supporting function. Streaming version of download_job + build_ohlcv_output, see ohlcv_data_download_stream.
+    Candles are kept until the output candle (bucket) they fall in is complete, i.e. until a page brings a candle from a later bucket. Complete buckets are converted to USDT, resampled and yielded, and their candles dropped."""
+    pair = download["pair"]
+    quote = download["quote"]
+    timeframe = download["timeframe"]
+    period_start_timestamp = download["period_start_timestamp"]
+    period_end_timestamp = download["period_end_timestamp"]
+    max_data_points = download["max_data_points"]
+    bucket_ms = download["output_seconds"] * 1000
+    tolerance = None if quote_tolerance is None else quote_tolerance * 1000
+
+    exchange = get_exchange(download["exchange"], asynchronous=True)
+    await load_markets_cached_async(exchange)
+    since_list = plan_ohlcv_windows(
+        period_start_timestamp, period_end_timestamp, max_data_points, settings.candle_duration_to_seconds[timeframe]
+    )
+    pages = iter_ohlcv_pages(exchange, pair, timeframe, since_list, max_data_points, max_concurrency)
+    legs = None
+    try:
+        if quote != "USDT":
+            legs = await open_quote_legs(
+                exchange, quote, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, max_concurrency
+            )
+            if legs is None:  # cant find any route to USDT
+                print(
+                    "Unable to find candle data for the quote currency in terms of USDT. We will convert the quote currency to USDT using price data from Coingecko at current prices. This might make the USDT equivalent values relatively less accurate."
+                )
+                usdt_price = await asyncio.get_running_loop().run_in_executor(None, coingecko_usdt_price, quote)
+
+        state = {"origin": None, "next_bucket": None, "has_volume": False, "rows": 0, "nan_rows": 0, "outside_tolerance": 0}
+        held = []  # output held back until a candle with volume shows up, since eager mode raises for pairs without any volume
+
+        def bucket_of(timestamp):
+            return state["origin"] + (timestamp - state["origin"]) // bucket_ms * bucket_ms
+
+        async def convert(candles):
+            with stage("candles_frame"):
+                vol_data = candles_frame(download, candles)
+            state["has_volume"] = state["has_volume"] or vol_data["volume_base"].sum() != 0
+            timestamps = vol_data["timestamp"].values.astype("datetime64[ms]").astype(np.int64)
+            first_bucket = bucket_of(timestamps.min()) if state["next_bucket"] is None else state["next_bucket"]
+            last_bucket = bucket_of(timestamps.max())
+            state["next_bucket"] = last_bucket + bucket_ms
+
+            if quote == "USDT":
+                vol_data["quote_currency_price_usdt"] = 1
+            elif legs is not None:  # same arithmetic as conversion_rates
+                rates = np.ones(len(timestamps))
+                for leg in legs:
+                    await leg.load_until(timestamps.max())
+                    with stage("quote_conversion"):
+                        prices, _ = asof_join(timestamps, leg.timestamps, leg.prices, quote_direction, tolerance)
+                        rates = rates / prices if leg.inverted else rates * prices
+                        leg.forget_before(state["next_bucket"])
+                vol_data["quote_currency_price_usdt"] = rates
+                state["outside_tolerance"] += int(np.isnan(rates).sum())
+            else:
+                vol_data["quote_currency_price_usdt"] = usdt_price
+
+            with stage("usdt_columns"):
+                vol_data = add_usdt_columns(vol_data)
+            with stage("resampling"):
+                vol_data_by_time = resample_output(
+                    download,
+                    vol_data,
+                    state["origin"],
+                    first_bucket,
+                    last_bucket,
+                )
+            count("rows_out", len(vol_data_by_time), function="ohlcv_data_download_stream")
+            vol_data_by_time.index = pd.RangeIndex(state["rows"], state["rows"] + len(vol_data_by_time))
+            state["rows"] += len(vol_data_by_time)
+            state["nan_rows"] += len(vol_data_by_time[vol_data_by_time.isna().any(axis=1)])
+            held.append(vol_data_by_time)
+
+        pending = []
+        while True:
+            try:
+                with stage("paging", exchange=exchange.id):  # only the wait for the next page, not the time the consumer spends between chunks
+                    page = await pages.__anext__()
+            except StopAsyncIteration:
+                break
+            count("pages", exchange=exchange.id)
+            count("candles_downloaded", len(page), exchange=exchange.id)
+            page = [
+                i
+                for i in page
+                if i[0] / 1000 <= period_end_timestamp and i[0] / 1000 >= period_start_timestamp
+            ]
+            count("rows_in", len(page), function="ohlcv_data_download_stream")
+            if len(page) == 0:
+                continue
+            if state["origin"] is None:  # midnight of the first candle's day, like pd.Grouper's default origin
+                first = min(int(i[0]) for i in page)
+                state["origin"] = first - first % (24 * 3600 * 1000)
+            if state["next_bucket"] is not None:  # candles of buckets that were already yielded come from overlapping pages
+                page = [i for i in page if i[0] >= state["next_bucket"]]
+            pending.extend(page)
+            if len(pending) == 0:
+                continue
+
+            open_bucket = bucket_of(max(int(i[0]) for i in pending))
+            ready = [i for i in pending if i[0] < open_bucket]
+            if len(ready) > 0:
+                pending = [i for i in pending if i[0] >= open_bucket]
+                await convert(ready)
+                if state["has_volume"]:
+                    while held:
+                        yield held.pop(0)
+
+        if len(pending) > 0:
+            await convert(pending)
+        if not state["has_volume"]:  # to get rid of pairs that dont exist
+            print("no volume data for this time period -", pair)
+            raise Exception
+        while held:
+            yield held.pop(0)
+
+        if legs is not None:
+            print("Number of rows without a quote currency price within tolerance:", state["outside_tolerance"])
+        print("Number of rows:", state["rows"])
+        print("Number of rows with NaN values:", state["nan_rows"])
+    finally:
+        await pages.aclose()
+        for leg in legs or []:
+            await leg.close()
+
+
+def ohlcv_data_download_stream(
+    exchange,
+    pair,
+    period_start,
+    period_end,
+    candle_duration_seconds_data_download,
+    candle_duration_seconds_result_output,
+    quote_direction="nearest",
+    quote_tolerance=None,
+    max_concurrency=None,
+):
+    """streaming version of ohlcv_data_download for long periods of small candles, e.g. years of 1s or 1m data
+    returns a generator of DataFrames with the ohlcv_data_download columns, each holding the next output candles in time order, as soon as the pages they are made of have arrived
+    only the pages in flight (at most max_concurrency, by default what the exchange's rateLimit allows) and the candles of the output candle being built are held in memory, however long the period is
+    pd.concat of everything it yields is the same DataFrame ohlcv_data_download returns for the same candles
+    the parameters work as in ohlcv_data_download. CandleStore is not supported here, it would have to read the whole stored range first"""
+
+    download = prepare_download(
+        exchange,
+        pair,
+        period_start,
+        period_end,
+        candle_duration_seconds_data_download,
+        candle_duration_seconds_result_output,
+    )
+
+    return iterate_async(iter_ohlcv_output(download, quote_direction, quote_tolerance, max_concurrency))
+
+
+async def download_jobs(downloads, store=None, max_concurrent_jobs=8):
+    """Supporting function. Downloads the raw candles of many prepared downloads with one shared leg cache.
+    Returns a (data_list, quote_legs) tuple or the exception for every download, in order."""
+    leg_cache = {}
+    semaphore = asyncio.Semaphore(max_concurrent_jobs)
+
+    async def run(download):
+        async with semaphore:
+            return await download_job(download, store, leg_cache)
+
+    return await asyncio.gather(*[run(download) for download in downloads], return_exceptions=True)
+
+
+def ohlcv_batch_download(jobs, store=None, quote_direction="nearest", quote_tolerance=None, max_concurrent_jobs=8):
+    """downloads many pairs at once, from one or more exchanges, and returns all of them in a single long-format DataFrame (the ohlcv_data_download columns, one row per pair per output candle)
+    every job is a tuple or a dict with the first six arguments of ohlcv_data_download: (exchange, pair, period_start, period_end, candle_duration_seconds_data_download, candle_duration_seconds_result_output)
+    all jobs share the exchange instances and their market metadata, and quote conversion legs (e.g. KRW/USDT) are downloaded once per exchange, timeframe and period however many pairs need them
+    at most max_concurrent_jobs jobs download at the same time. A job that fails is reported and left out of the result
+    store, quote_direction and quote_tolerance work as in ohlcv_data_download"""
+    parameters = [
+        "exchange",
+        "pair",
+        "period_start",
+        "period_end",
+        "candle_duration_seconds_data_download",
+        "candle_duration_seconds_result_output",
+    ]
+    downloads = []
+    for job in jobs:
+        if not isinstance(job, dict):
+            job = dict(zip(parameters, job))
+        downloads.append(prepare_download(*[job[parameter] for parameter in parameters]))
+
+    with stage("download", exchange="batch"):
+        results = run_coroutine(download_jobs(downloads, store, max_concurrent_jobs))
+
+    quote_price_cache = {}
+    outputs = []
+    for download, result in zip(downloads, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            data_list, quote_legs = result
+            outputs.append(
+                build_ohlcv_output(download, data_list, quote_legs, quote_direction, quote_tolerance, quote_price_cache)
+            )
+        except Exception as e:  # one failing pair should not lose the others
+            print("failed to download", download["exchange"], download["pair"], "-", repr(e))
+
+    if len(outputs) == 0:
+        raise Exception("none of the jobs returned data")
+    return pd.concat(outputs, ignore_index=True)
@@ -0,0 +1,30 @@
+"""Stand-ins for the heavy libraries (pandas, numpy, ccxt, requests, aiohttp), imported on first use."""
+
+import importlib
+
+
+class LazyModule:
+    """Supporting class. Stands in for a heavy module (pandas, numpy, ccxt ...) until it is first used, then imports it and puts the real module in its place in namespace (the globals() of the submodule that uses it).
+    This keeps `import token_ohlcv_download` (and the command line) fast: a call only loads the libraries it needs. Submodules (e.g. ccxt.async_support) are imported on first attribute access too, an attribute that is neither raises AttributeError."""
+
+    def __init__(self, module_name, global_name, namespace):
+        self._module_name = module_name
+        self._global_name = global_name
+        self._namespace = namespace
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self._module_name)
+        self._namespace[self._global_name] = module
+        try:
+            return getattr(module, attribute)
+        except AttributeError:
+            pass
+        try:
+            return importlib.import_module(f"{self._module_name}.{attribute}")
+        except ModuleNotFoundError as e:
+            if e.name != f"{self._module_name}.{attribute}":  # the submodule exists but needs something that is missing
+                raise
+        raise AttributeError(f"module {self._module_name!r} has no attribute {attribute!r}")
+
+    def __repr__(self):
+        return f"<lazy module {self._module_name}>"
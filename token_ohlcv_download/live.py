@@ -0,0 +1,270 @@
+"""Live mode: closed candles of many exchanges over WebSocket, as they happen (LiveOHLCV)."""
+
+import asyncio
+import time
+
+from . import settings
+from .lazy import LazyModule
+from .background import iterate_async
+from .ratelimit import rate_limited_async
+from .markets import exchange_class, get_exchange, load_markets_cached_async
+from .paging import fetch_candles
+from .conversion import coingecko_usdt_price, conversion_rates, find_conversion_path
+from .download import add_usdt_columns, candles_frame, resample_output
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+def pro_exchange(exchange_id):
+    """Supporting function. Default exchange_factory of LiveOHLCV: a ccxt.pro instance, whose watch_ohlcv streams candles over WebSocket"""
+    return exchange_class(exchange_id, "pro")()
+
+
+class LiveOHLCV:
+    """Live mode: keeps candles fresh from WebSocket streams (ccxt.pro watch_ohlcv) instead of polling, for many (exchange id, pair) subscriptions from one event loop.
+    watch_ohlcv returns the candles that changed since the previous call, usually just the one that is still open (ccxt.pro's newUpdates). The newest candle of every subscription is kept between calls, and it counts as closed once a newer one shows up; closed candles are turned into the ohlcv_data_download output (one row per candle of timeframe, quote converted to USDT) and handed out by run / stream.
+    When the candles that close do not follow the last one handed out (a dropped connection, a reconnect, a restart with a CandleStore), the missing ones are downloaded through the REST paging engine (fetch_candles) first, so the output has no holes.
+    Quotes other than USDT are converted along the route find_conversion_path finds: streamed candles with the latest candle of every market on it, watched alongside, candles backfilled over REST with the leg candles of their own time (conversion_rates). Without a route the current Coingecko price is used for every candle.
+    exchange_factory(exchange_id) makes the streaming client, by default a ccxt.pro instance; anything with async watch_ohlcv(symbol, timeframe) and close() works, e.g. a client of a local WebSocket stand-in. REST backfills go through get_exchange.
+    latency_stats reports, per subscription, how long after a candle's close it was handed out."""
+
+    def __init__(self, subscriptions, timeframe="1m", store=None, exchange_factory=None, reconnect_delay=1.0):
+        self.subscriptions = [tuple(subscription) for subscription in subscriptions]
+        self.timeframe = timeframe
+        self.step = settings.candle_duration_to_seconds[timeframe] * 1000
+        self.store = store
+        self.exchange_factory = pro_exchange if exchange_factory is None else exchange_factory
+        self.reconnect_delay = reconnect_delay
+        self.watchers = {}  # exchange id -> streaming client
+        self.last_closed = {}  # (exchange id, pair) -> timestamp (ms) of the last candle handed out
+        self.open_candles = {}  # (exchange id, pair) -> {timestamp: latest update} of the candles after last_closed, the newest is still open
+        self.leg_prices = {}  # (exchange id, symbol) -> latest (open + close) / 2
+        self.routes = {}  # (exchange id, pair) -> list of (symbol, inverted) legs, or None for Coingecko
+        self.coingecko_prices = {}
+        self.latencies = {}  # (exchange id, pair) -> seconds between candle close and hand out
+        self.backfilled = {}  # (exchange id, pair) -> candles that came from REST
+        self.reconnects = {}  # (exchange id, pair) -> watch_ohlcv errors
+
+    def download(self, exchange_id, pair):
+        """Supporting function. The prepare_download style dict used to build the output of one subscription"""
+        base, quote = pair.split(":")[0].split("/")
+        exchange_settings = settings.exchange_dict.get(exchange_id, {})
+        return {
+            "exchange": exchange_id,
+            "exchange_name": exchange_settings.get("name", exchange_id),
+            "pair": pair,
+            "base": base,
+            "quote": quote,
+            "timeframe": self.timeframe,
+            "output_seconds": self.step // 1000,
+            "max_data_points": exchange_settings.get("max_data_points", settings.default_max_data_points),
+            "period_start_timestamp": -np.inf,
+            "period_end_timestamp": np.inf,
+        }
+
+    async def rest_candles(self, exchange_id, pair, first, last):
+        """Supporting function. Candles from first to last (timestamps in ms, both included) over REST"""
+        exchange = get_exchange(exchange_id, asynchronous=True)
+        await load_markets_cached_async(exchange)
+        candles = await fetch_candles(
+            exchange, pair, self.timeframe, first / 1000, last / 1000, self.download(exchange_id, pair)["max_data_points"]
+        )
+        by_timestamp = {int(candle[0]): candle for candle in candles if first <= candle[0] <= last}
+        return [by_timestamp[timestamp] for timestamp in sorted(by_timestamp)]
+
+    async def watch_leg(self, exchange_id, symbol):
+        """Supporting function. Keeps leg_prices up to date for one market of a conversion route"""
+        while True:
+            try:
+                candles = await self.watchers[exchange_id].watch_ohlcv(symbol, self.timeframe)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("watch_ohlcv failed for", exchange_id, symbol, "-", repr(e))
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            if len(candles) > 0:
+                latest = max(candles, key=lambda candle: candle[0])
+                self.leg_prices[(exchange_id, symbol)] = (latest[1] + latest[4]) / 2
+
+    async def prepare_route(self, exchange_id, pair, tasks):
+        """Supporting function. Finds how to convert the quote of a subscription to USDT and starts watching the legs"""
+        quote = self.download(exchange_id, pair)["quote"]
+        if quote == "USDT":
+            self.routes[(exchange_id, pair)] = []
+            return
+        exchange = get_exchange(exchange_id, asynchronous=True)
+        await load_markets_cached_async(exchange)
+        route = find_conversion_path(exchange.markets, quote)
+        self.routes[(exchange_id, pair)] = route
+        if route is None:
+            if quote not in self.coingecko_prices:
+                self.coingecko_prices[quote] = await asyncio.get_running_loop().run_in_executor(None, coingecko_usdt_price, quote)
+            return
+        for symbol, _ in route:
+            if (exchange_id, symbol) in self.leg_prices:
+                continue
+            latest = await rate_limited_async(exchange, exchange.fetch_ohlcv, symbol, timeframe=self.timeframe, limit=2)
+            if len(latest) > 0:
+                self.leg_prices[(exchange_id, symbol)] = (latest[-1][1] + latest[-1][4]) / 2
+            tasks.append(asyncio.ensure_future(self.watch_leg(exchange_id, symbol)))
+
+    def quote_rate(self, exchange_id, pair):
+        """Supporting function. Current USDT price of one unit of the subscription's quote currency"""
+        route = self.routes[(exchange_id, pair)]
+        if route is None:
+            return self.coingecko_prices[self.download(exchange_id, pair)["quote"]]
+        rate = 1.0
+        for symbol, inverted in route:
+            price = self.leg_prices.get((exchange_id, symbol), np.nan)
+            rate = rate / price if inverted else rate * price
+        return rate
+
+    async def backfill_rates(self, exchange_id, pair, timestamps):
+        """Supporting function. USDT price of the quote currency at the time of candles backfilled over REST, from the REST candles of the legs of the route, as {timestamp: rate}
+        Timestamps that a leg has no candle for are left out, they get the current rate like streamed candles"""
+        route = self.routes[(exchange_id, pair)]
+        if not route or len(timestamps) == 0:
+            return {}
+        try:
+            legs = await asyncio.gather(
+                *[self.rest_candles(exchange_id, symbol, min(timestamps), max(timestamps)) for symbol, _ in route]
+            )
+        except Exception as e:
+            print("backfill of the conversion legs failed for", exchange_id, pair, "-", repr(e))
+            return {}
+        rates, _ = conversion_rates(timestamps, [(leg, inverted) for leg, (_, inverted) in zip(legs, route)], tolerance=self.step)
+        return {timestamp: rate for timestamp, rate in zip(timestamps, rates) if not np.isnan(rate)}
+
+    def output(self, exchange_id, pair, candles, rates=None):
+        """Supporting function. Turns closed raw candles into ohlcv_data_download output rows, converted with the current quote rate or the {timestamp: rate} of rates"""
+        download = self.download(exchange_id, pair)
+        vol_data = candles_frame(download, candles)
+        rate = self.quote_rate(exchange_id, pair)
+        if rates:
+            timestamps = vol_data["timestamp"].values.astype("datetime64[ms]").astype(np.int64)
+            vol_data["quote_currency_price_usdt"] = [rates.get(int(timestamp), rate) for timestamp in timestamps]
+        else:
+            vol_data["quote_currency_price_usdt"] = rate
+        vol_data = add_usdt_columns(vol_data)
+        return resample_output(download, vol_data)
+
+    async def watch(self, exchange_id, pair, closed_queue):
+        """Supporting function. Watches one subscription and puts (exchange id, pair, closed candles, rates of the REST ones) on closed_queue, REST candles included where the stream skipped some"""
+        key = (exchange_id, pair)
+        while True:
+            try:
+                candles = await self.watchers[exchange_id].watch_ohlcv(pair, self.timeframe)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # the connection dropped, try again; the candles missed meanwhile are backfilled
+                self.reconnects[key] = self.reconnects.get(key, 0) + 1
+                print("watch_ohlcv failed for", exchange_id, pair, "-", repr(e))
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            received_at = time.time()
+            if len(candles) == 0:
+                continue
+
+            last = self.last_closed.get(key)
+            open_candles = self.open_candles.setdefault(key, {})
+            for candle in candles:  # later updates of the same candle win
+                if last is None or candle[0] > last:
+                    open_candles[int(candle[0])] = list(candle)
+            if len(open_candles) == 0:
+                continue
+            newest = max(open_candles)
+            closed = {timestamp: open_candles.pop(timestamp) for timestamp in sorted(open_candles) if timestamp < newest}
+            if len(closed) == 0:
+                continue
+
+            streamed = list(closed)
+            first_missing = min(closed) if last is None else last + self.step
+            missing = [timestamp for timestamp in range(first_missing, max(closed), self.step) if timestamp not in closed]
+            if len(missing) > 0:
+                try:
+                    rest = await self.rest_candles(exchange_id, pair, missing[0], missing[-1])
+                except Exception as e:
+                    print("backfill failed for", exchange_id, pair, "-", repr(e))
+                    rest = []
+                rest = [candle for candle in rest if int(candle[0]) not in closed]
+                self.backfilled[key] = self.backfilled.get(key, 0) + len(rest)
+                for candle in rest:
+                    closed[int(candle[0])] = list(candle)
+                rates = await self.backfill_rates(exchange_id, pair, [int(candle[0]) for candle in rest])
+            else:
+                rates = {}
+
+            self.latencies.setdefault(key, []).extend(received_at - (timestamp + self.step) / 1000 for timestamp in streamed)
+            self.last_closed[key] = max(closed)
+            await closed_queue.put((exchange_id, pair, [closed[timestamp] for timestamp in sorted(closed)], rates))
+
+    async def run(self, duration=None):
+        """async generator of ohlcv_data_download style DataFrames, one per batch of candles that closed on a subscription, for duration seconds (or until it is closed)"""
+        closed_queue = asyncio.Queue()
+        tasks = []
+        try:
+            for exchange_id, pair in self.subscriptions:
+                if exchange_id not in self.watchers:
+                    self.watchers[exchange_id] = self.exchange_factory(exchange_id)
+                await self.prepare_route(exchange_id, pair, tasks)
+                if self.store is not None:  # pick up where the stored candles end, e.g. after a restart
+                    high_water_mark = self.store.high_water_mark(exchange_id, pair, self.timeframe)
+                    if high_water_mark is not None:
+                        self.last_closed[(exchange_id, pair)] = high_water_mark
+                tasks.append(asyncio.ensure_future(self.watch(exchange_id, pair, closed_queue)))
+
+            deadline = None if duration is None else time.time() + duration
+            while deadline is None or time.time() < deadline:
+                try:
+                    exchange_id, pair, candles, rates = await asyncio.wait_for(
+                        closed_queue.get(), None if deadline is None else max(0.0, deadline - time.time())
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if self.store is not None:
+                    self.store.append(exchange_id, pair, self.timeframe, candles)
+                yield self.output(exchange_id, pair, candles, rates)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for watcher in self.watchers.values():
+                await watcher.close()
+            self.watchers = {}
+
+    def stream(self, duration=None):
+        """same as run, as a normal generator (see iterate_async)"""
+        return iterate_async(self.run(duration))
+
+    def latency_stats(self):
+        """returns a DataFrame with one row per subscription: candles handed out straight from the stream, their latency after the candle's close (mean, median, 95th percentile and max, in seconds), candles backfilled over REST and reconnects"""
+        rows = []
+        for exchange_id, pair in self.subscriptions:
+            key = (exchange_id, pair)
+            latencies = np.array(self.latencies.get(key, []))
+            rows.append(
+                {
+                    "exchange": exchange_id,
+                    "pair": pair,
+                    "candles": len(latencies),
+                    "mean": latencies.mean() if len(latencies) else np.nan,
+                    "median": np.median(latencies) if len(latencies) else np.nan,
+                    "p95": np.percentile(latencies, 95) if len(latencies) else np.nan,
+                    "max": latencies.max() if len(latencies) else np.nan,
+                    "backfilled": self.backfilled.get(key, 0),
+                    "reconnects": self.reconnects.get(key, 0),
+                }
+            )
+        return pd.DataFrame(rows)
+
+
+def live_ohlcv(pair, exchanges=None, timeframe="1m", duration=None, store=None, exchange_factory=None):
+    """streams closed candles of pair from many exchanges at once over WebSocket, as ohlcv_data_download style DataFrames (one per exchange and batch of closed candles), for duration seconds or until the generator is closed
+    exchanges defaults to every exchange in exchange_dict. Candles missed by a stream are backfilled over REST, and with a CandleStore every closed candle is also appended to it
+    for latency numbers use LiveOHLCV directly and call its latency_stats"""
+    if exchanges is None:
+        exchanges = list(settings.exchange_dict)
+    live = LiveOHLCV([(exchange_id, pair) for exchange_id in exchanges], timeframe, store, exchange_factory)
+    return live.stream(duration)
@@ -0,0 +1,179 @@
+"""Shared exchange instances (get_exchange) and their market metadata, cached in memory and on disk (market_cache_dir)."""
+
+from collections import OrderedDict
+import asyncio
+import atexit
+import importlib
+import json
+import os
+import threading
+import time
+
+from . import settings
+from .background import background_loop_running, run_coroutine
+from .metrics import count, count_response_bytes, stage
+from .ratelimit import rate_limited, rate_limited_async
+
+_market_cache = OrderedDict()  # exchange id -> (fetched_at, markets, currencies)
+_exchange_instances = OrderedDict()  # (exchange id, event loop or None) -> ccxt instance
+_cache_lock = threading.Lock()
+
+
+def read_market_cache(exchange_id, ttl=None):
+    """Supporting function. Returns (markets, currencies) for exchange_id from memory or from the file in market_cache_dir.
+    Returns None when neither has an entry younger than ttl seconds (market_cache_ttl by default)."""
+    if ttl is None:
+        ttl = settings.market_cache_ttl
+    now = time.time()
+
+    with _cache_lock:
+        entry = _market_cache.get(exchange_id)
+        if entry is not None and now - entry[0] <= ttl:
+            _market_cache.move_to_end(exchange_id)
+            return entry[1], entry[2]
+
+    try:
+        with open(os.path.join(settings.market_cache_dir, f"{exchange_id}.json")) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if now - entry["fetched_at"] > ttl:
+        return None
+
+    remember_markets(exchange_id, entry["markets"], entry["currencies"], entry["fetched_at"])
+    return entry["markets"], entry["currencies"]
+
+
+def remember_markets(exchange_id, markets, currencies, fetched_at):
+    """Supporting function. Puts market metadata in the in-memory LRU, dropping the least recently used exchange when it is full."""
+    with _cache_lock:
+        _market_cache[exchange_id] = (fetched_at, markets, currencies)
+        _market_cache.move_to_end(exchange_id)
+        while len(_market_cache) > settings.market_cache_size:
+            _market_cache.popitem(last=False)
+
+
+def write_market_cache(exchange_id, markets, currencies):
+    """Supporting function. Stores market metadata for exchange_id in memory and in market_cache_dir."""
+    fetched_at = time.time()
+    remember_markets(exchange_id, markets, currencies, fetched_at)
+
+    os.makedirs(settings.market_cache_dir, exist_ok=True)
+    file_path = os.path.join(settings.market_cache_dir, f"{exchange_id}.json")
+    temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"fetched_at": fetched_at, "markets": markets, "currencies": currencies}, f, default=str)
+    os.replace(temp_path, file_path)  # readers never see a half written file
+
+
+def clear_market_cache(exchange_id=None):
+    """deletes cached market metadata for exchange_id, or for every exchange if no id is given"""
+    with _cache_lock:
+        if exchange_id is None:
+            _market_cache.clear()
+        else:
+            _market_cache.pop(exchange_id, None)
+
+    if not os.path.isdir(settings.market_cache_dir):
+        return
+    for file_name in os.listdir(settings.market_cache_dir):
+        if exchange_id is None or file_name == f"{exchange_id}.json":
+            os.remove(os.path.join(settings.market_cache_dir, file_name))
+
+
+def exchange_class(exchange_id, flavour="sync"):
+    """the exchange registry: returns the ccxt class of exchange_id without creating instances of any other exchange
+    flavour is sync (ccxt), async (ccxt.async_support) or pro (ccxt.pro, WebSocket); only that flavour's ccxt module is imported, the first time it is asked for
+    ids ccxt has renamed (see exchange_aliases) are looked up under their new name when the installed ccxt does not know the old one"""
+    module = importlib.import_module(settings.exchange_flavours[flavour])
+    cls = getattr(module, exchange_id, None)
+    if cls is None and exchange_id in settings.exchange_aliases:
+        cls = getattr(module, settings.exchange_aliases[exchange_id], None)
+    if cls is None:
+        raise Exception(f"{exchange_id} is not an exchange of {settings.exchange_flavours[flavour]}")
+    return cls
+
+
+def get_exchange(exchange_id, asynchronous=False):
+    """returns a shared ccxt instance of exchange_id, creating it the first time it is asked for
+    asynchronous instances (ccxt.async_support) belong to the event loop that is running when they are created, so they have to be asked for from inside a coroutine
+    markets are not loaded here, use load_markets_cached / load_markets_cached_async for that
+    ccxt's own rate limiting is turned off because this package sends its requests through rate_limited / rate_limited_async, which also back off when the exchange throttles"""
+    loop = asyncio.get_running_loop() if asynchronous else None
+    key = (exchange_id, loop)
+
+    with _cache_lock:
+        exchange = _exchange_instances.get(key)
+        if exchange is not None:
+            _exchange_instances.move_to_end(key)
+            return exchange
+
+        exchange = exchange_class(exchange_id, "async" if asynchronous else "sync")()
+        exchange.enableRateLimit = False  # requests are spaced by the exchange's RateLimiter instead, see rate_limited
+        count_response_bytes(exchange)
+        _exchange_instances[key] = exchange
+        evicted = []
+        while len(_exchange_instances) > settings.exchange_cache_size:
+            evicted.append(_exchange_instances.popitem(last=False))
+
+    for (_, evicted_loop), evicted_exchange in evicted:
+        if evicted_loop is not None and not evicted_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(evicted_exchange.close(), evicted_loop)
+    return exchange
+
+
+def load_markets_cached(exchange, reload=False):
+    """loads markets on a synchronous ccxt instance, from the market cache when it is warm and from the exchange otherwise"""
+    if exchange.markets and not reload:
+        return exchange.markets
+
+    with stage("load_markets", exchange=exchange.id):
+        cached = None if reload else read_market_cache(exchange.id)
+        count("market_cache", outcome="miss" if cached is None else "hit")
+        if cached is not None:
+            exchange.set_markets(*cached)
+        else:
+            rate_limited(exchange, exchange.load_markets, reload=reload)
+            write_market_cache(exchange.id, exchange.markets, exchange.currencies)
+    return exchange.markets
+
+
+async def load_markets_cached_async(exchange, reload=False):
+    """same as load_markets_cached for a ccxt.async_support instance"""
+    if exchange.markets and not reload:
+        return exchange.markets
+
+    with stage("load_markets", exchange=exchange.id):
+        cached = None if reload else read_market_cache(exchange.id)
+        count("market_cache", outcome="miss" if cached is None else "hit")
+        if cached is not None:
+            exchange.set_markets(*cached)
+            # ccxt calls load_markets at the start of every request, so mark the markets as already loaded
+            markets_loading = asyncio.get_running_loop().create_future()
+            markets_loading.set_result(exchange.markets)
+            exchange.markets_loading = markets_loading
+        else:
+            await rate_limited_async(exchange, exchange.load_markets, reload=reload)
+            write_market_cache(exchange.id, exchange.markets, exchange.currencies)
+    return exchange.markets
+
+
+async def close_exchanges_async():
+    """Supporting function. Closes the http sessions of the shared async exchange instances that belong to the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _cache_lock:
+        keys = [key for key in _exchange_instances if key[1] is loop]
+        exchanges = [_exchange_instances.pop(key) for key in keys]
+    for exchange in exchanges:
+        await exchange.close()
+
+
+def close_exchanges():
+    """closes every shared exchange instance created by this package - called automatically when python exits"""
+    if background_loop_running():
+        run_coroutine(close_exchanges_async())
+    with _cache_lock:
+        _exchange_instances.clear()
+
+
+atexit.register(close_exchanges)
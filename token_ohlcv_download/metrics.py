@@ -0,0 +1,209 @@
+"""Instrumentation: stage timings, counters and latencies while enable_metrics is on, Prometheus / JSON export and cProfile reports."""
+
+import contextlib
+import cProfile
+import json
+import pstats
+import threading
+import time
+
+from .background import run_coroutine
+
+_metrics = None  # stage timings, counters and latencies while instrumentation is on (see enable_metrics), None while it is off
+_metrics_lock = threading.Lock()
+
+
+class NoStage:
+    """Supporting class. What stage hands out while instrumentation is off, a context manager that does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_no_stage = NoStage()
+
+
+class Stage:
+    """Supporting class. Times one run of a stage into the metrics"""
+
+    __slots__ = ("key", "begin")
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.begin
+        with _metrics_lock:
+            if _metrics is not None:
+                entry = _metrics["stages"].setdefault(self.key, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+        return False
+
+
+def stage(name, **labels):
+    """times the block it wraps (with stage("paging", exchange="binance"): ...) as one run of a stage; does nothing while instrumentation is off"""
+    if _metrics is None:
+        return _no_stage
+    return Stage((name, tuple(sorted(labels.items()))))
+
+
+def count(name, value=1, **labels):
+    """adds value to a counter, e.g. count("rows_in", 500, function="ohlcv_data_download"); does nothing while instrumentation is off"""
+    if _metrics is None:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        if _metrics is not None:
+            _metrics["counters"][key] = _metrics["counters"].get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """records one latency (count, sum and max are kept), e.g. observe("request", 0.12, exchange="binance"); does nothing while instrumentation is off"""
+    if _metrics is None:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        if _metrics is not None:
+            entry = _metrics["latencies"].setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+
+def metrics_enabled():
+    """Supporting function. True while instrumentation is on (see enable_metrics)"""
+    return _metrics is not None
+
+
+def enable_metrics(reset=True):
+    """turns instrumentation on: from now on stage timings (load_markets, paging, quote conversion, resampling ...), requests and their latency per exchange, rate limit waits, retries, bytes received and rows in and out are recorded
+    reset=False keeps what was recorded before the last disable_metrics"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None or reset:
+            _metrics = {"started_at": time.time(), "stages": {}, "counters": {}, "latencies": {}}
+
+
+def disable_metrics():
+    """turns instrumentation off again and returns the last metrics_snapshot"""
+    global _metrics
+    snapshot = metrics_snapshot()
+    with _metrics_lock:
+        _metrics = None
+    return snapshot
+
+
+def metrics_snapshot():
+    """returns everything recorded since enable_metrics as a dict of lists (stages, counters, latencies), or None while instrumentation is off"""
+    with _metrics_lock:
+        if _metrics is None:
+            return None
+        return {
+            "started_at": _metrics["started_at"],
+            "taken_at": time.time(),
+            "stages": [
+                {"stage": name, "labels": dict(labels), "count": entry[0], "seconds": entry[1], "max_seconds": entry[2]}
+                for (name, labels), entry in _metrics["stages"].items()
+            ],
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _metrics["counters"].items()],
+            "latencies": [
+                {"name": name, "labels": dict(labels), "count": entry[0], "seconds": entry[1], "max_seconds": entry[2]}
+                for (name, labels), entry in _metrics["latencies"].items()
+            ],
+        }
+
+
+def metrics_json(file_path=None):
+    """returns metrics_snapshot as JSON text, and writes it to file_path if given"""
+    text = json.dumps(metrics_snapshot(), indent=1)
+    if file_path is not None:
+        with open(file_path, "w") as f:
+            f.write(text)
+    return text
+
+
+def prometheus_labels(labels):
+    """Supporting function. {key="value",...} with backslashes, quotes and newlines escaped"""
+    if not labels:
+        return ""
+    escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for key, value in labels.items()}
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(escaped.items())) + "}"
+
+
+def metrics_prometheus(file_path=None):
+    """returns metrics_snapshot in the Prometheus text exposition format (e.g. for a node_exporter textfile collector), and writes it to file_path if given"""
+    snapshot = metrics_snapshot()
+    lines = []
+    if snapshot is not None:
+        lines += ["# TYPE token_ohlcv_stage_seconds summary"]
+        for entry in snapshot["stages"]:
+            labels = dict(entry["labels"], stage=entry["stage"])
+            lines.append(f"token_ohlcv_stage_seconds_count{prometheus_labels(labels)} {entry['count']}")
+            lines.append(f"token_ohlcv_stage_seconds_sum{prometheus_labels(labels)} {entry['seconds']!r}")
+        for name in sorted({entry["name"] for entry in snapshot["counters"]}):
+            lines.append(f"# TYPE token_ohlcv_{name}_total counter")
+            for entry in snapshot["counters"]:
+                if entry["name"] == name:
+                    lines.append(f"token_ohlcv_{name}_total{prometheus_labels(entry['labels'])} {entry['value']!r}")
+        for name in sorted({entry["name"] for entry in snapshot["latencies"]}):
+            lines.append(f"# TYPE token_ohlcv_{name}_seconds summary")
+            for entry in snapshot["latencies"]:
+                if entry["name"] == name:
+                    lines.append(f"token_ohlcv_{name}_seconds_count{prometheus_labels(entry['labels'])} {entry['count']}")
+                    lines.append(f"token_ohlcv_{name}_seconds_sum{prometheus_labels(entry['labels'])} {entry['seconds']!r}")
+    text = "\n".join(lines) + "\n"
+    if file_path is not None:
+        with open(file_path, "w") as f:
+            f.write(text)
+    return text
+
+
+@contextlib.contextmanager
+def profile(file_path=None, sort="cumulative", limit=30):
+    """cProfile hook: profiles the block it wraps (with profile(): ohlcv_data_download(...)), in this thread and in the background event loop thread the downloads run in
+    prints the limit most expensive functions by sort, or dumps the stats to file_path (for pstats, snakeviz ...) if given"""
+    profilers = [cProfile.Profile(), cProfile.Profile()]
+
+    async def switch(on):
+        try:
+            profilers[1].enable() if on else profilers[1].disable()
+            return True
+        except ValueError:  # python 3.12+ profiles every thread with one profiler, and allows only one at a time
+            return False
+
+    profilers[0].enable()
+    background = run_coroutine(switch(True))
+    try:
+        yield
+    finally:
+        if background:
+            run_coroutine(switch(False))
+        profilers[0].disable()
+        stats = pstats.Stats(profilers[0])
+        if background:
+            stats.add(profilers[1])
+        if file_path is not None:
+            stats.dump_stats(file_path)
+        else:
+            stats.sort_stats(sort).print_stats(limit)
+
+
+def count_response_bytes(exchange):
+    """Supporting function. Makes a ccxt instance count the size of every http response it receives, in bytes (response_bytes counter)
+    ccxt hands over the body already decoded to text, so it is encoded back to UTF-8 (the charset exchange APIs answer in) to count bytes rather than characters"""
+    on_rest_response = exchange.on_rest_response
+
+    def counted(code, reason, url, method, response_headers, response_body, request_headers, request_body):
+        count("response_bytes", len(response_body.encode("utf-8")) if isinstance(response_body, str) else len(response_body or b""), exchange=exchange.id)
+        return on_rest_response(code, reason, url, method, response_headers, response_body, request_headers, request_body)
+
+    exchange.on_rest_response = counted
@@ -0,0 +1,114 @@
+"""The async paging engine: every page window of a period is planned up front and requested concurrently."""
+
+from collections import deque
+import asyncio
+import time
+
+from . import settings
+from .metrics import count, stage
+from .ratelimit import rate_limited_async
+
+
+def plan_ohlcv_windows(period_start_timestamp, period_end_timestamp, max_data_points, candle_duration_seconds):
+    """Supporting function. Returns the since values (in ms) of every page needed to cover the period.
+    Each page holds max_data_points candles, so every window is known before the first request goes out."""
+    window_seconds = max_data_points * candle_duration_seconds
+    window_count = int((period_end_timestamp - period_start_timestamp) // window_seconds) + 1
+    return [
+        int((period_start_timestamp + max_data_points * increment * candle_duration_seconds) * 1000)
+        for increment in range(window_count)
+    ]
+
+
+def concurrency_limit(exchange):
+    """Supporting function. Number of pages that can be in flight at once on an exchange.
+    ccxt's rateLimit is the minimum number of ms between two requests, so roughly 1000 / rateLimit requests fit in a second of round trip time."""
+    rate_limit = getattr(exchange, "rateLimit", None) or 1000
+    return max(1, min(settings.max_concurrent_requests, int(1000 / rate_limit)))
+
+
+async def fetch_ohlcv_windows(exchange, pair, timeframe, since_list, limit, max_concurrency=None):
+    """Fetches every page window in since_list concurrently and returns all candles in window order.
+    exchange is a ccxt.async_support instance, or anything with an id and the same fetch_ohlcv coroutine (e.g. a local fake exchange serving canned pages). The id picks its RateLimiter; rateLimit is read when it is there and defaults to 1000 ms.
+    max_concurrency caps the number of requests in flight and defaults to what the exchange's rateLimit allows. Requests are spaced by the exchange's RateLimiter and retried when the exchange throttles."""
+    if max_concurrency is None:
+        max_concurrency = concurrency_limit(exchange)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_window(since):
+        async with semaphore:
+            return await rate_limited_async(exchange, exchange.fetch_ohlcv, pair, timeframe=timeframe, since=since, limit=limit)
+
+    tasks = [asyncio.ensure_future(fetch_window(since)) for since in since_list]
+    try:
+        pages = await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return [candle for page in pages for candle in page]
+
+
+async def iter_ohlcv_pages(exchange, pair, timeframe, since_list, limit, max_concurrency=None):
+    """Same as fetch_ohlcv_windows, but yields the pages one by one in window order instead of returning all candles at the end.
+    Only the next max_concurrency windows are requested ahead of the one being consumed, so however long since_list is only a few pages are held in memory at a time."""
+    if max_concurrency is None:
+        max_concurrency = concurrency_limit(exchange)
+    since_iter = iter(since_list)
+    in_flight = deque()
+
+    def request_next():
+        since = next(since_iter, None)
+        if since is not None:
+            in_flight.append(
+                asyncio.ensure_future(
+                    rate_limited_async(exchange, exchange.fetch_ohlcv, pair, timeframe=timeframe, since=since, limit=limit)
+                )
+            )
+
+    try:
+        for _ in range(max_concurrency):
+            request_next()
+        while in_flight:
+            page = await in_flight.popleft()
+            request_next()
+            yield page
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+def closed_candles(candles, timeframe, now=None):
+    """Supporting function. Drops candles that are still open (their period has not ended yet), so they never get stored as final."""
+    if now is None:
+        now = time.time()
+    cutoff = (now - settings.candle_duration_to_seconds[timeframe]) * 1000
+    return [candle for candle in candles if candle[0] <= cutoff]
+
+
+async def fetch_candles(exchange, pair, timeframe, period_start_timestamp, period_end_timestamp, max_data_points, store=None):
+    """Supporting function. Fetches the raw candles of pair between the two timestamps (in seconds).
+    With a CandleStore, candles up to the series' high-water mark are read from the store when it covers the start of the period, only the newer ones are downloaded, and the closed ones among them are appended to the store."""
+    candle_seconds = settings.candle_duration_to_seconds[timeframe]
+    fetch_start_timestamp = period_start_timestamp
+    stored = []
+    if store is not None:
+        first, high_water_mark = store.time_range(exchange.id, pair, timeframe)
+        if high_water_mark is not None and first / 1000 - (period_start_timestamp + 1) < candle_seconds:  # no candle is missing before the first stored one (the period is widened by 1 s in prepare_download)
+            stored = store.read(exchange.id, pair, timeframe, period_start_timestamp * 1000, period_end_timestamp * 1000)
+            stored = [list(row) for row in stored.itertuples(index=False, name=None)]
+            fetch_start_timestamp = max(period_start_timestamp, high_water_mark / 1000 + candle_seconds)
+
+    data = []
+    if fetch_start_timestamp <= period_end_timestamp:
+        since_list = plan_ohlcv_windows(fetch_start_timestamp, period_end_timestamp, max_data_points, candle_seconds)
+        with stage("paging", exchange=exchange.id):
+            data = await fetch_ohlcv_windows(exchange, pair, timeframe, since_list, max_data_points)
+        count("pages", len(since_list), exchange=exchange.id)
+        count("candles_downloaded", len(data), exchange=exchange.id)
+        if store is not None:
+            with stage("store_append", exchange=exchange.id):
+                store.append(exchange.id, pair, timeframe, closed_candles(data, timeframe))
+    count("candles_from_store", len(stored), exchange=exchange.id)
+    return stored + data
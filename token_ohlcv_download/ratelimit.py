@@ -0,0 +1,178 @@
+"""Rate limiting: one RateLimiter (token bucket) per exchange or API, and the request wrappers that go through it."""
+
+import asyncio
+import threading
+import time
+
+from . import settings
+from .lazy import LazyModule
+from .metrics import count, metrics_enabled, observe
+
+ccxt = LazyModule("ccxt", "ccxt", globals())
+
+_rate_limiters = {}  # exchange id (or e.g. coingecko) -> RateLimiter
+_rate_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket that spaces the requests sent to one exchange (or API).
+    It refills at rate tokens per second up to capacity tokens, and every request takes one token.
+    When the exchange throttles us (http 429/418, ccxt.DDoSProtection / RateLimitExceeded), the rate is halved and requests pause for throttle_cooldown seconds, doubled for every throttle in a row. Every successful request then gives back 5% of the configured rate until it is reached again.
+    requests, throttles and wait_time (seconds spent waiting for a token, summed over all requests) count what happened, see rate_limiter_stats.
+    clock, sleep (async) and sleep_sync can be replaced by a simulated clock, e.g. in tests; see rate_limiter_clock for the shared limiters of get_rate_limiter."""
+
+    def __init__(self, rate, capacity=1, min_rate=None, clock=time.monotonic, sleep=asyncio.sleep, sleep_sync=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate / 64 if min_rate is None else min_rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.sleep_sync = sleep_sync
+        self.tokens = capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.throttles_in_a_row = 0
+        self.requests = 0
+        self.throttles = 0
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """takes a token if there is one and returns 0, otherwise returns how many seconds to wait before trying again (and counts them in wait_time)"""
+        with self._lock:
+            now = self.clock()
+            if now < self.paused_until:
+                self.wait_time += self.paused_until - now
+                return self.paused_until - now
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1 - 1e-9:  # tolerate float rounding, or waiting the exact refill time could come up a hair short forever
+                self.tokens = max(0.0, self.tokens - 1)
+                self.requests += 1
+                return 0
+            self.wait_time += (1 - self.tokens) / self.rate
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """waits until a request may be sent"""
+        wait = self.reserve()
+        while wait > 0:
+            await self.sleep(wait)
+            wait = self.reserve()
+
+    def acquire_sync(self):
+        """same as acquire, for normal (synchronous) code"""
+        wait = self.reserve()
+        while wait > 0:
+            self.sleep_sync(wait)
+            wait = self.reserve()
+
+    def throttled(self, retry_after=None):
+        """to be called when the exchange rejected a request for going too fast. retry_after (seconds) overrides the cooldown"""
+        with self._lock:
+            self.throttles += 1
+            now = self.clock()
+            if now < self.paused_until:  # requests that were already in flight when we paused tell us nothing new
+                return
+            self.throttles_in_a_row += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after is None:
+                retry_after = settings.throttle_cooldown * 2 ** (self.throttles_in_a_row - 1)
+            self.paused_until = now + retry_after
+            self.tokens = 0
+            self.updated = self.paused_until  # start refilling, at the lower rate, once the pause is over
+
+    def succeeded(self):
+        """to be called after every request that was not throttled"""
+        with self._lock:
+            self.throttles_in_a_row = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "throttles": self.throttles,
+            "wait_time": self.wait_time,
+            "rate": self.rate,
+            "max_rate": self.max_rate,
+        }
+
+
+def get_rate_limiter(key, rate_limit=None):
+    """returns the shared RateLimiter for an exchange id (or another api, e.g. coingecko), creating it the first time
+    rate_limit is the minimum number of ms between requests, like ccxt's rateLimit. An exchange_dict entry can set requests_per_second and burst to override it
+    limiters created while rate_limiter_clock is set run on that clock instead of the real time"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            exchange_settings = settings.exchange_dict.get(key, {})
+            rate = exchange_settings.get("requests_per_second", 1000 / (rate_limit or 1000))
+            clock = {} if settings.rate_limiter_clock is None else dict(zip(("clock", "sleep", "sleep_sync"), settings.rate_limiter_clock))
+            limiter = RateLimiter(rate, capacity=exchange_settings.get("burst", max(1, int(rate))), **clock)
+            _rate_limiters[key] = limiter
+        return limiter
+
+
+def rate_limiter_stats():
+    """returns the counters (requests, throttles, wait_time, current and configured rate) of every RateLimiter, by exchange id"""
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    return {key: limiter.stats() for key, limiter in limiters.items()}
+
+
+def is_throttled(error):
+    """Supporting function. True if an exception means the exchange rejected the request for going too fast"""
+    return isinstance(error, (ccxt.DDoSProtection, ccxt.RateLimitExceeded)) or getattr(getattr(error, "response", None), "status_code", None) in (429, 418)
+
+
+def record_request(exchange_id, method, waited, began, outcome):
+    """Supporting function. Counts one request (outcome ok, throttled or error) with its latency and the time it waited for the RateLimiter"""
+    if not metrics_enabled():
+        return
+    now = time.perf_counter()
+    count("requests", exchange=exchange_id, method=getattr(method, "__name__", "request"), outcome=outcome)
+    count("rate_limit_wait_seconds", began - waited, exchange=exchange_id)
+    observe("request", now - began, exchange=exchange_id)
+
+
+async def rate_limited_async(exchange, method, *args, **kwargs):
+    """calls an async ccxt method (e.g. exchange.fetch_ohlcv) through the exchange's RateLimiter, retrying up to max_retries times when the exchange throttles"""
+    limiter = get_rate_limiter(exchange.id, getattr(exchange, "rateLimit", None))
+    for attempt in range(settings.max_retries + 1):
+        waited = time.perf_counter()
+        await limiter.acquire()
+        began = time.perf_counter()
+        try:
+            result = await method(*args, **kwargs)
+        except Exception as e:
+            if not is_throttled(e) or attempt == settings.max_retries:
+                record_request(exchange.id, method, waited, began, "error")
+                raise
+            record_request(exchange.id, method, waited, began, "throttled")
+            limiter.throttled()
+            continue
+        record_request(exchange.id, method, waited, began, "ok")
+        limiter.succeeded()
+        return result
+
+
+def rate_limited(exchange, method, *args, **kwargs):
+    """same as rate_limited_async for a synchronous ccxt method"""
+    limiter = get_rate_limiter(exchange.id, getattr(exchange, "rateLimit", None))
+    for attempt in range(settings.max_retries + 1):
+        waited = time.perf_counter()
+        limiter.acquire_sync()
+        began = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            if not is_throttled(e) or attempt == settings.max_retries:
+                record_request(exchange.id, method, waited, began, "error")
+                raise
+            record_request(exchange.id, method, waited, began, "throttled")
+            limiter.throttled()
+            continue
+        record_request(exchange.id, method, waited, began, "ok")
+        limiter.succeeded()
+        return result
@@ -0,0 +1,137 @@
+"""Gap repair: downloads only the candles missing from stored series (repair_gaps)."""
+
+import asyncio
+
+from . import settings
+from .lazy import LazyModule
+from .background import run_coroutine
+from .metrics import count, stage
+from .markets import get_exchange, load_markets_cached_async
+from .paging import closed_candles, fetch_ohlcv_windows
+from .store import missing_windows, to_milliseconds
+from .dex import cmc_get_async, cmc_headers, decode_dex_ohlcv, dex_candles, dex_time_start
+
+aiohttp = LazyModule("aiohttp", "aiohttp", globals())
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+def plan_gap_pages(missing, step, max_data_points):
+    """Supporting function. Returns the fewest page starts (since values in ms) that cover every missing timestamp (sorted, see CandleStore.missing) with pages of max_data_points candles.
+    Every page starts at the first missing candle the pages before it leave out, so a hole costs one page per max_data_points candles and holes close together share a page."""
+    since_list = []
+    position = 0
+    while position < len(missing):
+        since_list.append(int(missing[position]))
+        position = int(np.searchsorted(missing, missing[position] + step * max_data_points))
+    return since_list
+
+
+def confirmed_empty(still_missing, since_list, received, step, max_data_points):
+    """Supporting function. The still missing timestamps that the source really has no candle for: a later candle of the same page came back, so the page did not just end early"""
+    if len(still_missing) == 0 or len(received) == 0:
+        return still_missing[:0]
+    since_list = np.asarray(since_list, dtype=np.int64)
+    page_ends = since_list[np.searchsorted(since_list, still_missing, side="right") - 1] + step * max_data_points
+    received = np.sort(received)
+    after = np.searchsorted(received, still_missing, side="right")
+    next_received = received[np.minimum(after, len(received) - 1)]
+    return still_missing[(after < len(received)) & (next_received < page_ends)]
+
+
+async def repair_series(store, exchange_id, pair, timeframe, start=None, end=None, recheck=False, session=None, headers=None, base_url=None):
+    """Supporting function. Refetches the missing rows of one stored series between start and end with as few pages as possible (plan_gap_pages), all at once, and patches them into the store.
+    CEX series are fetched with ccxt, DEX series (exchange dex_<network slug>) from CoinMarketCap through session. Rows the source turns out to have no candle for are marked as checked (CandleStore.mark_checked).
+    Returns (missing rows, pages requested, rows filled, rows still missing)."""
+    missing = store.missing(exchange_id, pair, timeframe, start, end, recheck)
+    if len(missing) == 0:
+        return 0, 0, 0, 0
+    step = settings.candle_duration_to_seconds[timeframe] * 1000
+
+    with stage("gap_repair", exchange=exchange_id):
+        if exchange_id.startswith("dex_"):
+            max_data_points = settings.dex_ohlcv_count
+            since_list = plan_gap_pages(missing, step, max_data_points)
+            pages = await asyncio.gather(
+                *[
+                    cmc_get_async(
+                        session,
+                        "/v4/dex/pairs/ohlcv/historical",
+                        {
+                            "contract_address": pair,
+                            "network_slug": exchange_id[len("dex_") :],
+                            "time_period": "hourly",
+                            "interval": "1h",
+                            "count": max_data_points,
+                            "time_start": dex_time_start(since),
+                        },
+                        headers,
+                        base_url,
+                    )
+                    for since in since_list
+                ]
+            )
+            pages = [decode_dex_ohlcv(page) for page in pages]
+            candles = [candle for page in pages if len(page) > 0 for candle in dex_candles(page)]
+        else:
+            exchange = get_exchange(exchange_id, asynchronous=True)
+            await load_markets_cached_async(exchange)
+            max_data_points = settings.exchange_dict.get(exchange_id, {}).get("max_data_points", settings.default_max_data_points)
+            since_list = plan_gap_pages(missing, step, max_data_points)
+            candles = await fetch_ohlcv_windows(exchange, pair, timeframe, since_list, max_data_points)
+        candles = closed_candles(candles, timeframe)
+        filled = store.patch(exchange_id, pair, timeframe, candles)
+
+    still_missing = store.missing(exchange_id, pair, timeframe, missing[0], missing[-1], recheck=True)
+    still_missing = still_missing[np.isin(still_missing, missing)]
+    received = np.array([candle[0] for candle in candles], dtype=np.int64)
+    store.mark_checked(
+        exchange_id, pair, timeframe, missing_windows(confirmed_empty(still_missing, since_list, received, step, max_data_points), step)
+    )
+    count("gap_pages", len(since_list), exchange=exchange_id)
+    count("gap_rows_filled", filled, exchange=exchange_id)
+    return len(missing), len(since_list), filled, len(still_missing)
+
+
+async def repair_gaps_async(store, exchanges=None, pairs=None, timeframe=None, start=None, end=None, recheck=False, max_concurrent_series=8, base_url=None, api_key=None):
+    """Supporting function. Runs repair_series for every matching series of the store, at most max_concurrent_series at a time.
+    Returns the series (see CandleStore.matching_series) and a result tuple or the exception for each of them, in order."""
+    series = store.matching_series(exchanges, pairs, timeframe)
+    start = to_milliseconds(start)
+    end = to_milliseconds(end)
+    headers = cmc_headers(api_key)
+    semaphore = asyncio.Semaphore(max_concurrent_series)
+    session = aiohttp.ClientSession() if any(exchange_id.startswith("dex_") for exchange_id, _, _ in series) else None
+
+    async def run(exchange_id, pair, series_timeframe):
+        async with semaphore:
+            return await repair_series(store, exchange_id, pair, series_timeframe, start, end, recheck, session, headers, base_url)
+
+    try:
+        return series, await asyncio.gather(*[run(*entry) for entry in series], return_exceptions=True)
+    finally:
+        if session is not None:
+            await session.close()
+
+
+def repair_gaps(store, exchanges=None, pairs=None, timeframe=None, start=None, end=None, recheck=False, max_concurrent_series=8, base_url=None, api_key=None):
+    """finds the missing candles (NaN rows) of every stored series of a CandleStore and downloads only those again, patching them in place
+    series are picked like in CandleStore.gap_report (exchanges, pairs, timeframe, None means any) and only rows between start and end count (timestamps in ms or strings like '2024-12-17 00:00:00+00:00', by default the whole stored range)
+    the missing rows are covered with the fewest pages possible, so a year of hourly candles with a few holes costs about one request per hole instead of a full backfill. Every series repairs at the same time (at most max_concurrent_series), each through its exchange's RateLimiter
+    CEX series are fetched with ccxt, DEX pools (exchange dex_<network slug>) from CoinMarketCap, with base_url and api_key like in backfill_dex_pools
+    candles the source does not have (an outage, hours without trades) stay missing and are remembered, so the next run does not ask for them again unless recheck is True
+    returns a DataFrame with one row per series: missing rows, requests, rows filled, rows still missing and error"""
+    series, results = run_coroutine(
+        repair_gaps_async(store, exchanges, pairs, timeframe, start, end, recheck, max_concurrent_series, base_url, api_key)
+    )
+
+    rows = []
+    for (exchange_id, pair, series_timeframe), result in zip(series, results):
+        row = {"exchange": exchange_id, "pair": pair, "timeframe": series_timeframe, "missing": 0, "requests": 0, "filled": 0, "still_missing": 0, "error": None}
+        if isinstance(result, Exception):
+            print(f"failed to repair {exchange_id} {pair} {series_timeframe} - {result!r}")
+            row["error"] = repr(result)
+        else:
+            row["missing"], row["requests"], row["filled"], row["still_missing"] = result
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["exchange", "pair", "timeframe", "missing", "requests", "filled", "still_missing", "error"])
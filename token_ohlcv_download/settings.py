@@ -0,0 +1,130 @@
+"""Settings of the package: exchanges, page sizes, caches, retries and the CoinMarketCap API.
+Assign them on the package (e.g. token_ohlcv_download.market_cache_dir = ...), every submodule reads them from here at call time."""
+
+import os
+
+candle_duration_to_seconds = {
+    "1s": 1,
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "30m": 1800,
+    "1h": 3600,
+    "1d": 3600 * 24,
+    "1w": 3600 * 24 * 7,
+    "1M": 3600 * 24 * 30,
+    "30d": 3600 * 24 * 30,
+}
+
+exchange_dict = {
+    "binance": {
+        "name": "Binance",
+        "max_data_points": 500,
+        "intervals": {
+            "1s": 1,
+            "1m": 60,
+            "5m": 300,
+            "15m": 900,
+            "30m": 1800,
+            "1h": 3600,
+            "1d": 3600 * 24,
+            "1w": 3600 * 24 * 7,
+            "1M": 3600 * 24 * 30,
+        },
+    },
+    "upbit": {
+        "name": "Upbit",
+        "max_data_points": 200,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24},
+    },
+    "bithumb": {
+        "name": "Bithumb",
+        "max_data_points": 500,
+        "intervals": {"30m": 1800, "1h": 3600},
+    },
+    "coinbase": {
+        "name": "Coinbase",
+        "max_data_points": 100,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "1d": 3600 * 24},
+    },
+    "huobi": {
+        "name": "Huobi",
+        "max_data_points": 100,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24, "1w": 3600 * 24 * 7, "1M": 3600 * 24 * 30},
+    },
+    "okx": {
+        "name": "OKX",
+        "max_data_points": 100,
+        "intervals": {
+            "1s": 1,
+            "1m": 60,
+            "5m": 300,
+            "15m": 900,
+            "30m": 1800,
+            "1h": 3600,
+            "1d": 3600 * 24,
+            "1w": 3600 * 24 * 7,
+            "1M": 3600 * 24 * 30,
+        },
+    },
+    "gate": {
+        "name": "Gate.io",
+        "max_data_points": 500,
+        "intervals": {"5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24, "1w": 3600 * 24 * 7, "30d": 3600 * 24 * 30},
+    },
+    "bybit": {
+        "name": "Bybit",
+        "max_data_points": 150,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24, "1w": 3600 * 24 * 7, "1M": 3600 * 24 * 30},
+    },
+    "kucoin": {
+        "name": "Kucoin",
+        "max_data_points": 1000,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24, "1w": 3600 * 24 * 7, "1M": 3600 * 24 * 30},
+    },
+    "mexc": {
+        "name": "MEXC",
+        "max_data_points": 100,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24, "1M": 3600 * 24 * 30},
+    },
+    "bitget": {
+        "name": "Bitget",
+        "max_data_points": 200,
+        "intervals": {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 3600 * 24, "1w": 3600 * 24 * 7, "1M": 3600 * 24 * 30},
+    },
+}
+
+tickers_batch_size = 100  # symbols per fetch_tickers request of SymbolIndex.volumes
+exchange_flavours = {"sync": "ccxt", "async": "ccxt.async_support", "pro": "ccxt.pro"}  # ccxt module of each kind of exchange class
+exchange_aliases = {"huobi": "htx", "gateio": "gate", "coinbaseprime": "coinbase", "okex": "okx"}  # old ids -> the names newer ccxt versions use
+max_concurrent_requests = 32  # upper bound on pages in flight per exchange, whatever its rateLimit allows
+default_max_data_points = 100  # page size used for exchanges that are not in exchange_dict
+cex_ohlcv_columns = ["timestamp", "open", "high", "low", "close", "volume"]
+output_aggregations = {  # how every numeric column of the ohlcv_data_download output is resampled, in output order
+    "average_price": "mean",
+    "open": "first",
+    "close": "last",
+    "high": "max",
+    "low": "min",
+    "volume_base": "sum",
+    "quote_currency_price_usdt": "mean",
+    "average_price_usdt": "mean",
+    "open_usdt": "first",
+    "close_usdt": "last",
+    "high_usdt": "max",
+    "low_usdt": "min",
+    "volume_usdt": "sum",
+}
+
+market_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "token_ohlcv_download", "markets")
+market_cache_ttl = 24 * 3600  # seconds before cached market metadata is downloaded again
+market_cache_size = 64  # number of exchanges whose market metadata is kept in memory
+exchange_cache_size = 128  # number of exchange instances kept alive for reuse, enough for every ccxt exchange
+
+max_retries = 5  # times a throttled request is retried before giving up
+throttle_cooldown = 1.0  # seconds to pause an exchange after it throttles us, doubled for every throttle in a row
+rate_limiter_clock = None  # (clock, async sleep, sleep) for the RateLimiters get_rate_limiter creates, e.g. a simulated clock in tests; None is the real time
+
+cmc_api_url = "https://pro-api.coinmarketcap.com"  # can point at a local stand-in serving the same responses
+cmc_rate_limit = 2000  # ms between CoinMarketCap requests, the basic plan allows 30 a minute
+dex_ohlcv_count = 500  # candles per CoinMarketCap DEX OHLCV page
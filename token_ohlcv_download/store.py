@@ -0,0 +1,302 @@
+"""CandleStore, the append-only on-disk store of raw candles."""
+
+import json
+import os
+import threading
+
+from . import settings
+from .lazy import LazyModule
+from .arrays import resample_columns
+from .dex import dex_candles
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+def to_milliseconds(timestamp):
+    """Supporting function. Turns '2024-12-17 00:00:00+00:00' style strings (UTC if no timezone is given) into timestamps in ms, and leaves numbers and None alone"""
+    if not isinstance(timestamp, str):
+        return timestamp
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return int(timestamp.timestamp() * 1000)
+
+
+def missing_windows(timestamps, step):
+    """Supporting function. Groups sorted timestamps into (first, last) windows of consecutive candles, step ms apart"""
+    if len(timestamps) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(timestamps) != step)
+    firsts = np.concatenate([timestamps[:1], timestamps[breaks + 1]])
+    lasts = np.concatenate([timestamps[breaks], timestamps[-1:]])
+    return [(int(first), int(last)) for first, last in zip(firsts, lasts)]
+
+
+class CandleStore:
+    """Append-only on-disk store for raw candles, with one series per exchange / pair / timeframe.
+    Each series is a folder with one float64 file per column (open, high, low, close, volume) that can be memory-mapped, plus a meta.json.
+    Row i holds the candle that opens at origin + i * step, so timestamps are implicit and candles that were never received are NaN rows.
+    Only candles after a series' high-water mark (its last stored timestamp) are appended, so a refresh costs as much as the new rows instead of the whole history. Holes (NaN rows) can be filled in place later with patch, see repair_gaps.
+    Timestamps are in ms like in ccxt. Timeframes must have a fixed length, see candle_duration_to_seconds."""
+
+    columns = ["open", "high", "low", "close", "volume"]
+
+    def __init__(self, root="candle_store"):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def series_path(self, exchange_id, pair, timeframe):
+        return os.path.join(self.root, exchange_id, pair.replace("/", "_").replace(":", "-"), timeframe)
+
+    def read_meta(self, exchange_id, pair, timeframe):
+        """returns the meta.json content of a series, or None if the series does not exist yet"""
+        try:
+            with open(os.path.join(self.series_path(exchange_id, pair, timeframe), "meta.json")) as f:
+                return json.load(f)
+        except OSError:
+            return None
+
+    def write_meta(self, path, meta):
+        temp_path = os.path.join(path, "meta.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, os.path.join(path, "meta.json"))
+
+    def series(self):
+        """lists every stored series as (exchange_id, pair, timeframe)"""
+        found = []
+        for folder, _, files in os.walk(self.root):
+            if "meta.json" in files:
+                with open(os.path.join(folder, "meta.json")) as f:
+                    meta = json.load(f)
+                found.append((meta["exchange"], meta["pair"], meta["timeframe"]))
+        return sorted(found)
+
+    def time_range(self, exchange_id, pair, timeframe):
+        """returns (first, last) stored timestamp of a series - the last one is the high-water mark - or (None, None) if it is empty"""
+        meta = self.read_meta(exchange_id, pair, timeframe)
+        if meta is None or meta["rows"] == 0:
+            return None, None
+        return meta["origin"], meta["origin"] + (meta["rows"] - 1) * meta["step"]
+
+    def high_water_mark(self, exchange_id, pair, timeframe):
+        """returns the timestamp of the last stored candle of a series, or None if it is empty"""
+        return self.time_range(exchange_id, pair, timeframe)[1]
+
+    def append(self, exchange_id, pair, timeframe, candles):
+        """writes the candles that are newer than the high-water mark and returns how many were written
+        candles is a list of [timestamp, open, high, low, close, volume] like ccxt returns them, or a DataFrame with the cex_ohlcv columns. Older candles are ignored"""
+        if isinstance(candles, pd.DataFrame):
+            candles = candles[settings.cex_ohlcv_columns].to_numpy(dtype=np.float64)
+        candles = np.asarray(candles, dtype=np.float64).reshape(-1, len(settings.cex_ohlcv_columns))
+        if len(candles) == 0:
+            return 0
+
+        timestamps = candles[:, 0].astype(np.int64)
+        path = self.series_path(exchange_id, pair, timeframe)
+        with self._lock:
+            meta = self.read_meta(exchange_id, pair, timeframe)
+            if meta is None:
+                meta = {
+                    "exchange": exchange_id,
+                    "pair": pair,
+                    "timeframe": timeframe,
+                    "origin": int(timestamps.min()),
+                    "step": settings.candle_duration_to_seconds[timeframe] * 1000,
+                    "rows": 0,
+                }
+
+            offsets = timestamps - meta["origin"]
+            if np.any(offsets % meta["step"]):
+                raise Exception(f"candles are not aligned to the {timeframe} grid of {exchange_id} {pair}")
+            index = offsets // meta["step"]
+            new = index >= meta["rows"]
+            if not new.any():
+                return 0
+
+            index, first = np.unique(index[new] - meta["rows"], return_index=True)  # the first candle of a row wins, like in candles_frame
+            block = np.full((int(index.max()) + 1, len(self.columns)), np.nan)
+            block[index] = candles[new][first, 1:]
+
+            os.makedirs(path, exist_ok=True)
+            for position, column in enumerate(self.columns):
+                with open(os.path.join(path, f"{column}.f8"), "ab") as f:
+                    f.truncate(meta["rows"] * 8)  # drop anything a crashed write left after the last committed row
+                    f.write(np.ascontiguousarray(block[:, position], dtype="<f8").tobytes())
+
+            meta["rows"] += len(block)
+            self.write_meta(path, meta)  # the new rows only count once meta.json says so
+        return len(index)
+
+    def view(self, exchange_id, pair, timeframe, start=None, end=None):
+        """returns the stored rows between start and end (timestamps in ms, both included) without copying anything: (timestamps, dict of read-only memory-mapped column slices)
+        rows of candles that were never received are NaN. Only the pages of the slice are read from disk, so the cost depends on the length of the slice, not of the history"""
+        meta = self.read_meta(exchange_id, pair, timeframe)
+        if meta is None or meta["rows"] == 0:
+            return np.empty(0, dtype=np.int64), {column: np.empty(0) for column in self.columns}
+
+        origin, step, rows = meta["origin"], meta["step"], meta["rows"]
+        first = 0 if start is None else min(rows, max(0, -(-(int(start) - origin) // step)))
+        last = rows if end is None else min(rows, max(0, (int(end) - origin) // step + 1))
+        last = max(first, last)
+
+        path = self.series_path(exchange_id, pair, timeframe)
+        columns = {
+            column: np.memmap(os.path.join(path, f"{column}.f8"), dtype="<f8", mode="r", shape=(rows,))[first:last]
+            for column in self.columns
+        }
+        return origin + step * np.arange(first, last, dtype=np.int64), columns
+
+    def read(self, exchange_id, pair, timeframe, start=None, end=None):
+        """returns the stored candles between start and end (timestamps in ms, both included) as a DataFrame with the cex_ohlcv columns"""
+        timestamps, columns = self.view(exchange_id, pair, timeframe, start, end)
+        candles = pd.DataFrame({"timestamp": timestamps, **columns})
+        return candles[candles["close"].notna()].reset_index(drop=True)
+
+    def query(self, exchanges=None, pairs=None, timeframe="1h", start=None, end=None, output_seconds=None):
+        """returns the candles of every stored series of timeframe whose exchange is in exchanges and pair in pairs (None means any), between start and end, as one long DataFrame: exchange, pair and the cex_ohlcv columns
+        start and end are timestamps in ms or strings like '2024-12-17 00:00:00+00:00' (UTC if no timezone is given), both included
+        with output_seconds the candles are resampled on the fly into candles of that many seconds, counted from midnight UTC (open first, high max, low min, close last, volume sum)
+        every series is read through view, so a week of candles costs the same however long the stored history is. DEX pools are stored as exchange dex_<network slug>, pair <pool contract address>, see backfill_dex_pools"""
+        start = to_milliseconds(start)
+        end = to_milliseconds(end)
+        frames = []
+        for exchange_id, pair, series_timeframe in self.series():
+            if series_timeframe != timeframe:
+                continue
+            if exchanges is not None and exchange_id not in exchanges:
+                continue
+            if pairs is not None and pair not in pairs:
+                continue
+            timestamps, columns = self.view(exchange_id, pair, timeframe, start, end)
+            if output_seconds is not None:
+                if output_seconds % settings.candle_duration_to_seconds[timeframe]:
+                    raise Exception(f"output_seconds should be a multiple of {timeframe}, not {output_seconds}")
+                timestamps, columns = resample_columns(
+                    timestamps,
+                    columns,
+                    {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"},
+                    output_seconds * 1000,
+                    0,
+                )
+            candles = pd.DataFrame({"exchange": exchange_id, "pair": pair, "timestamp": timestamps, **columns})
+            frames.append(candles[candles["close"].notna()])
+
+        if len(frames) == 0:
+            return pd.DataFrame(columns=["exchange", "pair"] + settings.cex_ohlcv_columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def patch(self, exchange_id, pair, timeframe, candles):
+        """fills rows of a series that are still missing (NaN) with candles, in place, and appends the candles after the high-water mark; rows that are already stored are never overwritten
+        candles are given like in append. Returns how many rows were filled or added. Candles before the first stored one are ignored, the origin of a series does not move"""
+        if isinstance(candles, pd.DataFrame):
+            candles = candles[settings.cex_ohlcv_columns].to_numpy(dtype=np.float64)
+        candles = np.asarray(candles, dtype=np.float64).reshape(-1, len(settings.cex_ohlcv_columns))
+        if len(candles) == 0:
+            return 0
+        meta = self.read_meta(exchange_id, pair, timeframe)
+        if meta is None or meta["rows"] == 0:
+            return self.append(exchange_id, pair, timeframe, candles)
+
+        filled = 0
+        with self._lock:
+            meta = self.read_meta(exchange_id, pair, timeframe)
+            offsets = candles[:, 0].astype(np.int64) - meta["origin"]
+            if np.any(offsets % meta["step"]):
+                raise Exception(f"candles are not aligned to the {timeframe} grid of {exchange_id} {pair}")
+            index = offsets // meta["step"]
+            inside = (index >= 0) & (index < meta["rows"]) & ~np.isnan(candles[:, 4])
+            if inside.any():
+                path = self.series_path(exchange_id, pair, timeframe)
+                stored = {
+                    column: np.memmap(os.path.join(path, f"{column}.f8"), dtype="<f8", mode="r+", shape=(meta["rows"],))
+                    for column in self.columns
+                }
+                rows, first = np.unique(index[inside], return_index=True)  # the first candle of a row wins, like in candles_frame
+                values = candles[inside][first]
+                empty = np.isnan(stored["close"][rows])
+                rows, values = rows[empty], values[empty]
+                for column in [column for column in self.columns if column != "close"] + ["close"]:  # a row counts as stored once its close is there, so it goes last
+                    stored[column][rows] = values[:, self.columns.index(column) + 1]
+                for column in self.columns:
+                    stored[column].flush()
+                filled = len(rows)
+        later = candles[(candles[:, 0] - meta["origin"]) // meta["step"] >= meta["rows"]]
+        return filled + self.append(exchange_id, pair, timeframe, later)
+
+    def missing(self, exchange_id, pair, timeframe, start=None, end=None, recheck=False):
+        """returns the timestamps of the missing (NaN) rows of a series between start and end (timestamps in ms, both included, by default its whole stored range)
+        only the stored range counts: candles after the high-water mark are the next refresh, not a gap. Rows in windows a repair already found empty at the source (see mark_checked) are left out unless recheck is True"""
+        timestamps, columns = self.view(exchange_id, pair, timeframe, start, end)
+        missing = np.isnan(columns["close"])
+        if not recheck:
+            meta = self.read_meta(exchange_id, pair, timeframe)
+            for first, last in meta.get("checked", []) if meta is not None else []:
+                missing[np.searchsorted(timestamps, first) : np.searchsorted(timestamps, last, side="right")] = False
+        return timestamps[missing]
+
+    def gaps(self, exchange_id, pair, timeframe, start=None, end=None, recheck=False):
+        """returns the missing stretches of a series as a list of (first, last) timestamps of consecutive missing rows, see missing"""
+        missing = self.missing(exchange_id, pair, timeframe, start, end, recheck)
+        return missing_windows(missing, settings.candle_duration_to_seconds[timeframe] * 1000)
+
+    def mark_checked(self, exchange_id, pair, timeframe, windows):
+        """remembers (first, last) windows of a series that the source has no candles for (an exchange outage, hours without trades), so missing and gaps skip them and repair_gaps does not ask again"""
+        if len(windows) == 0:
+            return
+        with self._lock:
+            meta = self.read_meta(exchange_id, pair, timeframe)
+            checked = sorted([list(window) for window in meta.get("checked", [])] + [[int(first), int(last)] for first, last in windows])
+            merged = [checked[0]]
+            for first, last in checked[1:]:
+                if first <= merged[-1][1] + meta["step"]:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+            meta["checked"] = merged
+            self.write_meta(self.series_path(exchange_id, pair, timeframe), meta)
+
+    def matching_series(self, exchanges=None, pairs=None, timeframe=None):
+        """lists the stored series whose exchange is in exchanges, pair in pairs and timeframe is timeframe (None means any) as (exchange_id, pair, timeframe)"""
+        return [
+            (exchange_id, pair, series_timeframe)
+            for exchange_id, pair, series_timeframe in self.series()
+            if (exchanges is None or exchange_id in exchanges)
+            and (pairs is None or pair in pairs)
+            and (timeframe is None or series_timeframe == timeframe)
+        ]
+
+    def gap_report(self, exchanges=None, pairs=None, timeframe=None, start=None, end=None, recheck=False):
+        """returns a DataFrame with one row per stored series (filtered like query, any timeframe by default): exchange, pair, timeframe, first and last stored timestamp, rows, missing rows, number of gaps and the longest one (in rows)"""
+        start = to_milliseconds(start)
+        end = to_milliseconds(end)
+        rows = []
+        for exchange_id, pair, series_timeframe in self.matching_series(exchanges, pairs, timeframe):
+            first, last = self.time_range(exchange_id, pair, series_timeframe)
+            gaps = self.gaps(exchange_id, pair, series_timeframe, start, end, recheck)
+            step = settings.candle_duration_to_seconds[series_timeframe] * 1000
+            lengths = [(gap_last - gap_first) // step + 1 for gap_first, gap_last in gaps]
+            rows.append(
+                {
+                    "exchange": exchange_id,
+                    "pair": pair,
+                    "timeframe": series_timeframe,
+                    "first": first,
+                    "last": last,
+                    "rows": 0 if first is None else (last - first) // step + 1,
+                    "missing": sum(lengths),
+                    "gaps": len(gaps),
+                    "longest_gap": max(lengths, default=0),
+                }
+            )
+        return pd.DataFrame(rows, columns=["exchange", "pair", "timeframe", "first", "last", "rows", "missing", "gaps", "longest_gap"])
+
+    def import_csv(self, exchange_id, pair, timeframe, file_path):
+        """adds the candles of a CSV file with the cex_ohlcv columns (e.g. the files in cex_ohlcv) to the store, returns how many were written"""
+        candles = pd.read_csv(file_path).sort_values("timestamp")
+        return self.append(exchange_id, pair, timeframe, candles)
+
+    def import_dex_csv(self, network_slug, contract_address, file_path):
+        """adds the candles of a DEX pool CSV (see backfill_dex_pools) to the store as exchange dex_<network slug>, pair <pool contract address>, timeframe 1h, returns how many were written"""
+        return self.append(f"dex_{network_slug}", contract_address, "1h", dex_candles(pd.read_csv(file_path)))
@@ -0,0 +1,204 @@
+"""Finding the markets of a token on every exchange: SymbolIndex and ticker_finder."""
+
+import asyncio
+import re
+
+from . import settings
+from .lazy import LazyModule
+from .background import run_coroutine
+from .metrics import stage
+from .ratelimit import rate_limited_async
+from .markets import get_exchange, load_markets_cached_async
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+def match_finder(search_key, search_dictionary):
+    """Supporting function. Finds closest match in a dictionary to a given key. For whole columns use asof_join, which is much faster"""
+    try:
+        return search_dictionary[search_key]
+    except:
+        return search_dictionary[
+            min(list(search_dictionary.keys()), key=lambda x: abs(x - search_key))
+        ]
+
+
+multiplier_prefix = re.compile(r"^(1000000|10000|1000|1M)([A-Z][A-Z0-9]+)$")  # 1000PEPE, 10000SATS, 1000000MOG, 1MBABYDOGE - the prefixes exchanges use
+
+
+def base_multiplier(base):
+    """Supporting function. Splits a listed base currency into (underlying asset, multiplier): 1000PEPE -> (PEPE, 1000), 1MBABYDOGE -> (BABYDOGE, 1000000), BTC -> (BTC, 1)
+    only the prefixes exchanges use for multiplied contracts (1000, 10000, 1000000 and 1M) count, so tickers that merely start with digits like 1INCH or 10SET stay as they are"""
+    match = multiplier_prefix.match(base)
+    if match is None:
+        return base, 1
+    prefix, asset = match.groups()
+    return asset, 1000000 if prefix == "1M" else int(prefix)
+
+
+class SymbolIndex:
+    """Cross-exchange index of market symbols, built from (cached) market metadata.
+    Every market is filed under its underlying asset, so a lookup for PEPE finds PEPE/USDT as well as 1000PEPE/USDT:USDT (multiplier 1000), and a lookup for T only finds markets whose base really is T.
+    Lookups are dict hits and do not touch the network. volumes fetches 24h volumes of the matches with one fetch_tickers request per exchange, market type and batch of tickers_batch_size symbols."""
+
+    fields = ["exchange", "symbol", "base", "listed_base", "quote", "type", "settle", "multiplier", "contract_size", "active"]
+
+    def __init__(self):
+        self.markets = {}  # underlying asset -> list of market entries (dicts)
+        self.exchanges = []
+
+    def add_markets(self, exchange_id, markets):
+        """adds the markets dict of one exchange (exchange.markets, or markets from read_market_cache) to the index"""
+        for symbol, market in markets.items():
+            listed_base = market.get("base") or symbol.split("/")[0]
+            asset, multiplier = base_multiplier(listed_base.upper())
+            entry = {
+                "exchange": exchange_id,
+                "symbol": symbol,
+                "base": asset,
+                "listed_base": listed_base,
+                "quote": market.get("quote"),
+                "type": market.get("type") or "spot",
+                "settle": market.get("settle"),
+                "multiplier": multiplier,
+                "contract_size": market.get("contractSize"),
+                "active": market.get("active") is not False,
+            }
+            self.markets.setdefault(asset, []).append(entry)
+            if multiplier != 1:  # the listed name is also an asset of its own, e.g. binance spot 1000SATS
+                self.markets.setdefault(listed_base.upper(), []).append(entry)
+        if exchange_id not in self.exchanges:
+            self.exchanges.append(exchange_id)
+
+    @classmethod
+    def build(cls, exchanges=None):
+        """builds the index from the markets of exchanges (every exchange in exchange_dict by default), loaded concurrently through the market cache
+        exchanges whose markets cannot be loaded are reported and left out"""
+        if exchanges is None:
+            exchanges = list(settings.exchange_dict)
+
+        async def load_all():
+            async def load(exchange_id):
+                return await load_markets_cached_async(get_exchange(exchange_id, asynchronous=True))
+
+            return await asyncio.gather(*[load(exchange_id) for exchange_id in exchanges], return_exceptions=True)
+
+        index = cls()
+        with stage("symbol_index_markets"):
+            results = run_coroutine(load_all())
+        for exchange_id, markets in zip(exchanges, results):
+            if isinstance(markets, Exception):
+                print("could not load markets of", exchange_id, "-", repr(markets))
+                continue
+            index.add_markets(exchange_id, markets)
+        return index
+
+    def lookup(self, base, quote=None, market_type=None, exchanges=None, multiplier=None, active_only=True):
+        """returns the market entries of base (the token symbol, e.g. PEPE, not the name), optionally only those with the given quote, market type (spot, swap, future, option), exchanges and multiplier
+        base 1000PEPE only finds markets listed as 1000PEPE, base PEPE finds every PEPE market with its multiplier"""
+        entries = self.markets.get(base.upper(), [])
+        if quote is None and market_type is None and exchanges is None and multiplier is None and not active_only:
+            return list(entries)
+        if exchanges is not None:
+            exchanges = set(exchanges)
+        return [
+            entry
+            for entry in entries
+            if (quote is None or entry["quote"] == quote)
+            and (market_type is None or entry["type"] == market_type)
+            and (exchanges is None or entry["exchange"] in exchanges)
+            and (multiplier is None or entry["multiplier"] == multiplier)
+            and (not active_only or entry["active"])
+        ]
+
+    def symbols(self, base, quote=None, market_type=None, exchanges=None):
+        """returns {exchange id: [symbols]} for the matches of lookup"""
+        by_exchange = {}
+        for entry in self.lookup(base, quote, market_type, exchanges):
+            by_exchange.setdefault(entry["exchange"], []).append(entry["symbol"])
+        return by_exchange
+
+    def volumes(self, base, quote=None, market_type=None, exchanges=None):
+        """returns a DataFrame with one row per matching market: the lookup fields plus last price and 24h base and quote volume from the exchange's tickers
+        markets whose ticker could not be fetched have NaN volumes and the reason in the error column"""
+        entries = self.lookup(base, quote, market_type, exchanges)
+        with stage("fetch_tickers"):
+            tickers = run_coroutine(fetch_tickers_batched(entries))
+        rows = []
+        for entry in entries:
+            ticker = tickers.get((entry["exchange"], entry["symbol"]))
+            row = dict(entry)
+            if isinstance(ticker, dict):
+                row.update(last=ticker.get("last"), base_volume=ticker.get("baseVolume"), quote_volume=ticker.get("quoteVolume"), error=None)
+            else:
+                row.update(last=np.nan, base_volume=np.nan, quote_volume=np.nan, error=ticker)
+            rows.append(row)
+        columns = list(SymbolIndex.fields) + ["last", "base_volume", "quote_volume", "error"]
+        volumes = pd.DataFrame(rows, columns=columns)
+        for column in ["last", "base_volume", "quote_volume"]:
+            volumes[column] = volumes[column].astype(float)
+        return volumes
+
+
+async def fetch_tickers_batched(entries):
+    """Supporting function. Fetches the tickers of market entries (see SymbolIndex.lookup), all exchanges at once, with one fetch_tickers request per exchange, market type and batch of symbols
+    exchanges without fetchTickers, and batches that fail, fall back to fetch_ticker per symbol
+    returns {(exchange id, symbol): ticker dict, or the error as a string}"""
+    batches = {}
+    for entry in entries:
+        batches.setdefault((entry["exchange"], entry["type"]), []).append(entry["symbol"])
+
+    tickers = {}
+
+    async def fetch_one(exchange, symbol):
+        try:
+            tickers[(exchange.id, symbol)] = await rate_limited_async(exchange, exchange.fetch_ticker, symbol)
+        except Exception as e:
+            tickers[(exchange.id, symbol)] = repr(e)
+
+    async def fetch_batch(exchange_id, symbols):
+        exchange = get_exchange(exchange_id, asynchronous=True)
+        try:
+            await load_markets_cached_async(exchange)
+        except Exception as e:
+            for symbol in symbols:
+                tickers[(exchange_id, symbol)] = repr(e)
+            return
+        if exchange.has.get("fetchTickers"):
+            try:
+                batch = await rate_limited_async(exchange, exchange.fetch_tickers, symbols)
+                for symbol in symbols:
+                    if symbol in batch:
+                        tickers[(exchange_id, symbol)] = batch[symbol]
+                symbols = [symbol for symbol in symbols if symbol not in batch]
+            except Exception as e:
+                print("fetch_tickers failed on", exchange_id, "-", repr(e), "- fetching the tickers one by one")
+        await asyncio.gather(*[fetch_one(exchange, symbol) for symbol in symbols])
+
+    await asyncio.gather(
+        *[
+            fetch_batch(exchange_id, symbols[i : i + settings.tickers_batch_size])
+            for (exchange_id, _), symbols in batches.items()
+            for i in range(0, len(symbols), settings.tickers_batch_size)
+        ]
+    )
+    return tickers
+
+
+def ticker_finder(exchange, base_token, quote=None, market_type=None):
+    """finds all the pairs that have base_token as the base currency - use token symbol e.g. BTC, not the name e.g. Bitcoin
+    pairs of contracts on a multiple of the token (e.g. 1000PEPE/USDT:USDT for PEPE) are found too, see the multiplier column
+    exchange is one exchange id (e.g. binance, upbit, bithumb, coinbase, huobi, okx, gate, bybit, kucoin, mexc, bitget) or a list of them
+    prints the matches with their volumes and returns them as a DataFrame (see SymbolIndex.volumes)"""
+
+    exchanges = [exchange] if isinstance(exchange, str) else list(exchange)
+    with stage("ticker_finder"):
+        pairs = SymbolIndex.build(exchanges).volumes(base_token, quote, market_type)
+
+    print('\nFollowing are the matching pairs we found on this exchange.\nPlease compare the listed base and quote volumes with the ones on the exchange website to verify the correct pair name to use in the ohlcv_data_download function.\nThis is especially relevant for differentiating between spot and futures.\n')
+
+    for pair in pairs.itertuples(index=False):
+        if pair.error is None:
+            print(pair.exchange, pair.symbol, f"({pair.type}, x{pair.multiplier})", '\n', 'Base volume:', pair.base_volume, '\n', 'Quote volume:', pair.quote_volume, '\n')
+    return pairs
@@ -0,0 +1,178 @@
+"""VolumeIndex, traded volume of every stored series, kept up to date incrementally."""
+
+import io
+import json
+import os
+
+from .lazy import LazyModule
+from .metrics import count, stage
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+
+class VolumeIndex:
+    """Volume-weighted price and USD volume index of one token across venues: exchange pairs (e.g. PENGU/USDT on bybit) and DEX pools, in buckets of bucket_seconds.
+    The price of a bucket is sum(close * volume_usd) / sum(volume_usd) over every candle of every venue in it, so a dust pool barely moves it. CEX volumes are in the base token and are turned into USD with the candle's close (the pair is assumed to be quoted in USD or USDT), DEX volumes from CoinMarketCap already are in USD.
+    Volume and close * volume are kept per bucket and venue in a dense grid, like the CandleStore: update only adds the candles after a venue's high-water mark, so new candles cost as much as themselves and history is never read again. save / load keep the state between runs.
+    bucket i covers [i * bucket_seconds, (i + 1) * bucket_seconds) since 1970, in UTC."""
+
+    def __init__(self, bucket_seconds=3600):
+        self.bucket_ms = bucket_seconds * 1000
+        self.first_bucket = None  # bucket number of row 0
+        self.rows = 0  # rows in use, the arrays can be longer
+        self.venues = []
+        self.volume = np.zeros((0, 0))  # [row, venue] USD volume
+        self.value = np.zeros((0, 0))  # [row, venue] sum of close * USD volume
+        self.high_water_marks = {}  # venue -> timestamp (ms) of the last candle added
+        self.file_offsets = {}  # venue -> bytes of its DEX CSV already read
+
+    def grow(self, first_bucket, last_bucket):
+        """Supporting function. Makes room for buckets first_bucket to last_bucket and for every venue, doubling the row capacity when it runs out"""
+        if self.first_bucket is None:
+            self.first_bucket = first_bucket
+        shift = max(0, self.first_bucket - first_bucket)  # older history than anything so far
+        rows = max(self.rows + shift, last_bucket - self.first_bucket + shift + 1)
+        capacity, venues = self.volume.shape
+        if shift == 0 and rows <= capacity and venues == len(self.venues):
+            self.rows = rows
+            return
+        new_capacity = max(rows, 2 * capacity if rows > capacity else capacity)
+        volume = np.zeros((new_capacity, len(self.venues)))
+        value = np.zeros((new_capacity, len(self.venues)))
+        volume[shift : shift + self.rows, :venues] = self.volume[: self.rows]
+        value[shift : shift + self.rows, :venues] = self.value[: self.rows]
+        self.volume, self.value = volume, value
+        self.first_bucket -= shift
+        self.rows = rows
+
+    def update(self, venue, timestamps, close, volume, volume_in_usd=False):
+        """adds the candles of one venue (arrays of timestamps in ms, close prices and volumes) and returns how many were added
+        candles at or before the venue's high-water mark were added before and are skipped, as are candles without a close or volume. volume_in_usd is True for DEX pools"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        close = np.asarray(close, dtype=np.float64)
+        volume = np.asarray(volume, dtype=np.float64)
+        high_water_mark = self.high_water_marks.get(venue)
+        new = ~(np.isnan(close) | np.isnan(volume))
+        if high_water_mark is not None:
+            new &= timestamps > high_water_mark
+        if not new.any():
+            return 0
+        timestamps, close, volume = timestamps[new], close[new], volume[new]
+        count("rows_in", len(timestamps), function="VolumeIndex.update")
+
+        if venue not in self.venues:
+            self.venues.append(venue)
+        column = self.venues.index(venue)
+        buckets = timestamps // self.bucket_ms
+        with stage("volume_index_update"):
+            self.grow(int(buckets.min()), int(buckets.max()))
+            volume_usd = volume if volume_in_usd else volume * close
+            rows = buckets - self.first_bucket
+            low = int(rows.min())
+            self.volume[low : int(rows.max()) + 1, column] += np.bincount(rows - low, weights=volume_usd)
+            self.value[low : int(rows.max()) + 1, column] += np.bincount(rows - low, weights=close * volume_usd)
+        self.high_water_marks[venue] = int(max(timestamps.max(), high_water_mark if high_water_mark is not None else timestamps.max()))
+        return len(timestamps)
+
+    def update_from_store(self, store, exchange_id, pair, timeframe="1h", venue=None):
+        """adds the candles of a CandleStore series newer than the venue's high-water mark. venue defaults to exchange_id, or to the pool contract address for DEX pools (exchange dex_<network slug>), whose volume is in USD"""
+        is_pool = exchange_id.startswith("dex_")
+        venue = (pair if is_pool else exchange_id) if venue is None else venue
+        high_water_mark = self.high_water_marks.get(venue)
+        with stage("volume_index_read", exchange=exchange_id):
+            timestamps, columns = store.view(exchange_id, pair, timeframe, None if high_water_mark is None else high_water_mark + 1)
+            close, volume = np.array(columns["close"]), np.array(columns["volume"])
+        return self.update(venue, timestamps, close, volume, volume_in_usd=is_pool)
+
+    def update_from_dex_csv(self, file_path, venue=None):
+        """adds the candles of a DEX pool CSV (see backfill_dex_pools) written since the last call, reading only the bytes after the previous end of the file. venue defaults to the pool contract address"""
+        venue = os.path.splitext(os.path.basename(file_path))[0] if venue is None else venue
+        offset = self.file_offsets.get(venue, 0)
+        with stage("volume_index_read", exchange="dex_csv"):
+            with open(file_path, "rb") as f:
+                header = f.readline()
+                f.seek(max(offset, len(header)))
+                body = f.read()
+            if len(body) == 0:
+                return 0
+            candles = pd.read_csv(io.BytesIO(header + body), usecols=["time_open", "close", "volume"])
+            self.file_offsets[venue] = max(offset, len(header)) + len(body)
+            timestamps = pd.to_datetime(candles["time_open"], utc=True).values.astype("datetime64[ms]").astype(np.int64)
+        return self.update(venue, timestamps, candles["close"].values, candles["volume"].values, volume_in_usd=True)
+
+    def bucket_range(self, start=None, end=None):
+        """Supporting function. Rows of the buckets between start and end (timestamps in ms, both included)"""
+        first = 0 if start is None else min(self.rows, max(0, -(-int(start) // self.bucket_ms) - self.first_bucket))
+        last = self.rows if end is None else min(self.rows, max(0, int(end) // self.bucket_ms - self.first_bucket + 1))
+        return first, max(first, last)
+
+    def timestamps(self, first, last):
+        return pd.to_datetime((self.first_bucket + np.arange(first, last, dtype=np.int64)) * self.bucket_ms, unit="ms")
+
+    def index(self, start=None, end=None):
+        """returns timestamp, price (volume-weighted), volume_usd and venues (number of venues that traded) for every bucket between start and end (ms). Buckets without volume have a NaN price"""
+        if self.first_bucket is None:
+            return pd.DataFrame(columns=["timestamp", "price", "volume_usd", "venues"])
+        first, last = self.bucket_range(start, end)
+        with stage("volume_index"):
+            volume = self.volume[first:last].sum(axis=1)
+            value = self.value[first:last].sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                price = np.where(volume > 0, value / volume, np.nan)
+        return pd.DataFrame(
+            {
+                "timestamp": self.timestamps(first, last),
+                "price": price,
+                "volume_usd": volume,
+                "venues": (self.volume[first:last] > 0).sum(axis=1),
+            }
+        )
+
+    def contributions(self, start=None, end=None):
+        """returns every venue's share of the USD volume of each bucket between start and end (ms), one column per venue, indexed by timestamp"""
+        if self.first_bucket is None:
+            return pd.DataFrame()
+        first, last = self.bucket_range(start, end)
+        volume = self.volume[first:last, : len(self.venues)]
+        total = volume.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shares = np.where(total > 0, volume / total, np.nan)
+        return pd.DataFrame(shares, index=self.timestamps(first, last), columns=self.venues)
+
+    def venue_volumes(self, start=None, end=None):
+        """returns the USD volume of every venue between start and end (ms) and its share of the total, largest first"""
+        first, last = self.bucket_range(start, end) if self.first_bucket is not None else (0, 0)
+        volume = self.volume[first:last, : len(self.venues)].sum(axis=0)
+        total = volume.sum()
+        venues = pd.DataFrame({"venue": self.venues, "volume_usd": volume, "share": volume / total if total > 0 else np.nan})
+        return venues.sort_values("volume_usd", ascending=False).reset_index(drop=True)
+
+    def save(self, file_path):
+        """writes the index to file_path (a .npz file), atomically"""
+        meta = {
+            "bucket_ms": self.bucket_ms,
+            "first_bucket": self.first_bucket,
+            "venues": self.venues,
+            "high_water_marks": self.high_water_marks,
+            "file_offsets": self.file_offsets,
+        }
+        temp_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, volume=self.volume[: self.rows], value=self.value[: self.rows], meta=np.array(json.dumps(meta)))
+        os.replace(temp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        """reads an index written by save, ready for more updates"""
+        with np.load(file_path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            volume_index = cls(meta["bucket_ms"] // 1000)
+            volume_index.volume = data["volume"]
+            volume_index.value = data["value"]
+        volume_index.bucket_ms = meta["bucket_ms"]
+        volume_index.first_bucket = meta["first_bucket"]
+        volume_index.rows = len(volume_index.volume)
+        volume_index.venues = meta["venues"]
+        volume_index.high_water_marks = meta["high_water_marks"]
+        volume_index.file_offsets = meta["file_offsets"]
+        return volume_index